@@ -0,0 +1,80 @@
+"""Прості потокобезпечні кеші в пам'яті процесу."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class LRUCache:
+    """Обмежений LRU-кеш з необов'язковим TTL (секунди)."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        generation — cache_generation(), прочитаний до завантаження value: якщо кеші
+        каталогу відтоді скидалися, value може бути застарілим і не зберігається.
+        """
+        with self._lock:
+            if generation is not None and generation != _generation:
+                return
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Кеші, залежні від каталогу страв: скидаються разом при зміні його версії
+_invalidators: Dict[str, Callable[[], None]] = {}
+_invalidators_lock = threading.Lock()
+# Лічильник скидань: збільшується до виклику функцій скидання (див. LRUCache.set)
+_generation = 0
+
+
+def cache_generation() -> int:
+    return _generation
+
+
+def register_invalidation(name: str, callback: Callable[[], None]) -> None:
+    """Реєструє функцію скидання кешу (повторна реєстрація з тим самим ім'ям замінює її)."""
+    with _invalidators_lock:
+        _invalidators[name] = callback
+
+
+def invalidate_caches() -> List[str]:
+    """Скидає всі зареєстровані кеші; повертає їхні імена."""
+    global _generation
+    with _invalidators_lock:
+        _generation += 1
+        callbacks = list(_invalidators.items())
+    for _, callback in callbacks:
+        callback()
+    return [name for name, _ in callbacks]
@@ -0,0 +1,217 @@
+"""
+Каталог страв поза ORM: незмінні записи рецептів, UA-словник та версія каталогу.
+
+Будь-який flush, що змінює Recipe, збільшує версію в тій самій транзакції. Кожен
+процес опитує версію (CATALOG_POLL_S) і при зміні скидає кеші, зареєстровані
+через cache.register_invalidation; процес, що сам змінив каталог, робить це одразу.
+"""
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import Connection, Row, Select, event, select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from cache import invalidate_caches
+from db import engine
+from models import CatalogVersion, Recipe
+from schemas import DayPlanIn
+from settings import settings
+
+
+# Незмінний запис рецепта: те саме, що Recipe, але без сесії (для пулу процесів)
+class RecipeRecord(NamedTuple):
+    id: int
+    name: str
+    meal_type: str
+    kcal: float
+    protein_g: float
+    fat_g: float
+    carbs_g: float
+    price: float
+    weight_g: float
+    description: str
+    diet_tags: Tuple[str, ...]
+    allergens: Tuple[str, ...]
+
+
+def record_from_recipe(r: Recipe) -> RecipeRecord:
+    return RecipeRecord(
+        id=r.id, name=r.name, meal_type=r.meal_type, kcal=float(r.kcal),
+        protein_g=float(r.protein_g or 0), fat_g=float(r.fat_g or 0),
+        carbs_g=float(r.carbs_g or 0), price=float(r.price or 0),
+        weight_g=float(r.weight_g or 0), description=str(r.description or ""),
+        diet_tags=tuple(r.diet_tags or ()), allergens=tuple(r.allergens or ()),
+    )
+
+
+# Колонки таблиці в порядку полів RecipeRecord: Core-запит без ORM-об'єктів,
+# identity map і стану атрибутів
+_recipes = Recipe.__table__
+RECORD_COLUMNS = tuple(_recipes.c[name] for name in RecipeRecord._fields)
+
+
+def record_select() -> Select:
+    return select(*RECORD_COLUMNS)
+
+
+def record_from_row(row: Row) -> RecipeRecord:
+    (rid, name, meal_type, kcal, protein_g, fat_g, carbs_g,
+     price, weight_g, description, diet_tags, allergens) = row
+    return RecipeRecord(
+        rid, name, meal_type, float(kcal), float(protein_g or 0), float(fat_g or 0),
+        float(carbs_g or 0), float(price or 0), float(weight_g or 0), str(description or ""),
+        tuple(diet_tags or ()), tuple(allergens or ()),
+    )
+
+
+def fetch_records(db: Union[Session, Connection], stmt: Select) -> List[RecipeRecord]:
+    """Рядки record_select() (з умовами) одразу як RecipeRecord."""
+    return [record_from_row(row) for row in db.execute(stmt)]
+
+
+def load_catalog_records(db: Union[Session, Connection]) -> List[RecipeRecord]:
+    """Увесь каталог як RecipeRecord (для генерації поза веб-процесом)."""
+    return fetch_records(db, record_select().order_by(_recipes.c.id))
+
+
+def filter_records(records: List[RecipeRecord], payload: DayPlanIn) -> List[RecipeRecord]:
+    """Той самий відбір, що й load_pool, але над записами в пам'яті."""
+    tags = set(payload.diet_tags or [])
+    allergens = set(payload.exclude_allergens or [])
+    return [
+        r for r in records
+        if tags.issubset(r.diet_tags) and allergens.isdisjoint(r.allergens)
+    ]
+
+
+# UA-словник
+def recipe_to_ua_dict(r: Union[Recipe, RecipeRecord]) -> Dict[str, Any]:
+    return {
+        "ід": r.id,
+        "назва": r.name,
+        "тип прийому": r.meal_type,
+        "ккал": float(r.kcal),
+        "білки г": float(r.protein_g),
+        "жири г": float(r.fat_g),
+        "вуглеводи г": float(r.carbs_g),
+        "ціна грн": float(r.price),
+        "вага г": float(r.weight_g or 0),
+        "опис": str(r.description or ""),
+        "дієт-теґи": list(r.diet_tags or []),
+        "алергени": list(r.allergens or []),
+    }
+
+
+# Версія каталогу — єдиний рядок catalog_version
+_ROW_ID = 1
+
+
+def get_catalog_version(db: Session) -> int:
+    version = db.scalar(select(CatalogVersion.version).where(CatalogVersion.id == _ROW_ID))
+    return version or 0
+
+
+def bump_catalog_version(db: Union[Session, Connection]) -> None:
+    """Збільшує версію в поточній транзакції (коміт — за викликачем)."""
+    stmt = (
+        update(CatalogVersion)
+        .where(CatalogVersion.id == _ROW_ID)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if db.execute(stmt).rowcount == 0:
+        try:
+            with db.begin_nested():
+                db.execute(insert(CatalogVersion).values(id=_ROW_ID, version=1))
+        except IntegrityError:
+            # Рядок щойно створив інший процес
+            db.execute(stmt)
+
+
+def record_catalog_change(db: Session) -> None:
+    """Для змін рецептів поза ORM (Core UPDATE): збільшує версію, кеші процесу скинуться після коміту."""
+    bump_catalog_version(db)
+    db.info["catalog_committed"] = True
+
+
+# Кожен flush, що змінює рецепти, збільшує версію в тій самій транзакції
+@event.listens_for(Session, "before_flush")
+def _mark_catalog_change(session: Session, flush_context: Any, instances: Any) -> None:
+    if any(isinstance(obj, Recipe) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_flush(session: Session, flush_context: Any) -> None:
+    if session.info.pop("catalog_changed", False):
+        bump_catalog_version(session.connection())
+        session.info["catalog_committed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_local(session: Session) -> None:
+    # Цей процес не чекає опитування: кеші скидаються одразу після коміту
+    if session.info.pop("catalog_committed", False):
+        _on_version_change(None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_change(session: Session) -> None:
+    session.info.pop("catalog_changed", None)
+    session.info.pop("catalog_committed", None)
+
+
+# Версія, яку бачив цей процес; оновлюється опитуванням catalog_version
+_known_version: Optional[int] = None
+_watcher: Optional[threading.Thread] = None
+
+
+def _on_version_change(version: Optional[int]) -> None:
+    global _known_version
+    _known_version = version
+    invalidate_caches()
+
+
+def known_catalog_version(db: Session) -> int:
+    """
+    Версія каталогу без запиту до БД, якщо працює опитування (відстає не більше ніж на
+    CATALOG_POLL_S); інакше — прямий запит.
+    """
+    if _watcher is not None and _known_version is not None:
+        return _known_version
+    return get_catalog_version(db)
+
+
+def poll_catalog_version() -> bool:
+    """Одна перевірка версії; при зміні скидає зареєстровані кеші. Повертає, чи була зміна."""
+    global _known_version
+    with engine.connect() as conn:
+        version = conn.scalar(select(CatalogVersion.version).where(CatalogVersion.id == _ROW_ID)) or 0
+    if _known_version is None:
+        _known_version = version
+        return False
+    if version != _known_version:
+        _on_version_change(version)
+        return True
+    return False
+
+
+def start_catalog_watcher() -> Optional[threading.Thread]:
+    """Фонове опитування catalog_version раз на CATALOG_POLL_S секунд (0 — вимкнено)."""
+    global _watcher
+    interval = settings.catalog_poll_s
+    if interval <= 0 or _watcher is not None:
+        return _watcher
+
+    def loop() -> None:
+        while True:
+            try:
+                poll_catalog_version()
+            except Exception as exc:  # БД тимчасово недоступна — спробуємо наступного разу
+                print(f"catalog: помилка опитування версії: {exc}")
+            time.sleep(interval)
+
+    _watcher = threading.Thread(target=loop, name="catalog-watcher", daemon=True)
+    _watcher.start()
+    return _watcher
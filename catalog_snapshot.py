@@ -0,0 +1,232 @@
+"""
+Бінарний знімок каталогу страв, спільний для всіх воркерів через mmap.
+
+Формат файлу: 8 байт сигнатури, довжина заголовка (uint32), JSON-заголовок
+(версія каталогу, словники теґів/алергенів, зсуви секцій) і вирівняні секції:
+числові колонки, матриці теґів/алергенів та UA-словники рецептів, вже закодовані
+в JSON. Воркери відображають файл у пам'ять лише для читання, тож сторінки
+знімка ОС тримає в одному фізичному екземплярі.
+
+Новий знімок пишеться у тимчасовий файл і підміняється атомарним os.replace;
+воркери помічають новий inode і переходять на нього без запиту до БД.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from sqlalchemy.orm import Session
+
+from cache import register_invalidation
+from catalog import RecipeRecord, get_catalog_version, load_catalog_records, recipe_to_ua_dict
+from schemas import DayPlanIn
+from settings import settings
+
+MAGIC = b"VCCAT\x00\x00\x01"
+_LEN = struct.Struct("<I")
+
+MEAL_TYPE_CODES = ("breakfast", "lunch", "dinner", "snack")
+NUMERIC_COLUMNS = ("kcal", "protein_g", "fat_g", "carbs_g", "price", "weight_g")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def export_snapshot(db: Session, path: Optional[str] = None) -> int:
+    """Пише знімок поточного каталогу і атомарно підміняє ним файл. Повертає версію каталогу."""
+    path = path or settings.catalog_snapshot_path
+    version = get_catalog_version(db)
+    records = load_catalog_records(db)
+
+    tags = sorted({t for r in records for t in r.diet_tags})
+    allergens = sorted({a for r in records for a in r.allergens})
+    meal_types = list(MEAL_TYPE_CODES) + sorted({r.meal_type for r in records} - set(MEAL_TYPE_CODES))
+    tag_pos = {t: i for i, t in enumerate(tags)}
+    allergen_pos = {a: i for i, a in enumerate(allergens)}
+
+    n = len(records)
+    tag_matrix = np.zeros((n, len(tags)), dtype=np.uint8)
+    allergen_matrix = np.zeros((n, len(allergens)), dtype=np.uint8)
+    for i, r in enumerate(records):
+        tag_matrix[i, [tag_pos[t] for t in r.diet_tags]] = 1
+        allergen_matrix[i, [allergen_pos[a] for a in r.allergens]] = 1
+
+    payloads = [orjson.dumps(recipe_to_ua_dict(r)) for r in records]
+    payload_offsets = np.zeros(n + 1, dtype=np.uint64)
+    payload_offsets[1:] = np.cumsum([len(p) for p in payloads], dtype=np.uint64)
+
+    arrays: Dict[str, np.ndarray] = {
+        "id": np.array([r.id for r in records], dtype=np.int64),
+        "meal_type": np.array([meal_types.index(r.meal_type) for r in records], dtype=np.uint8),
+        **{c: np.array([getattr(r, c) for r in records], dtype=np.float64) for c in NUMERIC_COLUMNS},
+        "tags": tag_matrix,
+        "allergens": allergen_matrix,
+        "payload_offsets": payload_offsets,
+        "payloads": np.frombuffer(b"".join(payloads), dtype=np.uint8),
+    }
+
+    # Зсуви секцій рахуються від початку області даних (після заголовка)
+    sections: Dict[str, Any] = {}
+    offset = 0
+    for name, arr in arrays.items():
+        sections[name] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        offset = _align(offset + arr.nbytes)
+
+    header = json.dumps({
+        "catalog_version": version, "count": n, "tags": tags,
+        "allergens": allergens, "meal_types": meal_types, "sections": sections,
+    }, ensure_ascii=False).encode("utf-8")
+    data_start = _align(len(MAGIC) + _LEN.size + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + _LEN.pack(len(header)) + header)
+        for name, arr in arrays.items():
+            f.seek(data_start + sections[name]["offset"])
+            f.write(arr.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    # Цей процес перевірить підміну при наступному ж зверненні
+    global _checked_at
+    _checked_at = 0.0
+    return version
+
+
+class CatalogSnapshot:
+    """Знімок каталогу, відображений у пам'ять лише для читання (масиви — без копіювання)."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: не знімок каталогу")
+        (header_len,) = _LEN.unpack_from(self._mm, len(MAGIC))
+        header_start = len(MAGIC) + _LEN.size
+        header = json.loads(self._mm[header_start:header_start + header_len])
+        data_start = _align(header_start + header_len)
+
+        self.version: int = header["catalog_version"]
+        self.count: int = header["count"]
+        self.tags: List[str] = header["tags"]
+        self.allergens: List[str] = header["allergens"]
+        self.meal_types: List[str] = header["meal_types"]
+        self._tag_pos = {t: i for i, t in enumerate(self.tags)}
+        self._allergen_pos = {a: i for i, a in enumerate(self.allergens)}
+
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, sec in header["sections"].items():
+            shape = tuple(sec["shape"])
+            dtype = np.dtype(sec["dtype"])
+            count = int(np.prod(shape))
+            if count == 0:
+                self.columns[name] = np.empty(shape, dtype=dtype)
+                continue
+            self.columns[name] = np.frombuffer(
+                self._mm, dtype=dtype, count=count, offset=data_start + sec["offset"],
+            ).reshape(shape)
+
+        self._records: Dict[int, RecipeRecord] = {}
+
+    def select(self, diet_tags: List[str], exclude_allergens: List[str]) -> np.ndarray:
+        """Індекси рецептів, що мають усі diet_tags і не мають жодного з exclude_allergens."""
+        mask = np.ones(self.count, dtype=bool)
+        for tag in diet_tags:
+            pos = self._tag_pos.get(tag)
+            if pos is None:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.columns["tags"][:, pos].astype(bool)
+        for allergen in exclude_allergens:
+            pos = self._allergen_pos.get(allergen)
+            if pos is not None:
+                mask &= ~self.columns["allergens"][:, pos].astype(bool)
+        return np.flatnonzero(mask)
+
+    def payload(self, i: int) -> bytes:
+        """UA-словник рецепта i у вигляді готового JSON."""
+        offsets = self.columns["payload_offsets"]
+        return self.columns["payloads"][int(offsets[i]):int(offsets[i + 1])].tobytes()
+
+    def record(self, i: int) -> RecipeRecord:
+        rec = self._records.get(i)
+        if rec is None:
+            d = orjson.loads(self.payload(i))
+            rec = self._records[i] = RecipeRecord(
+                id=d["ід"], name=d["назва"], meal_type=d["тип прийому"], kcal=d["ккал"],
+                protein_g=d["білки г"], fat_g=d["жири г"], carbs_g=d["вуглеводи г"],
+                price=d["ціна грн"], weight_g=d["вага г"], description=d["опис"],
+                diet_tags=tuple(d["дієт-теґи"]), allergens=tuple(d["алергени"]),
+            )
+        return rec
+
+    def pool(self, payload: DayPlanIn) -> List[RecipeRecord]:
+        """Пул страв для генератора (той самий відбір, що й routes.recipes.load_pool)."""
+        idx = self.select(payload.diet_tags or [], payload.exclude_allergens or [])
+        return [self.record(int(i)) for i in idx]
+
+
+# Знімок цього процесу; перевіряється на підміну не частіше, ніж раз на CATALOG_SNAPSHOT_CHECK_S
+_current: Optional[CatalogSnapshot] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _recheck() -> None:
+    global _checked_at
+    _checked_at = 0.0
+
+
+# Зміна версії каталогу — перевірити файл знімка при наступному зверненні
+register_invalidation("catalog.snapshot", _recheck)
+
+
+def _file_inode(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def current_snapshot() -> Optional[CatalogSnapshot]:
+    """Актуальний знімок каталогу або None, якщо знімки вимкнені чи файлу ще нема."""
+    global _current, _checked_at
+    path = settings.catalog_snapshot_path
+    if not path:
+        return None
+
+    now = time.monotonic()
+    if _current is not None and now - _checked_at < settings.catalog_snapshot_check_s:
+        return _current
+
+    with _lock:
+        _checked_at = now
+        inode = _file_inode(path)
+        if inode is None:
+            _current = None
+        elif _current is None or _current.inode != inode:
+            # Старе відображення звільниться, коли його перестануть використовувати
+            _current = CatalogSnapshot(path)
+    return _current
+
+
+def ensure_snapshot(db: Session) -> Optional[Tuple[int, bool]]:
+    """Створює знімок, якщо його нема або він старший за каталог. Повертає (версія, чи перезаписано)."""
+    if not settings.catalog_snapshot_path:
+        return None
+    version = get_catalog_version(db)
+    snap = current_snapshot()
+    if snap is not None and snap.version == version:
+        return version, False
+    export_snapshot(db)
+    return version, True
@@ -0,0 +1,73 @@
+"""
+Компактний формат відповіді (format=compact) для /recipes, /plan/day та /plan/week.
+
+Кожна страва описується один раз у словнику «страви» — колонками (список на кожне
+поле, однаковий порядок), а дні посилаються на неї за ід. Згрупований день (grouped)
+має ще список «кількість» тієї ж довжини, що й «страви».
+
+    {"формат": "compact",
+     "страви": {"ід": [3, 8], "назва": [...], "ккал": [420.0, 650.0], ...},
+     "дні": [{"підсумок": {...}, "страви": [3, 8]}]}
+"""
+from typing import Any, Dict, Iterable, List
+
+# Поля страви в порядку колонок словника (як у recipe_to_ua_dict)
+RECIPE_COLUMNS = (
+    "ід", "назва", "тип прийому", "ккал", "білки г", "жири г", "вуглеводи г",
+    "ціна грн", "вага г", "опис", "дієт-теґи", "алергени",
+)
+# Поля, які в згрупованому елементі помножені на кількість
+SCALED_COLUMNS = ("ккал", "білки г", "жири г", "вуглеводи г", "ціна грн", "вага г")
+
+
+def _hashable(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
+
+
+def compact_recipes(items: Iterable[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    UA-словники страв -> колонки; повтори за ід відкидаються. Страви без ід (власні
+    елементи) зводяться лише з повністю однаковими, а не між собою всі разом.
+    """
+    columns: Dict[str, List[Any]] = {c: [] for c in RECIPE_COLUMNS}
+    seen = set()
+    for item in items:
+        if item["ід"] is not None and item["ід"] in seen:
+            continue
+        n = item.get("count", 1)
+        row = [
+            round(item[c] / n, 4) if n > 1 and c in SCALED_COLUMNS else item[c]
+            for c in RECIPE_COLUMNS
+        ]
+        key = item["ід"] if item["ід"] is not None else tuple(_hashable(v) for v in row)
+        if key in seen:
+            continue
+        seen.add(key)
+        for c, value in zip(RECIPE_COLUMNS, row):
+            columns[c].append(value)
+    return columns
+
+
+def _compact_day(day: Dict[str, Any]) -> Dict[str, Any]:
+    items = day["елементи"]
+    out: Dict[str, Any] = {"підсумок": day["підсумок"], "страви": [i["ід"] for i in items]}
+    if any("count" in i for i in items):
+        out["кількість"] = [i.get("count", 1) for i in items]
+    return out
+
+
+def compact_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Денний ({"підсумок", "елементи"}) або тижневий ({"плани": [...]}) план у компактному вигляді."""
+    days = plan["плани"] if "плани" in plan else [plan]
+    out: Dict[str, Any] = {
+        "формат": "compact",
+        "страви": compact_recipes(i for day in days for i in day["елементи"]),
+        "дні": [_compact_day(day) for day in days],
+    }
+    # Решта полів плану (загалом ккал, ід плану, ...) — як є
+    out.update({k: v for k, v in plan.items() if k not in ("плани", "підсумок", "елементи")})
+    return out
+
+
+def compact_recipe_list(items: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"формат": "compact", "страви": compact_recipes(items)}
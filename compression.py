@@ -0,0 +1,147 @@
+"""
+Стиснення відповідей (ASGI middleware): brotli або gzip за Accept-Encoding.
+
+Відповіді, менші за поріг, і вже стиснуті відповіді (з Content-Encoding або
+стиснутого типу, як експорт з gzip=true) йдуть без змін. Потокові
+відповіді (CSV/NDJSON) стискаються частинами з flush після кожної. Brotli — за
+наявності пакета brotli; без нього лишається gzip.
+"""
+import zlib
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # необов'язкова залежність
+    brotli = None
+
+Message = MutableMapping[str, Any]
+
+# Порядок переваги за однакового q
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Кодування з найбільшим q серед підтримуваних; None — без стиснення."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best = None
+    for enc in SUPPORTED_ENCODINGS:
+        q = weights.get(enc, weights.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (enc, q)
+    return best[0] if best else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31 — gzip-обгортка
+
+    def chunk(self, data: bytes) -> bytes:
+        """Стиснута частина потоку, яку клієнт може розпакувати одразу."""
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.finish()
+        return self._gz.compress(data) + self._gz.flush()
+
+
+# Типи вмісту, що вже стиснуті: повторне стиснення лише витрачає процесор
+COMPRESSED_MEDIA_TYPES = (b"application/gzip", b"application/x-gzip", b"application/zip")
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for k, v in headers:
+        if k.lower() == name:
+            return v
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(
+        self, app: Callable, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Message, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = _header(scope.get("headers", []), b"accept-encoding")
+        encoding = choose_encoding(accept.decode("latin-1")) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                headers = list(start.get("headers", []))
+                too_small = not more and len(body) < self.minimum_size
+                media_type = (_header(headers, b"content-type") or b"").split(b";")[0].strip().lower()
+                if (
+                    too_small
+                    or _header(headers, b"content-encoding") is not None
+                    or media_type in COMPRESSED_MEDIA_TYPES
+                ):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                vary = _header(headers, b"vary")
+                if vary is None:
+                    headers.append((b"vary", b"Accept-Encoding"))
+                elif b"accept-encoding" not in vary.lower():
+                    headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+                    headers.append((b"vary", vary + b", Accept-Encoding"))
+
+                if not more:
+                    data = compressor.finish(body)
+                    headers.append((b"content-length", str(len(data)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send({**start, "headers": headers})
+
+            data = compressor.chunk(body) if more else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
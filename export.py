@@ -0,0 +1,120 @@
+"""
+Потоковий експорт даних у CSV / NDJSON (опційно gzip).
+
+Рядки читаються з БД серверним курсором пачками (yield_per) поза ORM-сесією,
+тож пам'ять не залежить від розміру вибірки.
+"""
+import csv
+import io
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy.sql import Select
+
+from db import engine
+
+# Словник для перекладу типів страв
+MEAL_TYPE_LABELS = {
+    "breakfast": "Сніданок", "lunch": "Обід",
+    "dinner": "Вечеря", "snack": "Перекус",
+}
+
+# Колонки CSV зі стравами (як у файлі плану з веб-інтерфейсу)
+MEAL_CSV_COLUMNS = ["Тип", "Назва", "Склад", "Вага (г)", "Ккал", "Білки", "Жири", "Вугл", "Ціна (грн)"]
+
+
+def meal_csv_cells(
+    meal_type: Optional[str], name: str, description: Optional[str], weight_g: Optional[float],
+    kcal: float, protein_g: float, fat_g: float, carbs_g: float, price: float,
+) -> List[Any]:
+    """Комірки одного рядка страви у форматі MEAL_CSV_COLUMNS."""
+    return [
+        MEAL_TYPE_LABELS.get(meal_type, meal_type),
+        name,
+        description or "",
+        round(weight_g or 0),
+        round(kcal or 0, 1),
+        round(protein_g or 0, 1),
+        round(fat_g or 0, 1),
+        round(carbs_g or 0, 1),
+        round(price or 0, 2),
+    ]
+
+
+def stream_rows(statements: Sequence[Select], batch_size: int = 1000) -> Iterator[Any]:
+    """Послідовно виконує запити на власному з'єднанні та віддає рядки пачками з курсора."""
+    with engine.connect() as conn:
+        for stmt in statements:
+            result = conn.execution_options(yield_per=batch_size).execute(stmt)
+            for partition in result.partitions():
+                yield from partition
+
+
+def encode_csv(header: Sequence[str], rows: Iterable[Sequence[Any]], chunk_rows: int = 500) -> Iterator[str]:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    # BOM для коректного відображення кирилиці в Excel
+    output.write("\ufeff")
+    writer.writerow(header)
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+            pending = 0
+    yield output.getvalue()
+
+
+def encode_ndjson(rows: Iterable[Dict[str, Any]], chunk_rows: int = 500) -> Iterator[bytes]:
+    buf: List[bytes] = []
+    for row in rows:
+        buf.append(orjson.dumps(row))
+        if len(buf) >= chunk_rows:
+            yield b"\n".join(buf) + b"\n"
+            buf = []
+    if buf:
+        yield b"\n".join(buf) + b"\n"
+
+
+def gzip_chunks(chunks: Iterable[Any]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 — формат gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(
+    fmt: str,
+    use_gzip: bool,
+    basename: str,
+    rows: Iterable[Any],
+    csv_header: Sequence[str],
+    to_csv: Callable[[Any], Sequence[Any]],
+    to_json: Callable[[Any], Dict[str, Any]],
+) -> StreamingResponse:
+    """StreamingResponse для рядків БД: to_csv / to_json перетворюють рядок у потрібний формат."""
+    if fmt == "ndjson":
+        chunks: Iterable[Any] = encode_ndjson(to_json(row) for row in rows)
+        media_type, ext = "application/x-ndjson", "ndjson"
+    else:
+        chunks = encode_csv(csv_header, (to_csv(row) for row in rows))
+        media_type, ext = "text/csv", "csv"
+
+    filename = f"{basename}.{ext}"
+    if use_gzip:
+        chunks = gzip_chunks(chunks)
+        media_type, filename = "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,121 @@
+"""
+Попередня перевірка здійсненності запиту на план — до запуску генератора.
+
+Для кожного пулу страв (дієт-теґи + алергени) один раз на версію каталогу рахується
+зведення: кількість страв, мінімальна ціна та діапазон ккал за типами прийому.
+Класифікація запиту за зведенням — сталий час: infeasible (генератор гарантовано
+не вкладеться — 422 з причинами), tight (план можливий, але впритул) або ok.
+"""
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional
+
+from cache import LRUCache, register_invalidation
+from schemas import DayPlanIn
+from settings import settings
+
+CORE_MEALS = ("breakfast", "lunch", "dinner")
+MEAL_LABELS = {"breakfast": "сніданок", "lunch": "обід", "dinner": "вечеря", "snack": "перекус"}
+# Найбільший допуск перевищення ккал у генераторі (режим «Набір»)
+MAX_KCAL_OVERFLOW = 1.10
+# Бюджет менше ніж на 15% вищий за мінімальний — план буде впритул
+TIGHT_BUDGET_MARGIN = 1.15
+
+
+class MealTypeSummary(NamedTuple):
+    count: int
+    min_price: float
+    min_kcal: float
+    max_kcal: float
+
+
+class PoolSummary(NamedTuple):
+    by_type: Dict[str, MealTypeSummary]
+    min_core_price: float  # найдешевші сніданок + обід + вечеря
+    min_core_kcal: float
+    max_core_kcal: float
+    max_kcal_per_uah: float  # найкраще співвідношення ккал/ціна в пулі; 0 — усі страви безкоштовні
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "страв": {t: s.count for t, s in self.by_type.items()},
+            "мін. ціна грн": {t: s.min_price for t, s in self.by_type.items() if s.count},
+            "мін. ціна сніданок+обід+вечеря грн": round(self.min_core_price, 2),
+            "ккал сніданок+обід+вечеря": [round(self.min_core_kcal, 1), round(self.max_core_kcal, 1)],
+            "макс. ккал за 1 грн": round(self.max_kcal_per_uah, 2),
+        }
+
+
+def summarize_pool(pool: List[Any]) -> PoolSummary:
+    """Зведення пулу (Recipe або RecipeRecord) за один прохід."""
+    stats: Dict[str, List[float]] = {}
+    for r in pool:
+        s = stats.get(r.meal_type)
+        if s is None:
+            stats[r.meal_type] = [1, r.price, r.kcal, r.kcal]
+        else:
+            s[0] += 1
+            s[1] = min(s[1], r.price)
+            s[2] = min(s[2], r.kcal)
+            s[3] = max(s[3], r.kcal)
+
+    by_type: Dict[str, MealTypeSummary] = {}
+    for t in (*CORE_MEALS, "snack"):
+        s = stats.get(t)
+        by_type[t] = MealTypeSummary(int(s[0]), s[1], s[2], s[3]) if s else MealTypeSummary(0, 0.0, 0.0, 0.0)
+    core = [by_type[t] for t in CORE_MEALS]
+    return PoolSummary(
+        by_type=by_type,
+        min_core_price=sum(s.min_price for s in core),
+        min_core_kcal=sum(s.min_kcal for s in core),
+        max_core_kcal=sum(s.max_kcal for s in core),
+        max_kcal_per_uah=max((r.kcal / r.price for r in pool if r.price > 0), default=0.0),
+    )
+
+
+# Зведення пулів: ключ пулу -> PoolSummary; скидаються при зміні каталогу разом із пулами
+summaries = LRUCache(maxsize=settings.catalog_pool_cache_size)
+register_invalidation("feasibility.summaries", summaries.clear)
+
+
+def pool_summary(key: Hashable, pool: List[Any], generation: Optional[int] = None) -> PoolSummary:
+    """generation — cache_generation() до завантаження пулу (зведення застарілого пулу не кешується)."""
+    summary = summaries.get(key)
+    if summary is None:
+        summary = summarize_pool(pool)
+        summaries.set(key, summary, generation=generation)
+    return summary
+
+
+def classify(summary: PoolSummary, payload: DayPlanIn) -> Dict[str, Any]:
+    """{"статус": ok / tight / infeasible, "причини": [...], "зведення": {...}} для запиту."""
+    infeasible: List[str] = []
+    tight: List[str] = []
+    by_type = summary.by_type
+
+    missing = [MEAL_LABELS[t] for t in CORE_MEALS if by_type[t].count == 0]
+    if missing:
+        infeasible.append(f"немає страв під задані теґи й алергени: {', '.join(missing)}")
+    else:
+        if payload.budget < summary.min_core_price:
+            infeasible.append(
+                f"бюджет {payload.budget:g} грн нижчий за найдешевші сніданок+обід+вечерю "
+                f"({summary.min_core_price:.2f} грн)"
+            )
+        elif payload.budget < summary.min_core_price * TIGHT_BUDGET_MARGIN:
+            tight.append(f"бюджет лише трохи вищий за мінімальний ({summary.min_core_price:.2f} грн)")
+
+        if summary.min_core_kcal > payload.kcal * MAX_KCAL_OVERFLOW:
+            infeasible.append(
+                f"ціль {payload.kcal} ккал нижча за мінімально досяжну ({summary.min_core_kcal:.0f} ккал)"
+            )
+
+        if payload.snacks > 0 and by_type["snack"].count == 0:
+            tight.append("немає перекусів під задані умови — план буде без них")
+        # Навіть найвигідніші за калорійністю страви не дадуть ціль у межах бюджету
+        if summary.max_kcal_per_uah and payload.kcal > payload.budget * summary.max_kcal_per_uah:
+            tight.append(
+                f"бюджету вистачить щонайбільше на {payload.budget * summary.max_kcal_per_uah:.0f} ккал "
+                f"із {payload.kcal} — план буде неповним"
+            )
+
+    status = "infeasible" if infeasible else "tight" if tight else "ok"
+    return {"статус": status, "причини": infeasible + tight, "зведення": summary.as_dict()}
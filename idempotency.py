@@ -0,0 +1,217 @@
+"""
+Ідемпотентні POST-запити: заголовок Idempotency-Key.
+
+Перший запит з ключем займає рядок idempotency_keys (INSERT по первинному ключу —
+атомарно для всіх воркерів), виконується і зберігає відповідь на IDEMPOTENCY_TTL_S.
+Повтор з тим самим ключем і тим самим запитом отримує збережену відповідь без
+повторної генерації й запису; той самий ключ з іншим запитом — 422. Поки оригінал
+ще виконується, повтор чекає до IDEMPOTENCY_WAIT_S, далі отримує 409. Відповідь 5xx
+не зберігається — ключ звільняється для наступної спроби.
+"""
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from db import SessionLocal
+from models import IdempotencyKey
+from settings import settings
+
+Message = MutableMapping[str, Any]
+
+# Ендпоінти, що генерують або записують плани
+IDEMPOTENT_PATHS = frozenset({"/plans", "/plan/day", "/plan/week", "/plan/replan", "/ui/plan"})
+MAX_KEY_LENGTH = 200
+
+CLAIMED, REPLAY, MISMATCH, BUSY = "claimed", "replay", "mismatch", "busy"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def claim_key(key_hash: str, fingerprint: str) -> Tuple[str, Optional[Any]]:
+    """
+    Спроба зайняти ключ. Повертає (CLAIMED, None), (REPLAY, рядок зі збереженою відповіддю),
+    (MISMATCH, None) або (BUSY, None) — оригінальний запит ще виконується.
+    """
+    for _ in range(3):
+        now = _utcnow()
+        values = {
+            "fingerprint": fingerprint, "status": "pending",
+            "locked_until": now + timedelta(seconds=settings.idempotency_lock_s),
+            "expires_at": now + timedelta(seconds=settings.idempotency_ttl_s),
+        }
+        with SessionLocal() as db:
+            try:
+                db.execute(insert(IdempotencyKey).values(key_hash=key_hash, **values))
+                db.commit()
+                return CLAIMED, None
+            except IntegrityError:
+                db.rollback()
+
+            row = db.execute(select(IdempotencyKey).where(IdempotencyKey.key_hash == key_hash)).scalar()
+            if row is None:
+                continue  # рядок щойно видалили — пробуємо вставити знову
+
+            expired = row.expires_at <= now
+            abandoned = row.status == "pending" and row.locked_until is not None and row.locked_until <= now
+            if expired or abandoned:
+                # Перехоплюємо лише той самий стан, який прочитали (інший воркер міг встигнути першим)
+                taken = db.execute(
+                    update(IdempotencyKey)
+                    .where(IdempotencyKey.key_hash == key_hash, IdempotencyKey.expires_at == row.expires_at)
+                    .values(status_code=None, headers=None, body=None, **values)
+                ).rowcount
+                db.commit()
+                if taken:
+                    return CLAIMED, None
+                continue
+
+            if row.fingerprint != fingerprint:
+                return MISMATCH, None
+            if row.status == "done":
+                return REPLAY, row
+            return BUSY, None
+    return BUSY, None
+
+
+def complete_key(key_hash: str, status_code: int, headers: List[List[str]], body: bytes) -> None:
+    with SessionLocal() as db:
+        db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key_hash == key_hash)
+            .values(status="done", locked_until=None, status_code=status_code, headers=headers, body=body)
+        )
+        db.commit()
+
+
+def release_key(key_hash: str) -> None:
+    with SessionLocal() as db:
+        db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.key_hash == key_hash, IdempotencyKey.status == "pending",
+        ))
+        db.commit()
+
+
+def purge_expired_keys(batch_size: int = 1000) -> int:
+    """Видаляє прострочені ключі пачками; повертає кількість видалених."""
+    removed = 0
+    while True:
+        with SessionLocal() as db:
+            keys = db.scalars(
+                select(IdempotencyKey.key_hash)
+                .where(IdempotencyKey.expires_at <= _utcnow())
+                .limit(batch_size)
+            ).all()
+            if not keys:
+                return removed
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key_hash.in_(keys)))
+            db.commit()
+            removed += len(keys)
+
+
+def _header(scope: Message, name: bytes) -> Optional[bytes]:
+    for k, v in scope.get("headers", []):
+        if k.lower() == name:
+            return v
+    return None
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: Callable, paths: frozenset = IDEMPOTENT_PATHS) -> None:
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope: Message, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        raw_key = _header(scope, b"idempotency-key")
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not raw_key.strip() or len(raw_key) > MAX_KEY_LENGTH:
+            await JSONResponse(
+                {"detail": f"Idempotency-Key: від 1 до {MAX_KEY_LENGTH} символів"}, status_code=400,
+            )(scope, receive, send)
+            return
+
+        # Тіло читаємо повністю: воно входить у відбиток і потім віддається застосунку
+        chunks = []
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        key_hash = hashlib.sha1(b"POST " + scope["path"].encode() + b"\n" + raw_key.strip()).hexdigest()
+        fingerprint = hashlib.sha1(scope.get("query_string", b"") + b"\n" + body).hexdigest()
+
+        deadline = time.monotonic() + settings.idempotency_wait_s
+        while True:
+            state, row = await run_in_threadpool(claim_key, key_hash, fingerprint)
+            if state != BUSY or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.2)
+
+        if state == REPLAY:
+            headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in row.headers or []]
+            headers.append((b"idempotency-replayed", b"true"))
+            await send({"type": "http.response.start", "status": row.status_code, "headers": headers})
+            await send({"type": "http.response.body", "body": row.body or b""})
+            return
+        if state == MISMATCH:
+            await JSONResponse(
+                {"detail": "Idempotency-Key вже використано для іншого запиту"}, status_code=422,
+            )(scope, receive, send)
+            return
+        if state == BUSY:
+            await JSONResponse(
+                {"detail": "Запит з цим Idempotency-Key ще виконується"}, status_code=409,
+                headers={"Retry-After": "1"},
+            )(scope, receive, send)
+            return
+
+        replayed = False
+
+        async def replay_body() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response: Dict[str, Any] = {"status": 500, "headers": [], "body": []}
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [k.decode("latin-1"), v.decode("latin-1")] for k, v in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except BaseException:
+            await run_in_threadpool(release_key, key_hash)
+            raise
+
+        if response["status"] >= 500:
+            await run_in_threadpool(release_key, key_hash)
+        else:
+            await run_in_threadpool(
+                complete_key, key_hash, response["status"], response["headers"], b"".join(response["body"]),
+            )
@@ -0,0 +1,159 @@
+"""
+Інгредієнти рецептів: розбір складу з опису та перерахунок цін страв.
+
+Ціна страви = Σ грами інгредієнта × ціна за кг / 1000. При зміні цін інгредієнтів
+перераховуються лише рецепти, що їх містять (зворотний індекс recipe_ingredients
+за ingredient_id); нові ціни пишуться пачками, а версія каталогу збільшується один
+раз — після останньої пачки.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from catalog import record_catalog_change
+from models import Ingredient, Recipe, RecipeIngredient
+
+# «150г», «0.5 кг», «200 мл»; «2.5%» не є кількістю
+_QUANTITY = re.compile(r"(\d+(?:[.,]\d+)?)\s*(кг|г|мл|л)(?![а-яіїєґa-z])", re.IGNORECASE)
+_PIECES = re.compile(r"\d+\s*(?:шт|шм)\.?", re.IGNORECASE)
+_PARENS = re.compile(r"\([^()]*\)")
+_UNIT_GRAMS = {"г": 1.0, "мл": 1.0, "кг": 1000.0, "л": 1000.0}
+
+
+def _decimal_comma(text: str, i: int) -> bool:
+    return 0 < i < len(text) - 1 and text[i - 1].isdigit() and text[i + 1].isdigit()
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Ділить опис за комами поза дужками; кома між цифрами («0,5 кг») — десяткова."""
+    parts, depth, current = [], 0, []
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        elif ch == "," and depth == 0 and not _decimal_comma(text, i):
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def ingredient_key(name: str) -> str:
+    """Ключ порівняння назв інгредієнтів."""
+    return " ".join(name.split()).casefold()
+
+
+def parse_description(text: str) -> List[Tuple[str, float]]:
+    """
+    Склад страви з опису: [(назва інгредієнта, грами)]. Грами — остання кількість
+    у частині опису (мл і л рахуються як г і кг); 0 — кількість не вказана.
+    """
+    result: Dict[str, Tuple[str, float]] = {}
+    for part in _split_top_level(text or ""):
+        matches = _QUANTITY.findall(part)
+        grams = 0.0
+        if matches:
+            value, unit = matches[-1]
+            grams = float(value.replace(",", ".")) * _UNIT_GRAMS[unit.lower()]
+
+        name = _PARENS.sub(" ", part)
+        name = _QUANTITY.sub(" ", name)
+        name = _PIECES.sub(" ", name)
+        name = " ".join(name.split()).strip(" .;:-")
+        if not name:
+            continue
+        name = name[0].upper() + name[1:]
+
+        # Той самий інгредієнт двічі в описі — сумуємо кількість
+        key = ingredient_key(name)
+        if key in result:
+            grams += result[key][1]
+        result[key] = (result.get(key, (name, 0.0))[0], grams)
+    return list(result.values())
+
+
+def recipe_prices(db: Session, recipe_ids: List[int]) -> Dict[int, float]:
+    """
+    Ціни рецептів за складом. Рецепт без складу або з інгредієнтом без ціни
+    (при ненульовій кількості) пропускається — його ціна лишається ручною.
+    """
+    rows = db.execute(
+        select(RecipeIngredient.recipe_id, RecipeIngredient.grams, Ingredient.price_per_kg)
+        .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+        .where(RecipeIngredient.recipe_id.in_(recipe_ids))
+    ).all()
+    totals: Dict[int, float] = {}
+    unpriced = set()
+    for recipe_id, grams, price_per_kg in rows:
+        if not grams:
+            continue
+        if price_per_kg is None:
+            unpriced.add(recipe_id)
+            continue
+        totals[recipe_id] = totals.get(recipe_id, 0.0) + grams * price_per_kg / 1000
+    return {rid: round(total, 2) for rid, total in totals.items() if rid not in unpriced}
+
+
+def affected_recipe_ids(db: Session, ingredient_ids: Optional[Iterable[int]] = None) -> List[int]:
+    """Рецепти, що містять будь-який з інгредієнтів (None — усі рецепти зі складом)."""
+    q = select(RecipeIngredient.recipe_id).distinct()
+    if ingredient_ids is not None:
+        q = q.where(RecipeIngredient.ingredient_id.in_(list(ingredient_ids)))
+    return sorted(db.scalars(q))
+
+
+def reprice_recipes(
+    db: Session, ingredient_ids: Optional[Iterable[int]] = None, batch_size: int = 500,
+) -> int:
+    """
+    Перераховує ціни рецептів, зачеплених інгредієнтами, і пише їх пачками по batch_size
+    (коміт після кожної). Версія каталогу збільшується один раз — у транзакції останньої
+    пачки, тож повторний запуск після збою допише решту й таки збільшить версію.
+    Повертає кількість змінених рецептів.
+    """
+    recipe_ids = affected_recipe_ids(db, ingredient_ids)
+    table = Recipe.__table__
+    stmt = update(table).where(table.c.id == bindparam("rid")).values(price=bindparam("p"))
+
+    batches: List[List[Dict[str, Any]]] = []
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        prices = recipe_prices(db, batch)
+        current = dict(db.execute(select(Recipe.id, Recipe.price).where(Recipe.id.in_(batch))).all())
+        rows = [
+            {"rid": rid, "p": price} for rid, price in prices.items()
+            if current.get(rid) is None or abs(current[rid] - price) >= 0.005
+        ]
+        if rows:
+            batches.append(rows)
+
+    for n, rows in enumerate(batches, start=1):
+        db.execute(stmt, rows)
+        if n == len(batches):
+            # Одна нова версія на весь перерахунок — кеші планів і пулів скидаються один раз
+            record_catalog_change(db)
+        db.commit()
+    return sum(len(rows) for rows in batches)
+
+
+def set_ingredient_prices(db: Session, prices: Dict[int, Optional[float]]) -> List[int]:
+    """Записує ціни інгредієнтів (коміт — за викликачем). Повертає id, ціна яких змінилася."""
+    current = dict(db.execute(
+        select(Ingredient.id, Ingredient.price_per_kg).where(Ingredient.id.in_(list(prices)))
+    ).all())
+    rows = [
+        {"iid": iid, "p": price} for iid, price in prices.items()
+        if iid in current and current[iid] != price
+    ]
+    if rows:
+        table = Ingredient.__table__
+        db.execute(
+            update(table).where(table.c.id == bindparam("iid")).values(price_per_kg=bindparam("p")),
+            rows,
+        )
+    return [r["iid"] for r in rows]
@@ -0,0 +1,114 @@
+"""Допоміжні класи для довгих пакетних задач: контрольна точка, прогрес, єдиний виконавець."""
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Connection, text
+
+from db import engine
+
+
+class Checkpoint:
+    """
+    Стан задачі у JSON-файлі. Запис атомарний (тимчасовий файл + os.replace),
+    тож перерваний процес не лишає пошкодженої контрольної точки.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, state: Dict[str, Any]) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Progress:
+    """Друкує оброблену кількість і швидкість не частіше, ніж раз на interval_s секунд."""
+
+    def __init__(self, label: str, total: Optional[int] = None, interval_s: float = 1.0) -> None:
+        self.label = label
+        self.total = total
+        self.interval_s = interval_s
+        self.done = 0
+        self._started = time.perf_counter()
+        self._last_report = 0.0
+
+    def update(self, count: int, note: str = "") -> None:
+        self.done += count
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval_s:
+            self._last_report = now
+            self.report(note)
+
+    def report(self, note: str = "") -> None:
+        elapsed = time.perf_counter() - self._started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        of_total = f"/{self.total}" if self.total is not None else ""
+        suffix = f" ({note})" if note else ""
+        print(f"… {self.label}: {self.done}{of_total}, {rate:.0f}/с{suffix}")
+
+
+class RunnerLock:
+    """
+    Єдиний виконавець фонової задачі серед усіх воркерів: іменоване блокування MySQL
+    (GET_LOCK) на з'єднанні, яке тримає власник. Блокування живе, доки відкрите
+    з'єднання, тож після падіння власника його підхоплює інший процес.
+    SQLite (один процес) — без блокування.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._conn: Optional[Connection] = None
+
+    def held(self) -> bool:
+        """Чи цей процес — виконавець; за потреби бере блокування (без очікування)."""
+        try:
+            if self._conn is not None and not self._owns(self._conn):
+                self.release()
+            if self._conn is None:
+                self._conn = self._take()
+        except Exception:
+            self.release()
+            raise
+        return self._conn is not None
+
+    def release(self) -> None:
+        """Закриває саме з'єднання (не повертає в пул разом із блокуванням)."""
+        if self._conn is not None:
+            self._conn.invalidate()
+            self._conn.close()
+            self._conn = None
+
+    def _take(self) -> Optional[Connection]:
+        conn = engine.connect()
+        if engine.dialect.name == "mysql":
+            got = conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": self.name}).scalar()
+            conn.commit()
+            if got != 1:
+                conn.close()
+                return None
+        return conn
+
+    def _owns(self, conn: Connection) -> bool:
+        # Після розриву з'єднання MySQL знімає блокування — перевіряємо, що воно досі наше
+        if engine.dialect.name != "mysql":
+            return True
+        owner = conn.execute(text("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()"), {"name": self.name}).scalar()
+        conn.commit()
+        return owner == 1
@@ -1,13 +1,24 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from sqlalchemy import text
 
-from db import engine, Base
+from catalog import start_catalog_watcher
+from compression import CompressionMiddleware
+from idempotency import IdempotencyMiddleware
+from db import engine, SessionLocal
+from migrations import upgrade
+from plan_cache import start_plan_cache_worker
+from plan_templates import start_template_worker
+from retention import start_retention_worker
+from settings import settings
+from warmup import is_ready, start_prewarm, warmup_timings
 
 # підключаємо модульні роутери
 from routes.recipes import router as recipes_router
 from routes.users import router as users_router
 from routes.plans import router as plans_router
 from routes.web_ui import router as web_ui_router
+from routes.analytics import router as analytics_router
+from routes.ingredients import router as ingredients_router
 
 app = FastAPI(
     title="VitaCode API",
@@ -15,10 +26,38 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Idempotency-Key для генерації/запису планів; всередині стиснення — зберігається нестиснута відповідь
+app.add_middleware(IdempotencyMiddleware)
+
+# br/gzip для відповідей від COMPRESSION_MIN_BYTES (плани тижня, списки, експорт)
+if settings.compression_min_bytes > 0:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_bytes,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
 @app.on_event("startup")
 def on_startup() -> None:
-    # створюємо таблиці (якщо їх ще немає)
-    Base.metadata.create_all(bind=engine)
+    # схема БД: при актуальній версії — один запит до schema_version
+    upgrade()
+    # знімок каталогу для воркерів (якщо увімкнений і застарів)
+    if settings.catalog_snapshot_path:
+        from catalog_snapshot import ensure_snapshot
+
+        with SessionLocal() as db:
+            ensure_snapshot(db)
+    # опитування версії каталогу: кеші воркера скидаються після змін в інших процесах
+    start_catalog_watcher()
+    # фонова архівація старих планів (якщо увімкнена в налаштуваннях)
+    start_retention_worker()
+    # щоденне оновлення поточних планів профілів (якщо увімкнене)
+    start_plan_cache_worker()
+    # готові плани для типових запитів: сітку після старту й змін каталогу матеріалізує один воркер
+    start_template_worker()
+    # прогрів знімка, пулу з'єднань і шаблонів (якщо увімкнений); до його кінця /health/ready = 503
+    start_prewarm()
 
 @app.get("/", tags=["Сервіс"])
 def root():
@@ -30,8 +69,17 @@ def db_health():
         conn.execute(text("SELECT 1"))
     return {"db": "ok"}
 
+@app.get("/health/ready", tags=["Сервіс"])
+def ready(response: Response):
+    if not is_ready():
+        response.status_code = 503
+        return {"ready": False}
+    return {"ready": True, "warmup_ms": warmup_timings()}
+
 # реєструємо роутери
 app.include_router(recipes_router)
 app.include_router(users_router)
 app.include_router(plans_router)
-app.include_router(web_ui_router)
\ No newline at end of file
+app.include_router(web_ui_router)
+app.include_router(analytics_router)
+app.include_router(ingredients_router)
\ No newline at end of file
@@ -0,0 +1,486 @@
+"""Службові задачі над даними (запускаються через manage.py)."""
+import statistics
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from sqlalchemy import select, insert, update, delete, func, text, bindparam
+
+from db import engine, SessionLocal
+from catalog import get_catalog_version
+from ingredients import ingredient_key, parse_description, reprice_recipes
+from models import (
+    Ingredient, RecipeIngredient, Plan, PlanDay, PlanMeal, PlanItem, PlanArchive, Profile, ProfilePlanCache, Recipe, RecipeSnapshot,
+)
+from migrations import upgrade
+from plan_storage import ensure_snapshots, load_plan_meals, plan_aggregates
+from jobs import Checkpoint, Progress
+from routes.recipes import PROFILE_PLAN_KINDS, current_profile_plan
+from routes.users import PROFILE_INPUT_FIELDS, profile_input_hash, calc_targets_batch
+from settings import settings
+
+
+# Міграція plan_meals -> plan_items + recipe_snapshots
+def migrate_plan_storage(batch_size: int = 500) -> int:
+    """
+    Переносить старі рядки plan_meals у компактний формат пачками планів.
+    Кожна пачка — окрема транзакція, тож перерваний запуск можна просто повторити.
+    Повертає кількість перенесених елементів.
+    """
+    upgrade()
+
+    with SessionLocal() as db:
+        # Відновлюємо recipe_id за назвою та типом прийому
+        recipe_ids: Dict[Tuple[str, str], int] = {
+            (name, meal_type): rid
+            for rid, name, meal_type in db.execute(select(Recipe.id, Recipe.name, Recipe.meal_type))
+        }
+
+    moved = 0
+    while True:
+        with SessionLocal() as db:
+            plan_ids = db.execute(
+                select(PlanMeal.plan_id).distinct().order_by(PlanMeal.plan_id).limit(batch_size)
+            ).scalars().all()
+            if not plan_ids:
+                break
+
+            rows = db.execute(
+                select(PlanMeal)
+                .where(PlanMeal.plan_id.in_(plan_ids))
+                .order_by(PlanMeal.plan_id, PlanMeal.day_index, PlanMeal.id)
+            ).scalars().all()
+
+            meals = [{
+                "recipe_id": recipe_ids.get((r.name, r.meal_type)),
+                "name": r.name, "meal_type": r.meal_type, "kcal": r.kcal,
+                "protein_g": r.protein_g, "fat_g": r.fat_g, "carbs_g": r.carbs_g,
+                "price": r.price, "weight_g": r.weight_g, "description": r.description,
+            } for r in rows]
+            snapshot_ids = ensure_snapshots(db, meals)
+
+            items = []
+            slots: Dict[Tuple[int, int], int] = {}
+            for r, snapshot_id in zip(rows, snapshot_ids):
+                key = (r.plan_id, r.day_index)
+                slots[key] = slots.get(key, -1) + 1
+                items.append({
+                    "plan_id": r.plan_id, "day_index": r.day_index,
+                    "slot": slots[key], "snapshot_id": snapshot_id,
+                })
+            db.execute(insert(PlanItem), items)
+            db.execute(delete(PlanMeal).where(PlanMeal.plan_id.in_(plan_ids)))
+            db.commit()
+
+            moved += len(items)
+            print(f"… перенесено {moved} елементів (до плану #{plan_ids[-1]})")
+
+    return moved
+
+
+def _table_sizes(tables: List[str]) -> Dict[str, Optional[int]]:
+    """Розмір таблиць (дані + індекси) у байтах; None, якщо СУБД не дає цієї інформації."""
+    sizes: Dict[str, Optional[int]] = {t: None for t in tables}
+    with engine.connect() as conn:
+        if engine.dialect.name == "mysql":
+            rows = conn.execute(text(
+                "SELECT table_name, data_length + index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE()"
+            ))
+        elif engine.dialect.name == "sqlite":
+            try:
+                rows = conn.execute(text(
+                    "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s "
+                    "JOIN sqlite_master m ON m.name = s.name GROUP BY m.tbl_name"
+                ))
+            except Exception:
+                return sizes
+        else:
+            return sizes
+        by_name = {name: int(size or 0) for name, size in rows}
+
+    for t in tables:
+        sizes[t] = by_name.get(t)
+    return sizes
+
+
+def plan_storage_report(sample: int = 200) -> Dict[str, Any]:
+    """Розмір таблиць планів та затримка відновлення плану через load_plan_meals."""
+    tables = ["plans", "plan_meals", "plan_items", "recipe_snapshots"]
+    sizes = _table_sizes(tables)
+
+    with SessionLocal() as db:
+        counts = {
+            "plan_meals": db.scalar(select(func.count()).select_from(PlanMeal)),
+            "plan_items": db.scalar(select(func.count()).select_from(PlanItem)),
+            "recipe_snapshots": db.scalar(select(func.count()).select_from(RecipeSnapshot)),
+        }
+        plan_ids = db.execute(select(Plan.id).order_by(Plan.id.desc()).limit(sample)).scalars().all()
+
+        timings = []
+        for pid in plan_ids:
+            started = time.perf_counter()
+            load_plan_meals(db, [pid])
+            timings.append((time.perf_counter() - started) * 1000)
+
+    report: Dict[str, Any] = {"rows": counts, "bytes": sizes}
+    if timings:
+        timings.sort()
+        report["read_ms"] = {
+            "plans": len(timings),
+            "p50": round(statistics.median(timings), 3),
+            "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        }
+    return report
+
+
+# Заповнення агрегатів для планів, збережених до їх появи
+def backfill_plan_aggregates(batch_size: int = 500) -> int:
+    """
+    Перераховує агрегатні колонки Plan та рядки PlanDay пачками (keyset за id),
+    тим самим кодом, що й запис плану. Повертає кількість оброблених планів.
+    """
+    upgrade()
+
+    done = 0
+    last_id = 0
+    while True:
+        with SessionLocal() as db:
+            plan_ids = db.execute(
+                select(Plan.id).where(Plan.id > last_id).order_by(Plan.id).limit(batch_size)
+            ).scalars().all()
+            if not plan_ids:
+                break
+
+            meals = load_plan_meals(db, plan_ids)
+            plan_rows, day_rows = [], []
+            for pid in plan_ids:
+                totals, days = plan_aggregates(meals[pid])
+                plan_rows.append({"id": pid, **totals})
+                day_rows.extend({"plan_id": pid, **d} for d in days)
+
+            db.execute(update(Plan), plan_rows)
+            db.execute(delete(PlanDay).where(PlanDay.plan_id.in_(plan_ids)))
+            if day_rows:
+                db.execute(insert(PlanDay), day_rows)
+            db.commit()
+
+            done += len(plan_ids)
+            last_id = plan_ids[-1]
+            print(f"… оброблено {done} планів (до #{last_id})")
+
+    return done
+
+
+# Одноразове злиття однакових профілів
+def dedupe_profiles(batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Рахує input_hash для профілів без нього (keyset за id). Профіль, чий хеш уже має
+    інший профіль (з хешем або раніший у пачці), зливається з ним: плани й архів
+    перепризначаються, дублікат видаляється. Унікальний індекс на input_hash при
+    цьому не порушується. Повторний запуск безпечний.
+    """
+    upgrade()
+
+    table = Profile.__table__
+    hashed = merged = 0
+    last_id = 0
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(Profile.id, *(getattr(Profile, f) for f in PROFILE_INPUT_FIELDS))
+                .where(Profile.id > last_id, Profile.input_hash.is_(None))
+                .order_by(Profile.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            hashes = {r.id: profile_input_hash(r._mapping) for r in rows}
+            keep: Dict[str, int] = dict(db.execute(
+                select(Profile.input_hash, Profile.id).where(Profile.input_hash.in_(set(hashes.values())))
+            ).all())
+            to_hash, remap = [], []
+            for pid, h in hashes.items():
+                if h in keep:
+                    remap.append({"old": pid, "new": keep[h]})
+                else:
+                    keep[h] = pid
+                    to_hash.append({"pid": pid, "h": h})
+
+            if remap:
+                # Перепризначаємо плани на профіль, що залишається
+                for model in (Plan, PlanArchive):
+                    t = model.__table__
+                    db.execute(
+                        update(t).where(t.c.user_id == bindparam("old")).values(user_id=bindparam("new")),
+                        remap,
+                    )
+                db.execute(delete(Profile).where(Profile.id.in_([m["old"] for m in remap])))
+            if to_hash:
+                db.execute(
+                    update(table).where(table.c.id == bindparam("pid")).values(input_hash=bindparam("h")),
+                    to_hash,
+                )
+            db.commit()
+
+            hashed += len(to_hash)
+            merged += len(remap)
+            last_id = rows[-1].id
+            print(f"… хеш пораховано для {hashed} профілів, злито {merged} дублікатів (до #{last_id})")
+
+    return {"hashed": hashed, "merged": merged}
+
+
+# Перерахунок BMR / TDEE / target_kcal після зміни коефіцієнтів
+def recompute_profile_targets(
+    batch_size: int = 5000,
+    checkpoint_path: str = ".recompute_targets.json",
+    restart: bool = False,
+) -> int:
+    """
+    Перераховує показники всіх профілів пачками (keyset за id): розрахунок над масивами
+    колонок пачки, запис — одним executemany UPDATE на пачку. Після кожної пачки
+    зберігається контрольна точка, тож перерваний запуск продовжується з неї.
+    Повертає кількість оброблених профілів.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    if restart:
+        checkpoint.clear()
+    state = checkpoint.load()
+    last_id = state.get("last_id", 0)
+    done = state.get("done", 0)
+
+    with SessionLocal() as db:
+        remaining = db.scalar(select(func.count()).select_from(Profile).where(Profile.id > last_id))
+    progress = Progress("перераховано профілів", total=remaining)
+
+    table = Profile.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("pid"))
+        .values(bmr=bindparam("b"), tdee=bindparam("t"), target_kcal=bindparam("k"))
+    )
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(
+                    Profile.id, Profile.sex, Profile.age, Profile.height_cm,
+                    Profile.weight_kg, Profile.activity_factor, Profile.goal,
+                )
+                .where(Profile.id > last_id)
+                .order_by(Profile.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            ids, sex, age, height, weight, activity, goal = zip(*rows)
+            bmr, tdee, target = calc_targets_batch(
+                np.array(sex, dtype=object), np.array(age, dtype=float),
+                np.array(height, dtype=float), np.array(weight, dtype=float),
+                np.array(activity, dtype=float), np.array(goal, dtype=object),
+            )
+            db.execute(stmt, [
+                {"pid": pid, "b": b, "t": t, "k": k}
+                for pid, b, t, k in zip(ids, bmr.tolist(), tdee.tolist(), target.tolist())
+            ])
+            db.commit()
+
+        last_id = ids[-1]
+        done += len(ids)
+        checkpoint.save({"last_id": last_id, "done": done})
+        progress.update(len(ids), note=f"до #{last_id}")
+
+    progress.report("готово")
+    checkpoint.clear()
+    return done
+
+
+# Оновлення поточних планів профілів (напр. вночі, до ранкового піку)
+def refresh_profile_plans(batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    Перегенеровує збережені плани профілів, які застаріли через зміну каталогу
+    чи даних профілю. Актуальні записи не чіпаються. Повертає лічильники.
+    """
+    batch_size = batch_size or settings.plan_cache_refresh_batch
+    upgrade()
+
+    checked = refreshed = 0
+    last_id = 0
+    while True:
+        with SessionLocal() as db:
+            version = get_catalog_version(db)
+            profiles = db.execute(
+                select(Profile)
+                .where(Profile.id > last_id, Profile.id.in_(select(ProfilePlanCache.profile_id)))
+                .order_by(Profile.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not profiles:
+                break
+
+            kinds: Dict[int, List[str]] = {}
+            for pid, kind in db.execute(
+                select(ProfilePlanCache.profile_id, ProfilePlanCache.kind)
+                .where(ProfilePlanCache.profile_id.in_([p.id for p in profiles]))
+            ):
+                kinds.setdefault(pid, []).append(kind)
+
+            for prof in profiles:
+                for kind in kinds.get(prof.id, []):
+                    if kind in PROFILE_PLAN_KINDS:
+                        checked += 1
+                        _, hit = current_profile_plan(db, prof, kind, version)
+                        refreshed += not hit
+            db.commit()
+
+            last_id = profiles[-1].id
+            print(f"… перевірено {checked} планів, оновлено {refreshed} (до профілю #{last_id})")
+
+    return {"checked": checked, "refreshed": refreshed}
+
+
+# Склад рецептів з описів (для перерахунку цін за інгредієнтами)
+def backfill_recipe_ingredients(batch_size: int = 200, overwrite: bool = False) -> Dict[str, int]:
+    """
+    Розбирає описи рецептів (keyset за id) у recipe_ingredients, створюючи відсутні
+    інгредієнти без ціни. Рецепти, що вже мають склад, пропускаються (якщо не overwrite).
+    """
+    upgrade()
+
+    recipes = ingredients_created = last_id = 0
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(Recipe.id, Recipe.description)
+                .where(Recipe.id > last_id).order_by(Recipe.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            ids = [r.id for r in rows]
+            if overwrite:
+                db.execute(delete(RecipeIngredient).where(RecipeIngredient.recipe_id.in_(ids)))
+            else:
+                has_items = set(db.scalars(
+                    select(RecipeIngredient.recipe_id).where(RecipeIngredient.recipe_id.in_(ids)).distinct()
+                ))
+                rows = [r for r in rows if r.id not in has_items]
+
+            parsed = {r.id: parse_description(r.description) for r in rows}
+            names = {ingredient_key(name): name for items in parsed.values() for name, _ in items}
+            if names:
+                known = {ingredient_key(n): iid for iid, n in db.execute(select(Ingredient.id, Ingredient.name))}
+                missing = [{"name": names[k]} for k in names if k not in known]
+                if missing:
+                    db.execute(insert(Ingredient), missing)
+                    ingredients_created += len(missing)
+                    known = {ingredient_key(n): iid for iid, n in db.execute(select(Ingredient.id, Ingredient.name))}
+
+                db.execute(insert(RecipeIngredient), [
+                    {"recipe_id": rid, "ingredient_id": known[ingredient_key(name)], "grams": grams}
+                    for rid, items in parsed.items() for name, grams in items
+                ])
+            db.commit()
+
+            recipes += len(parsed)
+            print(f"… склад розібрано для {recipes} рецептів (до #{last_id})")
+
+    return {"recipes": recipes, "ingredients": ingredients_created}
+
+
+def reprice_all_recipes(batch_size: int = 500) -> int:
+    """Перераховує ціни всіх рецептів, для яких відомі ціни всіх інгредієнтів."""
+    upgrade()
+    with SessionLocal() as db:
+        return reprice_recipes(db, batch_size=batch_size)
+
+
+# Розмір і час серіалізації плану: повний формат проти компактного
+def plan_encoding_report(days: int = 14, snacks: int = 2, kcal: int = 2200, repeat: int = 20) -> Dict[str, Any]:
+    """
+    Генерує тижневий план з каталогу й порівнює формати: байти (без стиснення, gzip,
+    br — якщо є brotli) та медіану часу серіалізації в мс.
+    """
+    import gzip
+    import json
+
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+
+    from compact import compact_plan
+    from compression import brotli
+    from routes.recipes import build_week_plan, load_pool
+    from schemas import WeekPlanIn
+
+    payload = WeekPlanIn(kcal=kcal, budget=10_000, snacks=snacks, days=days)
+    with SessionLocal() as db:
+        plan = build_week_plan(payload, load_pool(db, payload))
+
+    encoders = {
+        # Як відповідає FastAPI: jsonable_encoder + json.dumps без ASCII-екранування
+        "full": lambda: json.dumps(jsonable_encoder(plan), ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        "compact": lambda: orjson.dumps(compact_plan(plan)),
+    }
+    report: Dict[str, Any] = {"днів": days, "перекусів": snacks}
+    for name, encode in encoders.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = encode()
+            timings.append((time.perf_counter() - started) * 1000)
+        sizes = {"raw": len(body), "gzip": len(gzip.compress(body, 6))}
+        if brotli is not None:
+            sizes["br"] = len(brotli.compress(body, quality=4))
+        report[name] = {"bytes": sizes, "encode_ms_p50": round(statistics.median(timings), 3)}
+    return report
+
+
+def recipe_rows_report(repeat: int = 5) -> Dict[str, Any]:
+    """
+    Завантаження всього каталогу: ORM (Recipe -> RecipeRecord / RecipeOutUA) проти
+    Core-рядків (record_select -> RecipeRecord). Медіана часу в мс і пік пам'яті
+    (tracemalloc) на один прохід.
+    """
+    import tracemalloc
+
+    from catalog import load_catalog_records, record_from_recipe, recipe_to_ua_dict
+    from schemas import RecipeOutUA
+
+    def orm_records(db: Any) -> List[Any]:
+        return [record_from_recipe(r) for r in db.query(Recipe).order_by(Recipe.id)]
+
+    def orm_listing(db: Any) -> List[Any]:
+        items = [RecipeOutUA.model_validate(r) for r in db.query(Recipe).order_by(Recipe.id)]
+        return [i.model_dump(by_alias=True) for i in items]
+
+    def core_listing(db: Any) -> List[Any]:
+        return [recipe_to_ua_dict(r) for r in load_catalog_records(db)]
+
+    paths = {
+        "orm_records": orm_records,
+        "core_records": load_catalog_records,
+        "orm_listing": orm_listing,
+        "core_listing": core_listing,
+    }
+    with SessionLocal() as db:
+        report: Dict[str, Any] = {"рецептів": db.scalar(select(func.count()).select_from(Recipe))}
+    for name, load in paths.items():
+        timings = []
+        for _ in range(repeat):
+            # Нова сесія на прохід — як у запиті, без теплої identity map
+            with SessionLocal() as db:
+                started = time.perf_counter()
+                load(db)
+                timings.append((time.perf_counter() - started) * 1000)
+        # Пам'ять — окремим проходом: tracemalloc сповільнює виконання
+        with SessionLocal() as db:
+            tracemalloc.start()
+            load(db)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        report[name] = {"ms_p50": round(statistics.median(timings), 2), "peak_kb": round(peak / 1024, 1)}
+    return report
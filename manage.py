@@ -0,0 +1,227 @@
+"""
+Службові команди VitaCode.
+
+    python manage.py migrate
+    python manage.py migrate-plan-storage --batch 500
+    python manage.py plan-storage-report --sample 200
+    python manage.py plan-encoding-report [--days 14] [--snacks 2]
+    python manage.py backfill-plan-aggregates --batch 500
+    python manage.py archive-plans [--batch 500]
+    python manage.py restore-plan 123
+    python manage.py dedupe-profiles --batch 1000
+    python manage.py recompute-targets --batch 5000 [--checkpoint FILE] [--restart]
+    python manage.py refresh-plan-cache [--batch 200]
+    python manage.py export-catalog-snapshot [--path FILE]
+    python manage.py purge-idempotency-keys
+    python manage.py backfill-ingredients [--batch 200] [--overwrite]
+    python manage.py reprice-recipes [--batch 500]
+    python manage.py recipe-rows-report [--repeat 5]
+    python manage.py refresh-plan-templates [--batch 200]
+"""
+import argparse
+import json
+from typing import List, Optional
+
+
+def _cmd_migrate(args: argparse.Namespace) -> None:
+    from migrations import LATEST, upgrade
+
+    applied = upgrade()
+    if applied:
+        print(f"✅ Схему оновлено до версії {LATEST} (застосовано: {', '.join(map(str, applied))}).")
+    else:
+        print(f"✅ Схема актуальна (версія {LATEST}).")
+
+
+def _cmd_migrate_plan_storage(args: argparse.Namespace) -> None:
+    from maintenance import migrate_plan_storage
+
+    moved = migrate_plan_storage(batch_size=args.batch)
+    print(f"✅ Міграцію завершено: перенесено {moved} елементів планів.")
+
+
+def _cmd_plan_storage_report(args: argparse.Namespace) -> None:
+    from maintenance import plan_storage_report
+
+    print(json.dumps(plan_storage_report(sample=args.sample), ensure_ascii=False, indent=2))
+
+
+def _cmd_plan_encoding_report(args: argparse.Namespace) -> None:
+    from maintenance import plan_encoding_report
+
+    report = plan_encoding_report(days=args.days, snacks=args.snacks, repeat=args.repeat)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def _cmd_backfill_plan_aggregates(args: argparse.Namespace) -> None:
+    from maintenance import backfill_plan_aggregates
+
+    done = backfill_plan_aggregates(batch_size=args.batch)
+    print(f"✅ Агрегати перераховано для {done} планів.")
+
+
+def _cmd_archive_plans(args: argparse.Namespace) -> None:
+    from retention import archive_old_plans
+
+    archived = archive_old_plans(batch_size=args.batch)
+    print(f"✅ Архівовано планів: {archived}")
+
+
+def _cmd_restore_plan(args: argparse.Namespace) -> None:
+    from db import SessionLocal
+    from retention import restore_plan
+
+    with SessionLocal() as db:
+        plan = restore_plan(db, args.plan_id)
+    if plan is None:
+        raise SystemExit(f"План #{args.plan_id} не знайдено в архіві")
+    print(f"✅ План #{args.plan_id} відновлено.")
+
+
+def _cmd_dedupe_profiles(args: argparse.Namespace) -> None:
+    from maintenance import dedupe_profiles
+
+    result = dedupe_profiles(batch_size=args.batch)
+    print(f"✅ Профілі оброблено: хеш пораховано для {result['hashed']}, злито дублікатів {result['merged']}.")
+
+
+def _cmd_recompute_targets(args: argparse.Namespace) -> None:
+    from maintenance import recompute_profile_targets
+
+    done = recompute_profile_targets(
+        batch_size=args.batch, checkpoint_path=args.checkpoint, restart=args.restart,
+    )
+    print(f"✅ Показники перераховано для {done} профілів.")
+
+
+def _cmd_refresh_plan_cache(args: argparse.Namespace) -> None:
+    from maintenance import refresh_profile_plans
+
+    result = refresh_profile_plans(batch_size=args.batch)
+    print(f"✅ Перевірено планів: {result['checked']}, оновлено: {result['refreshed']}.")
+
+
+def _cmd_export_catalog_snapshot(args: argparse.Namespace) -> None:
+    from catalog_snapshot import export_snapshot
+    from db import SessionLocal
+    from settings import settings
+
+    path = args.path or settings.catalog_snapshot_path
+    if not path:
+        raise SystemExit("Вкажіть --path або CATALOG_SNAPSHOT_PATH")
+    with SessionLocal() as db:
+        version = export_snapshot(db, path)
+    print(f"✅ Знімок каталогу (версія {version}) записано в {path}.")
+
+
+def _cmd_purge_idempotency_keys(args: argparse.Namespace) -> None:
+    from idempotency import purge_expired_keys
+    from migrations import upgrade
+
+    upgrade()
+    print(f"✅ Видалено прострочених ключів ідемпотентності: {purge_expired_keys()}.")
+
+
+def _cmd_backfill_ingredients(args: argparse.Namespace) -> None:
+    from maintenance import backfill_recipe_ingredients
+
+    result = backfill_recipe_ingredients(batch_size=args.batch, overwrite=args.overwrite)
+    print(f"✅ Склад розібрано для {result['recipes']} рецептів, нових інгредієнтів: {result['ingredients']}.")
+
+
+def _cmd_reprice_recipes(args: argparse.Namespace) -> None:
+    from maintenance import reprice_all_recipes
+
+    changed = reprice_all_recipes(batch_size=args.batch)
+    print(f"✅ Ціну змінено для {changed} страв.")
+
+
+def _cmd_recipe_rows_report(args: argparse.Namespace) -> None:
+    from maintenance import recipe_rows_report
+
+    print(json.dumps(recipe_rows_report(repeat=args.repeat), ensure_ascii=False, indent=2))
+
+
+def _cmd_refresh_plan_templates(args: argparse.Namespace) -> None:
+    from plan_templates import refresh_templates
+
+    print(json.dumps(refresh_templates(batch_size=args.batch), ensure_ascii=False))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Службові команди VitaCode")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="Застосувати відсутні міграції схеми БД")
+    p.set_defaults(func=_cmd_migrate)
+
+    p = sub.add_parser("migrate-plan-storage", help="Перенести plan_meals у компактний формат")
+    p.add_argument("--batch", type=int, default=500, help="Кількість планів у транзакції")
+    p.set_defaults(func=_cmd_migrate_plan_storage)
+
+    p = sub.add_parser("plan-storage-report", help="Розмір таблиць планів і затримка читання")
+    p.add_argument("--sample", type=int, default=200, help="Скільки останніх планів читати")
+    p.set_defaults(func=_cmd_plan_storage_report)
+
+    p = sub.add_parser("plan-encoding-report", help="Розмір і час серіалізації плану: повний і компактний формат")
+    p.add_argument("--days", type=int, default=14, help="Днів у плані")
+    p.add_argument("--snacks", type=int, default=2, help="Перекусів на день")
+    p.add_argument("--repeat", type=int, default=20, help="Повторів для медіани часу")
+    p.set_defaults(func=_cmd_plan_encoding_report)
+
+    p = sub.add_parser("backfill-plan-aggregates", help="Заповнити агрегати планів та підсумки днів")
+    p.add_argument("--batch", type=int, default=500, help="Кількість планів у транзакції")
+    p.set_defaults(func=_cmd_backfill_plan_aggregates)
+
+    p = sub.add_parser("archive-plans", help="Перенести старі плани в архів (політики RETENTION_DAYS)")
+    p.add_argument("--batch", type=int, default=None, help="Кількість планів у транзакції")
+    p.set_defaults(func=_cmd_archive_plans)
+
+    p = sub.add_parser("restore-plan", help="Відновити план з архіву")
+    p.add_argument("plan_id", type=int)
+    p.set_defaults(func=_cmd_restore_plan)
+
+    p = sub.add_parser("dedupe-profiles", help="Порахувати хеші профілів і злити однакові профілі")
+    p.add_argument("--batch", type=int, default=1000, help="Кількість профілів у транзакції")
+    p.set_defaults(func=_cmd_dedupe_profiles)
+
+    p = sub.add_parser("recompute-targets", help="Перерахувати BMR/TDEE/ціль ккал усіх профілів")
+    p.add_argument("--batch", type=int, default=5000, help="Кількість профілів у транзакції")
+    p.add_argument("--checkpoint", default=".recompute_targets.json", help="Файл контрольної точки")
+    p.add_argument("--restart", action="store_true", help="Почати спочатку, ігноруючи контрольну точку")
+    p.set_defaults(func=_cmd_recompute_targets)
+
+    p = sub.add_parser("refresh-plan-cache", help="Перегенерувати застарілі поточні плани профілів")
+    p.add_argument("--batch", type=int, default=None, help="Кількість профілів у транзакції")
+    p.set_defaults(func=_cmd_refresh_plan_cache)
+
+    p = sub.add_parser("export-catalog-snapshot", help="Записати бінарний знімок каталогу для воркерів")
+    p.add_argument("--path", default=None, help="Файл знімка (за замовчуванням CATALOG_SNAPSHOT_PATH)")
+    p.set_defaults(func=_cmd_export_catalog_snapshot)
+
+    p = sub.add_parser("purge-idempotency-keys", help="Видалити прострочені ключі ідемпотентності")
+    p.set_defaults(func=_cmd_purge_idempotency_keys)
+
+    p = sub.add_parser("backfill-ingredients", help="Розібрати склад рецептів з описів у recipe_ingredients")
+    p.add_argument("--batch", type=int, default=200, help="Рецептів у транзакції")
+    p.add_argument("--overwrite", action="store_true", help="Перезаписати вже заповнений склад")
+    p.set_defaults(func=_cmd_backfill_ingredients)
+
+    p = sub.add_parser("reprice-recipes", help="Перерахувати ціни страв за цінами інгредієнтів")
+    p.add_argument("--batch", type=int, default=500, help="Рецептів у транзакції")
+    p.set_defaults(func=_cmd_reprice_recipes)
+
+    p = sub.add_parser("recipe-rows-report", help="Завантаження каталогу: ORM проти Core-рядків (час і пам'ять)")
+    p.add_argument("--repeat", type=int, default=5, help="Повторів для медіани часу")
+    p.set_defaults(func=_cmd_recipe_rows_report)
+
+    p = sub.add_parser("refresh-plan-templates", help="Згенерувати сітку шаблонів планів (PLAN_TEMPLATE_*)")
+    p.add_argument("--batch", type=int, default=200, help="Шаблонів у транзакції")
+    p.set_defaults(func=_cmd_refresh_plan_templates)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
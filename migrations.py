@@ -0,0 +1,171 @@
+"""
+Версійні міграції схеми БД (MySQL і SQLite).
+
+Застосована версія зберігається в таблиці schema_version. upgrade() при актуальній
+схемі робить один запит і виходить; інакше бере іменоване блокування MySQL
+(GET_LOCK), перечитує версію й по черзі застосовує відсутні кроки, кожен — у власній
+транзакції. DDL у MySQL комітиться неявно, тож саме блокування (а не транзакції чи
+перевірки «чи є таблиця») не дає воркерам, що стартують одночасно, виконувати ті самі
+кроки. На SQLite блокування немає: вона розрахована на один процес (розробка).
+
+Нова зміна схеми = нова функція у MIGRATIONS з наступним номером.
+"""
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column, Connection, DateTime, Engine, Integer, MetaData, String, Table, func, inspect,
+    literal, select, text, update,
+)
+from sqlalchemy.exc import DBAPIError
+
+import models  # noqa: F401 — реєструє всі таблиці в Base.metadata
+from db import Base, engine as default_engine
+
+# Окрема metadata: таблиця версій не входить у моделі застосунку
+_meta = MetaData()
+schema_version = Table(
+    "schema_version", _meta,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, server_default=func.now()),
+)
+
+
+def _create_tables(conn: Connection) -> None:
+    """Усі таблиці моделей, яких ще нема."""
+    Base.metadata.create_all(bind=conn, checkfirst=True)
+
+
+def _column_ddl(conn: Connection, column: Column) -> str:
+    """Опис колонки для ALTER TABLE ADD COLUMN (константний DEFAULT — лише для скалярних default)."""
+    dialect = conn.dialect
+    ddl = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect)}"
+    default = column.default
+    if default is not None and default.is_scalar:
+        value = literal(default.arg, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}"
+    return ddl
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    """Колонки, додані в моделі після створення таблиць (create_all їх не додає)."""
+    insp = inspect(conn)
+    existing_tables = set(insp.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                conn.execute(text(f"ALTER TABLE {conn.dialect.identifier_preparer.quote(table.name)} "
+                                  f"ADD COLUMN {_column_ddl(conn, column)}"))
+
+
+def _create_missing_indexes(conn: Connection) -> None:
+    """Індекси, оголошені в моделях (index=True / Index(...)), яких ще нема в БД."""
+    insp = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=conn)
+
+
+def _create_ingredient_tables(conn: Connection) -> None:
+    """Інгредієнти та склад рецептів (для перерахунку цін)."""
+    Base.metadata.create_all(bind=conn, tables=[
+        Base.metadata.tables["ingredients"], Base.metadata.tables["recipe_ingredients"],
+    ], checkfirst=True)
+
+
+def _create_idempotency_table(conn: Connection) -> None:
+    """Ключі ідемпотентності та збережені відповіді."""
+    Base.metadata.create_all(bind=conn, tables=[Base.metadata.tables["idempotency_keys"]], checkfirst=True)
+
+
+def _create_plan_template_table(conn: Connection) -> None:
+    """Готові плани для типових запитів."""
+    Base.metadata.create_all(bind=conn, tables=[Base.metadata.tables["plan_templates"]], checkfirst=True)
+
+
+def _backfill_plan_created_at(conn: Connection) -> None:
+    """
+    plans.created_at, доданий кроком 2 без значення для наявних рядків. Справжній час
+    старих планів ніде не збережений, тож береться час міграції — інакше такі плани
+    не потрапляли б ні в архівацію, ні в аналітику по днях.
+    """
+    plans = Base.metadata.tables["plans"]
+    conn.execute(update(plans).where(plans.c.created_at.is_(None)).values(created_at=func.now()))
+
+
+# (версія, назва, крок)
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "таблиці моделей", _create_tables),
+    (2, "колонки, додані після створення таблиць", _add_missing_columns),
+    (3, "індекси гарячих запитів", _create_missing_indexes),
+    (4, "інгредієнти та склад рецептів", _create_ingredient_tables),
+    (5, "ключі ідемпотентності", _create_idempotency_table),
+    (6, "шаблони планів", _create_plan_template_table),
+    (7, "час створення старих планів", _backfill_plan_created_at),
+]
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(conn: Connection) -> Optional[int]:
+    """Застосована версія схеми; None — таблиці версій ще нема."""
+    try:
+        return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except DBAPIError:
+        conn.rollback()
+        return None
+
+
+# Іменоване блокування MySQL на час міграцій і скільки секунд його чекати
+MIGRATION_LOCK = "vitacode.schema_migrations"
+MIGRATION_LOCK_TIMEOUT_S = 600
+
+
+@contextmanager
+def _migration_lock(bind: Engine) -> Iterator[None]:
+    """Один процес застосовує міграції, решта чекає (MySQL GET_LOCK; SQLite — без блокування)."""
+    if bind.dialect.name != "mysql":
+        yield
+        return
+    with bind.connect() as conn:
+        got = conn.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"),
+            {"name": MIGRATION_LOCK, "timeout": MIGRATION_LOCK_TIMEOUT_S},
+        ).scalar()
+        if got != 1:
+            raise RuntimeError(f"Не дочекалися блокування міграцій {MIGRATION_LOCK!r}")
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK})
+
+
+def upgrade(bind: Optional[Engine] = None) -> List[int]:
+    """Доводить схему до LATEST; повертає номери застосованих міграцій."""
+    bind = bind or default_engine
+    with bind.connect() as conn:
+        version = current_version(conn)
+    if version == LATEST:
+        return []
+
+    applied = []
+    with _migration_lock(bind):
+        # Поки чекали на блокування, міграції міг застосувати інший процес
+        with bind.begin() as conn:
+            _meta.create_all(bind=conn, checkfirst=True)
+            version = current_version(conn) or 0
+
+        for number, name, step in MIGRATIONS:
+            if number <= version:
+                continue
+            with bind.begin() as conn:
+                step(conn)
+                conn.execute(schema_version.insert().values(version=number, name=name))
+            applied.append(number)
+            print(f"… міграцію {number} застосовано: {name}")
+    return applied
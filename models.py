@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, JSON, ForeignKey, Boolean
-from sqlalchemy.orm import relationship, DeclarativeBase
+from sqlalchemy import (
+    Column, Integer, SmallInteger, String, Float, JSON, ForeignKey, Boolean, DateTime, LargeBinary, Index, func,
+)
+from sqlalchemy.orm import relationship
 
-class Base(DeclarativeBase):
-    pass
+from db import Base
 
 # Таблиця: Користувачі
 class Profile(Base):
@@ -27,6 +28,15 @@ class Profile(Base):
     tdee = Column(Float, default=0.0)
     target_kcal = Column(Float, default=0.0)
 
+    # sha1 нормалізованих вхідних даних (див. routes.users.profile_input_hash)
+    input_hash = Column(String(40), nullable=True, unique=True, index=True)
+
+    __table_args__ = (
+        # Фільтри списку профілів + сторінки за id
+        Index("ix_profiles_goal_sex_id", "goal", "sex", "id"),
+        Index("ix_profiles_age_id", "age", "id"),
+    )
+
 
 
 # Таблиця: Рецепти 
@@ -47,23 +57,116 @@ class Recipe(Base):
     allergens = Column(JSON, default=list)     
 
 
+# Таблиця: Інгредієнти (ціни постачальників)
+class Ingredient(Base):
+    __tablename__ = "ingredients"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(150), nullable=False, unique=True)
+    price_per_kg = Column(Float, nullable=True)  # грн за кг (л); NULL — ціна ще не задана
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+# Таблиця: Склад рецептів (грами інгредієнта на порцію)
+class RecipeIngredient(Base):
+    __tablename__ = "recipe_ingredients"
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    ingredient_id = Column(Integer, ForeignKey("ingredients.id"), primary_key=True)
+    grams = Column(Float, nullable=False, default=0.0)  # 0 — кількість не вказана (зелень, спеції)
+
+    __table_args__ = (
+        # Зворотний індекс: які рецепти зачіпає зміна ціни інгредієнта
+        Index("ix_recipe_ingredients_ingredient_id", "ingredient_id", "recipe_id"),
+    )
+
+
 # Таблиця: Збережені плани (Plans)
 class Plan(Base):
     __tablename__ = "plans"
 
     id = Column(Integer, primary_key=True, index=True)
     kind = Column(String(20), default="day") 
-    user_id = Column(Integer, nullable=True) 
+    user_id = Column(Integer, nullable=True, index=True)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
     total_kcal = Column(Float, default=0.0)
     total_price = Column(Float, default=0.0)
+
+    # Денормалізовані агрегати (оновлюються при записі плану)
+    total_protein_g = Column(Float, default=0.0)
+    total_fat_g = Column(Float, default=0.0)
+    total_carbs_g = Column(Float, default=0.0)
+    items_count = Column(Integer, default=0)
+    days_count = Column(Integer, default=0)
+    kcal_breakfast = Column(Float, default=0.0)
+    kcal_lunch = Column(Float, default=0.0)
+    kcal_dinner = Column(Float, default=0.0)
+    kcal_snack = Column(Float, default=0.0)
+
+    days = relationship("PlanDay", back_populates="plan", cascade="all, delete-orphan")
+    items = relationship("PlanItem", back_populates="plan", cascade="all, delete-orphan")
+    # Старий формат (повні копії полів); заповнюється лише до міграції
     meals = relationship("PlanMeal", back_populates="plan", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # GET /plans?user_id=… (сторінки за id) та архівація за типом і датою
+        Index("ix_plans_user_id_id", "user_id", "id"),
+        Index("ix_plans_kind_created_at", "kind", "created_at"),
+    )
+
+
+# Таблиця: Підсумки плану по днях
+class PlanDay(Base):
+    __tablename__ = "plan_days"
+
+    plan_id = Column(Integer, ForeignKey("plans.id"), primary_key=True)
+    day_index = Column(SmallInteger, primary_key=True)
+    kcal = Column(Float, default=0.0)
+    price = Column(Float, default=0.0)
+    protein_g = Column(Float, default=0.0)
+    fat_g = Column(Float, default=0.0)
+    carbs_g = Column(Float, default=0.0)
+    items_count = Column(Integer, default=0)
+
+    plan = relationship("Plan", back_populates="days")
+
+
+# Таблиця: Знімки рецептів (ціни та БЖВ на момент створення плану)
+class RecipeSnapshot(Base):
+    __tablename__ = "recipe_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipe_id = Column(Integer, nullable=True, index=True)  # NULL — довільна страва з POST /plans
+    version = Column(Integer, default=1)
+    content_hash = Column(String(40), nullable=False, unique=True)
+    name = Column(String(150))
+    meal_type = Column(String(50))
+    kcal = Column(Float)
+    protein_g = Column(Float)
+    fat_g = Column(Float)
+    carbs_g = Column(Float)
+    price = Column(Float)
+    weight_g = Column(Float, default=0.0)
+    description = Column(String(500), default="")
+
+
+# Таблиця: Елементи плану (компактно — лише посилання на знімок)
+class PlanItem(Base):
+    __tablename__ = "plan_items"
+
+    plan_id = Column(Integer, ForeignKey("plans.id"), primary_key=True)
+    day_index = Column(SmallInteger, primary_key=True)
+    slot = Column(SmallInteger, primary_key=True)
+    snapshot_id = Column(Integer, ForeignKey("recipe_snapshots.id"), nullable=False)
+
+    plan = relationship("Plan", back_populates="items")
+
 
 class PlanMeal(Base):
     __tablename__ = "plan_meals"
 
     id = Column(Integer, primary_key=True, index=True)
-    plan_id = Column(Integer, ForeignKey("plans.id"), nullable=False)
+    plan_id = Column(Integer, ForeignKey("plans.id"), nullable=False, index=True)
     day_index = Column(Integer, default=1)  
     name = Column(String(150))
     meal_type = Column(String(50))
@@ -75,4 +178,68 @@ class PlanMeal(Base):
     weight_g = Column(Float, default=0.0)
     description = Column(String(500), default="")
 
-    plan = relationship("Plan", back_populates="meals")
\ No newline at end of file
+    plan = relationship("Plan", back_populates="meals")
+
+
+# Таблиця: Архів планів (стиснутий JSON плану з елементами)
+class PlanArchive(Base):
+    __tablename__ = "plans_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # той самий id, що був у plans
+    kind = Column(String(20), default="day")
+    user_id = Column(Integer, nullable=True, index=True)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, server_default=func.now())
+    payload = Column(LargeBinary(length=2**24), nullable=False)
+
+
+
+# Таблиця: Версія каталогу страв (один рядок; збільшується при зміні рецептів)
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # завжди 1
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+# Таблиця: Поточний план профілю (кеш генератора)
+class ProfilePlanCache(Base):
+    __tablename__ = "profile_plan_cache"
+
+    profile_id = Column(Integer, ForeignKey("profiles.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String(20), primary_key=True, default="day")
+    cache_key = Column(String(40), nullable=False)     # хеш вхідних даних генератора
+    catalog_version = Column(Integer, nullable=False)  # версія каталогу на момент генерації
+    payload = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+# Таблиця: Ключі ідемпотентності (Idempotency-Key) і збережені відповіді
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key_hash = Column(String(40), primary_key=True)      # sha1(метод, шлях, ключ клієнта)
+    fingerprint = Column(String(40), nullable=False)     # sha1 запиту: query + тіло
+    status = Column(String(10), nullable=False, default="pending")  # pending / done
+    locked_until = Column(DateTime, nullable=True)       # до коли pending-запис належить воркеру
+    status_code = Column(Integer, nullable=True)
+    headers = Column(JSON, nullable=True)
+    body = Column(LargeBinary(length=2**24), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+# Таблиця: Готові плани для типових запитів (див. plan_templates.py)
+class PlanTemplate(Base):
+    __tablename__ = "plan_templates"
+
+    diet_tags = Column(String(100), primary_key=True, default="")   # теґи через кому, за абеткою
+    allergens = Column(String(100), primary_key=True, default="")   # алергени через кому, за абеткою
+    kcal = Column(Integer, primary_key=True, autoincrement=False)   # відро ккал
+    budget = Column(Integer, primary_key=True, autoincrement=False) # відро бюджету, грн/день
+    snacks = Column(SmallInteger, primary_key=True, autoincrement=False)
+    pool_hash = Column(String(40), nullable=False)      # відбиток пулу страв, з якого згенеровано
+    catalog_version = Column(Integer, nullable=False)   # версія каталогу, для якої шаблон актуальний
+    days = Column(JSON, nullable=False)                 # [[ід страви, ...], ...] по днях
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
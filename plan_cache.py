@@ -0,0 +1,96 @@
+"""
+Поточний план профілю: збережений результат генератора для профілю.
+
+Запис вважається актуальним, поки не змінилися вхідні дані генератора (ціль ккал,
+бюджет, алергени — див. plan_cache_key) та версія каталогу страв.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from jobs import RunnerLock
+from models import ProfilePlanCache
+from settings import settings
+
+
+def plan_cache_key(payload: BaseModel) -> str:
+    """Хеш вхідних даних генератора (DayPlanIn / WeekPlanIn)."""
+    raw = payload.model_dump_json()
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_plan(
+    db: Session, profile_id: int, kind: str, cache_key: str, catalog_version: int,
+) -> Optional[Dict[str, Any]]:
+    """Збережений план, якщо він згенерований з тих самих даних і тієї самої версії каталогу."""
+    row = db.execute(
+        select(ProfilePlanCache.cache_key, ProfilePlanCache.catalog_version, ProfilePlanCache.payload)
+        .where(ProfilePlanCache.profile_id == profile_id, ProfilePlanCache.kind == kind)
+    ).first()
+    if row is None or row.cache_key != cache_key or row.catalog_version != catalog_version:
+        return None
+    return row.payload
+
+
+def store_plan(
+    db: Session, profile_id: int, kind: str, cache_key: str, catalog_version: int, plan: Dict[str, Any],
+) -> None:
+    """Записує поточний план профілю (коміт — за викликачем)."""
+    values = {"cache_key": cache_key, "catalog_version": catalog_version, "payload": plan}
+    row = db.get(ProfilePlanCache, (profile_id, kind))
+    if row is not None:
+        for k, v in values.items():
+            setattr(row, k, v)
+        return
+    try:
+        with db.begin_nested():
+            db.add(ProfilePlanCache(profile_id=profile_id, kind=kind, **values))
+    except IntegrityError:
+        # Паралельний запит уже записав план — він не гірший за наш
+        pass
+
+
+def _seconds_until(hour: int) -> float:
+    now = datetime.now()
+    run_at = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return (run_at - now).total_seconds()
+
+
+# Власник блокування — єдиний процес, що оновлює плани профілів
+REFRESH_LOCK = "vitacode.plan_cache_refresh"
+
+
+def start_plan_cache_worker() -> Optional[threading.Thread]:
+    """
+    Щоденне оновлення застарілих планів о PLAN_CACHE_REFRESH_HOUR (до ранкового піку).
+    Потік є в кожному воркері, але оновлює лише власник REFRESH_LOCK.
+    """
+    hour = settings.plan_cache_refresh_hour
+    if hour < 0:
+        return None
+
+    lock = RunnerLock(REFRESH_LOCK)
+
+    def loop() -> None:
+        from maintenance import refresh_profile_plans
+
+        while True:
+            time.sleep(_seconds_until(hour))
+            try:
+                if lock.held():
+                    refresh_profile_plans()
+            except Exception as exc:  # задача не повинна зупиняти застосунок
+                print(f"plan-cache: помилка оновлення: {exc}")
+
+    thread = threading.Thread(target=loop, name="plan-cache-refresh", daemon=True)
+    thread.start()
+    return thread
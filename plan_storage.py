@@ -0,0 +1,231 @@
+"""Збереження та відновлення планів (компактний формат зі знімками рецептів)."""
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Plan, PlanDay, PlanMeal, PlanItem, RecipeSnapshot
+
+
+# Поля страви, які фіксуються у знімку рецепта
+SNAPSHOT_FIELDS = (
+    "recipe_id", "name", "meal_type", "kcal", "protein_g", "fat_g",
+    "carbs_g", "price", "weight_g", "description",
+)
+TEXT_FIELDS = ("name", "meal_type", "description")
+
+
+def meal_rows_from_days(days: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Перетворює дні згенерованого плану (UA-ключі) на рядки елементів плану.
+    Згруповані елементи (count > 1) розгортаються назад в окремі страви.
+    """
+    rows: List[Dict[str, Any]] = []
+    for day_index, day in enumerate(days, start=1):
+        for item in day["елементи"]:
+            count = item.get("count", 1)
+            row = {
+                "day_index": day_index,
+                "recipe_id": item.get("ід"),
+                "name": item["назва"],
+                "meal_type": item["тип прийому"],
+                "kcal": item["ккал"] / count,
+                "protein_g": item["білки г"] / count,
+                "fat_g": item["жири г"] / count,
+                "carbs_g": item["вуглеводи г"] / count,
+                "price": item["ціна грн"] / count,
+                "weight_g": item.get("вага г", 0) / count,
+                "description": item.get("опис", ""),
+            }
+            rows.extend(dict(row) for _ in range(count))
+    return rows
+
+
+def snapshot_hash(meal: Dict[str, Any]) -> str:
+    """Хеш вмісту знімка: однакові страви з однаковими цінами/БЖВ дають один запис."""
+    values: List[Any] = [meal.get("recipe_id")]
+    for f in SNAPSHOT_FIELDS[1:]:
+        v = meal.get(f)
+        values.append(str(v or "") if f in TEXT_FIELDS else round(float(v or 0), 3))
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _insert_snapshots(db: Session, missing: Dict[str, Dict[str, Any]]) -> None:
+    # Наступна версія для кожного recipe_id
+    recipe_ids = {m["recipe_id"] for m in missing.values() if m.get("recipe_id") is not None}
+    last: Dict[int, int] = {}
+    if recipe_ids:
+        last = dict(db.execute(
+            select(RecipeSnapshot.recipe_id, func.max(RecipeSnapshot.version))
+            .where(RecipeSnapshot.recipe_id.in_(recipe_ids))
+            .group_by(RecipeSnapshot.recipe_id)
+        ).all())
+
+    rows = []
+    for h, m in missing.items():
+        rid = m.get("recipe_id")
+        version = 1
+        if rid is not None:
+            version = last.get(rid, 0) + 1
+            last[rid] = version
+        row = {f: m.get(f) for f in SNAPSHOT_FIELDS}
+        row.update(content_hash=h, version=version, weight_g=m.get("weight_g") or 0, description=m.get("description") or "")
+        rows.append(row)
+
+    db.execute(insert(RecipeSnapshot), rows)
+
+
+def ensure_snapshots(db: Session, meals: List[Dict[str, Any]]) -> List[int]:
+    """
+    Повертає snapshot_id для кожного елемента.
+    Відсутні знімки вставляються одним executemany; існуючі перевикористовуються.
+    """
+    hashes = [snapshot_hash(m) for m in meals]
+    unique = dict(zip(hashes, meals))
+
+    def lookup(keys: Iterable[str]) -> Dict[str, int]:
+        return dict(db.execute(
+            select(RecipeSnapshot.content_hash, RecipeSnapshot.id)
+            .where(RecipeSnapshot.content_hash.in_(list(keys)))
+        ).all())
+
+    found = lookup(unique)
+    missing = {h: m for h, m in unique.items() if h not in found}
+    if missing:
+        try:
+            with db.begin_nested():
+                _insert_snapshots(db, missing)
+        except IntegrityError:
+            # Паралельний запит уже вставив частину знімків — пробуємо ще раз
+            found.update(lookup(missing))
+            missing = {h: m for h, m in missing.items() if h not in found}
+            if missing:
+                _insert_snapshots(db, missing)
+        found.update(lookup(missing))
+
+    return [found[h] for h in hashes]
+
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack")
+
+
+def plan_aggregates(meals: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Агрегати плану (колонки Plan) та підсумки по днях (рядки PlanDay)."""
+    totals: Dict[str, Any] = {
+        "total_kcal": 0.0, "total_price": 0.0,
+        "total_protein_g": 0.0, "total_fat_g": 0.0, "total_carbs_g": 0.0,
+        "items_count": len(meals),
+        **{f"kcal_{t}": 0.0 for t in MEAL_TYPES},
+    }
+    days: Dict[int, Dict[str, Any]] = {}
+
+    for m in meals:
+        kcal, price = float(m["kcal"] or 0), float(m["price"] or 0)
+        p, f, c = float(m["protein_g"] or 0), float(m["fat_g"] or 0), float(m["carbs_g"] or 0)
+
+        totals["total_kcal"] += kcal
+        totals["total_price"] += price
+        totals["total_protein_g"] += p
+        totals["total_fat_g"] += f
+        totals["total_carbs_g"] += c
+        if m["meal_type"] in MEAL_TYPES:
+            totals[f"kcal_{m['meal_type']}"] += kcal
+
+        day = days.setdefault(m["day_index"], {
+            "day_index": m["day_index"], "kcal": 0.0, "price": 0.0,
+            "protein_g": 0.0, "fat_g": 0.0, "carbs_g": 0.0, "items_count": 0,
+        })
+        day["kcal"] += kcal
+        day["price"] += price
+        day["protein_g"] += p
+        day["fat_g"] += f
+        day["carbs_g"] += c
+        day["items_count"] += 1
+
+    totals["days_count"] = len(days)
+    return totals, [days[d] for d in sorted(days)]
+
+
+def persist_plan(
+    db: Session,
+    kind: str,
+    user_id: Optional[int],
+    meals: List[Dict[str, Any]],
+    plan_id: Optional[int] = None,
+    created_at: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Зберігає план у компактному форматі: рядок Plan з агрегатами + executemany для
+    PlanItem (посилання на знімки рецептів) і PlanDay. Кількість запитів не залежить
+    від розміру плану. plan_id/created_at задаються лише при відновленні з архіву.
+    Коміт робить викликач (щоб план потрапив у ту ж транзакцію, що й генерація).
+    Повертає словник у форматі PlanOut без повторного читання з БД.
+    """
+    totals, day_rows = plan_aggregates(meals)
+    if created_at is None:
+        created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    snapshot_ids = ensure_snapshots(db, meals)
+
+    values = dict(kind=kind, user_id=user_id, created_at=created_at, **totals)
+    if plan_id is not None:
+        values["id"] = plan_id
+    plan_id = db.execute(insert(Plan).values(**values)).inserted_primary_key[0]
+
+    items = []
+    slots: Dict[int, int] = {}
+    for m, snapshot_id in zip(meals, snapshot_ids):
+        slot = slots.get(m["day_index"], 0)
+        slots[m["day_index"]] = slot + 1
+        items.append({
+            "plan_id": plan_id,
+            "day_index": m["day_index"],
+            "slot": slot,
+            "snapshot_id": snapshot_id,
+        })
+    db.execute(insert(PlanItem), items)
+    db.execute(insert(PlanDay), [{"plan_id": plan_id, **d} for d in day_rows])
+
+    return {"id": plan_id, "kind": kind, "user_id": user_id, "created_at": created_at, **totals}
+
+
+def load_plan_meals(db: Session, plan_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Відновлює елементи планів (формат PlanMealOut) для списку планів —
+    по одному запиту на компактні та старі рядки, незалежно від кількості планів.
+    """
+    out: Dict[int, List[Dict[str, Any]]] = {pid: [] for pid in plan_ids}
+    if not plan_ids:
+        return out
+
+    compact = db.execute(
+        select(
+            PlanItem.plan_id, PlanItem.day_index, PlanItem.slot,
+            *(getattr(RecipeSnapshot, f) for f in SNAPSHOT_FIELDS),
+        )
+        .join(RecipeSnapshot, RecipeSnapshot.id == PlanItem.snapshot_id)
+        .where(PlanItem.plan_id.in_(plan_ids))
+        .order_by(PlanItem.plan_id, PlanItem.day_index, PlanItem.slot)
+    ).mappings()
+    for row in compact:
+        out[row["plan_id"]].append(dict(row))
+
+    legacy = db.execute(
+        select(PlanMeal)
+        .where(PlanMeal.plan_id.in_(plan_ids))
+        .order_by(PlanMeal.plan_id, PlanMeal.day_index, PlanMeal.id)
+    ).scalars()
+    for m in legacy:
+        out[m.plan_id].append({
+            "id": m.id, "day_index": m.day_index, "name": m.name,
+            "meal_type": m.meal_type, "kcal": m.kcal, "protein_g": m.protein_g,
+            "fat_g": m.fat_g, "carbs_g": m.carbs_g, "price": m.price,
+            "weight_g": m.weight_g or 0, "description": m.description or "",
+        })
+
+    return out
@@ -0,0 +1,248 @@
+"""
+Готові плани для типових запитів: сітка (дієт-теґи, алергени, відро ккал, відро
+бюджету, перекуси) з PLAN_TEMPLATE_*.
+
+Матеріалізатор генерує кожен шаблон звичайним генератором на PLAN_TEMPLATE_DAYS днів
+і зберігає лише ід страв по днях у plan_templates. Тижневий план на N днів — перші N
+днів шаблону, денний — перший день (генератор дає ті самі дні). Запит, що потрапляє у
+відро, обслуговується пошуком шаблону; різниця між ціллю ккал і відром
+добирається заміною однієї страви дня (див. routes.recipes.template_days), а якщо її
+не досить — план складає генератор.
+
+При зміні версії каталогу шаблон перегенеровується, лише якщо змінився його пул
+страв (склад, ккал, ціни); решті просто переноситься версія. Фонову матеріалізацію
+веде один процес (MySQL GET_LOCK); воркери застосунку лише шукають шаблони.
+"""
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from cache import LRUCache, register_invalidation
+from catalog import RecipeRecord, filter_records, get_catalog_version, load_catalog_records
+from db import SessionLocal
+from jobs import RunnerLock
+from models import PlanTemplate
+from schemas import DayPlanIn, WeekPlanIn
+from settings import settings
+
+
+class TemplateKey(NamedTuple):
+    diet_tags: str   # через кому, за абеткою
+    allergens: str
+    kcal: int
+    budget: int
+    snacks: int
+
+
+def _norm(values: Any) -> str:
+    """Набір теґів/алергенів -> канонічний рядок ключа (через кому, за абеткою)."""
+    if isinstance(values, str):
+        values = values.split(",")
+    return ",".join(sorted({v.strip() for v in values if v and v.strip()}))
+
+
+def template_grid() -> List[TemplateKey]:
+    diets = sorted({_norm(d) for d in settings.plan_template_diets})
+    allergen_sets = sorted({_norm(a) for a in settings.plan_template_allergens})
+    return [
+        TemplateKey(d, a, k, b, s)
+        for d in diets for a in allergen_sets
+        for k in sorted(set(settings.plan_template_kcal))
+        for b in sorted(set(settings.plan_template_budgets))
+        for s in sorted(set(settings.plan_template_snacks))
+    ]
+
+
+def match_key(payload: DayPlanIn) -> Optional[TemplateKey]:
+    """Відро сітки для запиту або None, якщо запит у сітку не потрапляє."""
+    if not settings.plan_templates:
+        return None
+    diet = _norm(payload.diet_tags or ())
+    allergens = _norm(payload.exclude_allergens or ())
+    if diet not in {_norm(d) for d in settings.plan_template_diets}:
+        return None
+    if allergens not in {_norm(a) for a in settings.plan_template_allergens}:
+        return None
+    if payload.snacks not in settings.plan_template_snacks:
+        return None
+    kcal = min(settings.plan_template_kcal, key=lambda k: abs(k - payload.kcal), default=None)
+    if kcal is None or abs(kcal - payload.kcal) > settings.plan_template_kcal_tolerance:
+        return None
+    # План з меншого бюджету вкладається і в більший, але з відра набагато нижче бюджету
+    # вийшов би біднішим за план генератора
+    budgets = [
+        b for b in settings.plan_template_budgets
+        if payload.budget - settings.plan_template_budget_tolerance <= b <= payload.budget
+    ]
+    if not budgets:
+        return None
+    return TemplateKey(diet, allergens, kcal, max(budgets), payload.snacks)
+
+
+def template_payload(key: TemplateKey) -> WeekPlanIn:
+    return WeekPlanIn(
+        kcal=key.kcal, budget=key.budget, snacks=key.snacks, days=settings.plan_template_days,
+        diet_tags=key.diet_tags.split(",") if key.diet_tags else [],
+        exclude_allergens=key.allergens.split(",") if key.allergens else [],
+    )
+
+
+def pool_hash(pool: List[RecipeRecord]) -> str:
+    """Відбиток того, від чого залежить вибір генератора: порядок, типи, ккал і ціни страв."""
+    h = hashlib.sha1()
+    for r in pool:
+        h.update(f"{r.id}:{r.meal_type}:{r.kcal!r}:{r.price!r};".encode())
+    return h.hexdigest()
+
+
+def _where_key(key: TemplateKey) -> Any:
+    return and_(*(getattr(PlanTemplate, f) == v for f, v in key._asdict().items()))
+
+
+# Шаблони в пам'яті процесу: (версія каталогу, ключ) -> дні; промахи — окремо, з TTL,
+# щоб шаблон, дописаний матеріалізатором, підхопився без зміни каталогу
+_templates = LRUCache(maxsize=settings.plan_template_cache_size)
+_misses = LRUCache(maxsize=settings.plan_template_cache_size, ttl=settings.plan_template_check_s)
+register_invalidation("plan_templates", _templates.clear)
+register_invalidation("plan_templates.misses", _misses.clear)
+
+
+def lookup(db: Session, key: TemplateKey, catalog_version: int) -> Optional[List[List[int]]]:
+    """Дні шаблону (ід страв), якщо він згенерований для цієї версії каталогу."""
+    cache_key = (catalog_version, key)
+    days = _templates.get(cache_key)
+    if days is not None or _misses.get(cache_key):
+        return days
+    days = db.scalar(
+        select(PlanTemplate.days).where(_where_key(key), PlanTemplate.catalog_version == catalog_version)
+    )
+    if days is None:
+        _misses.set(cache_key, True)
+    else:
+        _templates.set(cache_key, days)
+    return days
+
+
+def _generate(key: TemplateKey, pool: List[RecipeRecord]) -> Optional[List[List[int]]]:
+    from feasibility import classify, summarize_pool
+    from routes.recipes import build_week_plan
+
+    payload = template_payload(key)
+    if not pool or classify(summarize_pool(pool), payload)["статус"] == "infeasible":
+        return None  # такі запити й так отримують 422 від генератора
+    plan = build_week_plan(payload, pool)
+    return [[item["ід"] for item in day["елементи"]] for day in plan["плани"]]
+
+
+def refresh_templates(batch_size: int = 200) -> Dict[str, int]:
+    """
+    Доводить plan_templates до сітки й поточної версії каталогу. Перегенеровуються лише
+    шаблони, чий пул змінився (або нові); решті переноситься версія одним UPDATE на пул.
+    """
+    stats = {"актуальні": 0, "перенесено": 0, "згенеровано": 0, "пропущено": 0, "видалено": 0}
+    with SessionLocal() as db:
+        version = get_catalog_version(db)
+        catalog = load_catalog_records(db)
+        existing = {
+            TemplateKey(r.diet_tags, r.allergens, r.kcal, r.budget, r.snacks): (r.pool_hash, r.catalog_version)
+            for r in db.execute(select(
+                PlanTemplate.diet_tags, PlanTemplate.allergens, PlanTemplate.kcal, PlanTemplate.budget,
+                PlanTemplate.snacks, PlanTemplate.pool_hash, PlanTemplate.catalog_version,
+            ))
+        }
+
+        grid = template_grid()
+        by_pool: Dict[Tuple[str, str], List[TemplateKey]] = {}
+        for key in grid:
+            by_pool.setdefault((key.diet_tags, key.allergens), []).append(key)
+
+        for (diet, allergens), keys in by_pool.items():
+            pool = filter_records(catalog, template_payload(keys[0]))
+            digest = pool_hash(pool)
+            todo = []
+            for key in keys:
+                old = existing.get(key)
+                if old is None or old[0] != digest:
+                    todo.append(key)
+                elif old[1] == version:
+                    stats["актуальні"] += 1
+                else:
+                    stats["перенесено"] += 1
+            # Пул не змінився — генератор дав би ті самі плани
+            db.execute(
+                update(PlanTemplate)
+                .where(PlanTemplate.diet_tags == diet, PlanTemplate.allergens == allergens,
+                       PlanTemplate.pool_hash == digest, PlanTemplate.catalog_version != version)
+                .values(catalog_version=version)
+            )
+            db.commit()
+
+            for start in range(0, len(todo), batch_size):
+                batch = todo[start:start + batch_size]
+                rows = []
+                for key in batch:
+                    days = _generate(key, pool)
+                    if days is None:
+                        stats["пропущено"] += 1
+                        continue
+                    rows.append({**key._asdict(), "pool_hash": digest, "catalog_version": version, "days": days})
+                try:
+                    for key in batch:
+                        if key in existing:
+                            db.execute(delete(PlanTemplate).where(_where_key(key)))
+                    if rows:
+                        db.execute(insert(PlanTemplate), rows)
+                    db.commit()
+                    stats["згенеровано"] += len(rows)
+                except IntegrityError:
+                    db.rollback()  # ці шаблони щойно записав інший воркер
+
+        stale = set(existing) - set(grid)
+        for key in stale:
+            db.execute(delete(PlanTemplate).where(_where_key(key)))
+        db.commit()
+        stats["видалено"] = len(stale)
+
+    _misses.clear()
+    return stats
+
+
+# Власник блокування — єдиний процес, що матеріалізує сітку
+RUNNER_LOCK = "vitacode.plan_templates"
+
+
+def start_template_worker() -> Optional[threading.Thread]:
+    """
+    Матеріалізація сітки після старту та після кожної зміни каталогу (PLAN_TEMPLATES).
+    Потік є в кожному воркері, але працює лише той, що взяв блокування; решта раз на
+    PLAN_TEMPLATE_CHECK_S перевіряє, чи воно не звільнилося.
+    """
+    if not settings.plan_templates:
+        return None
+
+    lock = RunnerLock(RUNNER_LOCK)
+
+    def loop() -> None:
+        done_version: Optional[int] = None
+        while True:
+            try:
+                if lock.held():
+                    with SessionLocal() as db:
+                        version = get_catalog_version(db)
+                    if version != done_version:
+                        started = time.perf_counter()
+                        stats = refresh_templates()
+                        done_version = version
+                        print(f"plan-templates: версія {version}: {stats} за {time.perf_counter() - started:.1f} с")
+            except Exception as exc:  # задача не повинна зупиняти застосунок
+                print(f"plan-templates: помилка матеріалізації: {exc}")
+            time.sleep(settings.plan_template_check_s)
+
+    thread = threading.Thread(target=loop, name="plan-templates", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,224 @@
+"""
+Офлайн-генерація поточних планів профілів (денних і тижневих) поза веб-процесом.
+
+Профілі діляться на шарди між процесами пулу; кожен процес отримує незмінний знімок
+каталогу (RecipeRecord) і не ходить у БД. Готові плани пишуться в profile_plan_cache
+великими пачками, після кожної пачки зберігається контрольна точка.
+
+    python precompute_plans.py --workers 4 --kinds day,week
+    python precompute_plans.py --goal lose --age-min 30 --id-from 1000 --id-to 5000
+    python precompute_plans.py --force --restart
+"""
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from catalog import RecipeRecord, filter_records, get_catalog_version, load_catalog_records
+from db import SessionLocal
+from jobs import Checkpoint, Progress
+from models import Profile, ProfilePlanCache
+from migrations import upgrade
+from plan_cache import plan_cache_key
+from routes.recipes import PROFILE_PLAN_KINDS
+from routes.users import profile_filters
+
+# (profile_id, kind, cache_key, payload)
+Task = Tuple[int, str, str, Any]
+
+# Знімок каталогу в процесі пулу та відібрані з нього пули страв
+_catalog: List[RecipeRecord] = []
+_pools: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], List[RecipeRecord]] = {}
+
+
+def _init_worker(catalog: List[RecipeRecord]) -> None:
+    global _catalog
+    _catalog = catalog
+    _pools.clear()
+
+
+def _compute_shard(tasks: List[Task]) -> Tuple[int, float, List[Dict[str, Any]]]:
+    """Генерує плани шарду в процесі пулу. Повертає (pid, секунд роботи, рядки кешу)."""
+    started = time.perf_counter()
+    rows = []
+    for profile_id, kind, key, payload in tasks:
+        # Профілі з однаковими теґами/алергенами ділять один пул
+        pool_key = (tuple(payload.diet_tags), tuple(sorted(payload.exclude_allergens)))
+        pool = _pools.get(pool_key)
+        if pool is None:
+            pool = _pools[pool_key] = filter_records(_catalog, payload)
+        if not pool:
+            continue
+        _, generate = PROFILE_PLAN_KINDS[kind]
+        rows.append({"profile_id": profile_id, "kind": kind, "cache_key": key, "payload": generate(payload, pool)})
+    return os.getpid(), time.perf_counter() - started, rows
+
+
+def _write_rows(rows: List[Dict[str, Any]], catalog_version: int) -> None:
+    """Одна транзакція: видаляємо старі записи пачки й вставляємо нові одним executemany."""
+    with SessionLocal() as db:
+        for kind in {r["kind"] for r in rows}:
+            ids = [r["profile_id"] for r in rows if r["kind"] == kind]
+            db.execute(delete(ProfilePlanCache).where(
+                ProfilePlanCache.kind == kind, ProfilePlanCache.profile_id.in_(ids),
+            ))
+        db.execute(insert(ProfilePlanCache), [{**r, "catalog_version": catalog_version} for r in rows])
+        db.commit()
+
+
+def _shard_tasks(
+    profiles: List[Profile], kinds: List[str], force: bool, fresh: Dict[Tuple[int, str], str],
+) -> List[Task]:
+    tasks = []
+    for prof in profiles:
+        for kind in kinds:
+            make_payload, _ = PROFILE_PLAN_KINDS[kind]
+            payload = make_payload(prof)
+            key = plan_cache_key(payload)
+            if not force and fresh.get((prof.id, kind)) == key:
+                continue
+            tasks.append((prof.id, kind, key, payload))
+    return tasks
+
+
+def precompute(
+    kinds: List[str],
+    workers: int,
+    shard_size: int = 500,
+    write_batch: int = 5000,
+    filters: Optional[Dict[str, Any]] = None,
+    id_from: Optional[int] = None,
+    id_to: Optional[int] = None,
+    force: bool = False,
+    checkpoint_path: str = ".precompute_plans.json",
+    restart: bool = False,
+) -> int:
+    """Генерує плани для відібраних профілів; повертає кількість записаних планів."""
+    upgrade()
+    filters = filters or {}
+
+    with SessionLocal() as db:
+        catalog_version = get_catalog_version(db)
+        catalog = load_catalog_records(db)
+
+    checkpoint = Checkpoint(checkpoint_path)
+    if restart:
+        checkpoint.clear()
+    state = checkpoint.load()
+    if state and state.get("catalog_version") != catalog_version:
+        print("⚠️  Каталог змінився після контрольної точки: раніше пораховані плани застаріли (див. --restart)")
+    last_id = max(state.get("last_id", 0), (id_from or 1) - 1)
+    written = state.get("written", 0)
+
+    def read_shard(after_id: int) -> Tuple[List[Task], Optional[int]]:
+        """Наступний шард профілів: задачі та найбільший id шарду (None — профілі скінчилися)."""
+        with SessionLocal() as db:
+            q = profile_filters(select(Profile).where(Profile.id > after_id), **filters)
+            if id_to is not None:
+                q = q.where(Profile.id <= id_to)
+            profiles = db.execute(q.order_by(Profile.id).limit(shard_size)).scalars().all()
+            if not profiles:
+                return [], None
+            fresh = {
+                (pid, kind): key
+                for pid, kind, key in db.execute(
+                    select(ProfilePlanCache.profile_id, ProfilePlanCache.kind, ProfilePlanCache.cache_key)
+                    .where(
+                        ProfilePlanCache.profile_id.in_([p.id for p in profiles]),
+                        ProfilePlanCache.catalog_version == catalog_version,
+                    )
+                )
+            }
+            return _shard_tasks(profiles, kinds, force, fresh), profiles[-1].id
+
+    progress = Progress("збережено планів")
+    per_worker: Dict[int, List[float]] = {}  # pid -> [планів, секунд роботи]
+    pending_rows: List[Dict[str, Any]] = []
+    pending_last_id = last_id
+
+    def flush() -> None:
+        nonlocal written, pending_rows
+        if pending_rows:
+            _write_rows(pending_rows, catalog_version)
+            written += len(pending_rows)
+            progress.update(len(pending_rows), note=f"до профілю #{pending_last_id}")
+            pending_rows = []
+        checkpoint.save({"last_id": pending_last_id, "written": written, "catalog_version": catalog_version})
+
+    # Результати забираються в порядку подачі, тож контрольна точка не перескакує шарди
+    in_flight: Deque[Tuple[Future, int]] = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalog,)) as executor:
+        cursor: Optional[int] = last_id
+        while cursor is not None or in_flight:
+            while cursor is not None and len(in_flight) < workers * 2:
+                tasks, shard_last = read_shard(cursor)
+                if shard_last is not None:
+                    in_flight.append((executor.submit(_compute_shard, tasks), shard_last))
+                cursor = shard_last
+            if not in_flight:
+                break
+
+            future, shard_last = in_flight.popleft()
+            pid, busy_s, rows = future.result()
+            stats = per_worker.setdefault(pid, [0, 0.0])
+            stats[0] += len(rows)
+            stats[1] += busy_s
+
+            pending_rows.extend(rows)
+            pending_last_id = shard_last
+            if len(pending_rows) >= write_batch:
+                flush()
+        flush()
+
+    progress.report("готово")
+    for pid, (plans, busy_s) in sorted(per_worker.items()):
+        rate = plans / busy_s if busy_s > 0 else 0.0
+        print(f"   воркер {pid}: {int(plans)} планів, {rate:.1f} планів/с")
+    checkpoint.clear()
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Офлайн-генерація поточних планів профілів")
+    parser.add_argument("--kinds", default="day,week", help="Типи планів через кому (day, week)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Процесів у пулі")
+    parser.add_argument("--shard", type=int, default=500, help="Профілів у шарді одного процесу")
+    parser.add_argument("--write-batch", type=int, default=5000, help="Планів в одній транзакції запису")
+    parser.add_argument("--goal", choices=["lose", "maintain", "gain"])
+    parser.add_argument("--sex")
+    parser.add_argument("--age-min", type=int)
+    parser.add_argument("--age-max", type=int)
+    parser.add_argument("--id-from", type=int)
+    parser.add_argument("--id-to", type=int)
+    parser.add_argument("--force", action="store_true", help="Перегенерувати й актуальні плани")
+    parser.add_argument("--checkpoint", default=".precompute_plans.json", help="Файл контрольної точки")
+    parser.add_argument("--restart", action="store_true", help="Почати спочатку, ігноруючи контрольну точку")
+    args = parser.parse_args()
+
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    unknown = set(kinds) - set(PROFILE_PLAN_KINDS)
+    if unknown:
+        raise SystemExit(f"Невідомі типи планів: {', '.join(sorted(unknown))}")
+
+    started = time.perf_counter()
+    written = precompute(
+        kinds=kinds,
+        workers=max(1, args.workers),
+        shard_size=args.shard,
+        write_batch=args.write_batch,
+        filters={"goal": args.goal, "sex": args.sex, "age_min": args.age_min, "age_max": args.age_max},
+        id_from=args.id_from,
+        id_to=args.id_to,
+        force=args.force,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+    )
+    print(f"✅ Збережено {written} планів за {time.perf_counter() - started:.1f} с.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Повторний підбір частини готового плану: користувач фіксує страви, які йому
+подобаються, і замінює решту.
+
+Відкриті слоти підбираються під залишок ккал і бюджету дня (ціль мінус зафіксовані
+страви) одним проходом по стравах того ж типу прийому — без сортування всього пулу й
+циклу корекції генератора. Інші дні та зафіксовані страви не змінюються.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from catalog import recipe_to_ua_dict
+from compact import RECIPE_COLUMNS, SCALED_COLUMNS
+from feasibility import MEAL_LABELS
+from schemas import DayPlanIn, PlanSlotRef
+
+
+class ReplanError(ValueError):
+    """Запит неможливо виконати (немає слотів або заміни); текст — для відповіді 422."""
+
+
+def _unit_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Елемент дня (у т.ч. згрупований, з count) -> одна порція з усіма полями страви."""
+    missing = [c for c in RECIPE_COLUMNS if c not in item]
+    if missing:
+        raise ReplanError(f"В елементі плану бракує полів: {', '.join(missing)}")
+    n = item.get("count", 1)
+    out = {c: item[c] for c in RECIPE_COLUMNS}
+    for k in SCALED_COLUMNS:
+        out[k] = float(out[k]) / n
+    return out
+
+
+def plan_days(plan: Dict[str, Any]) -> Tuple[List[List[Dict[str, Any]]], bool]:
+    """
+    Дні плану як списки страв (UA-словники, по одній порції на слот) і чи це тижневий
+    план. Приймає відповідь /plan/day або /plan/week: повну, згруповану чи компактну.
+    """
+    if plan.get("формат") == "compact":
+        cols = plan["страви"]
+        dishes = {
+            rid: {c: cols[c][i] for c in RECIPE_COLUMNS}
+            for i, rid in enumerate(cols["ід"])
+        }
+        days = []
+        for day in plan["дні"]:
+            counts = day.get("кількість") or [1] * len(day["страви"])
+            days.append([_unit_item(dishes[rid]) for rid, n in zip(day["страви"], counts) for _ in range(n)])
+        return days, "днів" in plan or len(days) > 1
+
+    if "плани" in plan:
+        raw_days = plan["плани"]
+    elif "елементи" in plan:
+        raw_days = [plan]
+    else:
+        raise ReplanError("План має містити «елементи» (день) або «плани» (тиждень)")
+    days = []
+    for day in raw_days:
+        items: List[Dict[str, Any]] = []
+        for item in day["елементи"]:
+            items.extend(_unit_item(item) for _ in range(item.get("count", 1)))
+        days.append(items)
+    return days, "плани" in plan
+
+
+def stored_days(meals: List[Dict[str, Any]], records: Dict[int, Any]) -> List[List[Dict[str, Any]]]:
+    """
+    Елементи збереженого плану (load_plan_meals) -> дні з UA-словниками. Значення
+    страв — зі знімка на момент збереження; теґи й алергени — з поточного каталогу.
+    """
+    days: Dict[int, List[Dict[str, Any]]] = {}
+    for m in meals:
+        rec = records.get(m.get("recipe_id"))
+        days.setdefault(m["day_index"], []).append({
+            "ід": m.get("recipe_id"),
+            "назва": m["name"],
+            "тип прийому": m["meal_type"],
+            "ккал": float(m["kcal"]),
+            "білки г": float(m["protein_g"]),
+            "жири г": float(m["fat_g"]),
+            "вуглеводи г": float(m["carbs_g"]),
+            "ціна грн": float(m["price"]),
+            "вага г": float(m.get("weight_g") or 0),
+            "опис": str(m.get("description") or ""),
+            "дієт-теґи": list(rec.diet_tags) if rec is not None else [],
+            "алергени": list(rec.allergens) if rec is not None else [],
+        })
+    return [days[d] for d in sorted(days)]
+
+
+def _matching(days: List[List[Dict[str, Any]]], refs: Iterable[PlanSlotRef]) -> Set[Tuple[int, int]]:
+    """Слоти (день з 1, позиція з 0), які описують посилання."""
+    out: Set[Tuple[int, int]] = set()
+    for ref in refs:
+        if ref.day > len(days):
+            raise ReplanError(f"У плані немає дня {ref.day}")
+        items = days[ref.day - 1]
+        if ref.slot is not None and ref.slot >= len(items):
+            raise ReplanError(f"У дні {ref.day} немає позиції {ref.slot}")
+        for pos, item in enumerate(items):
+            if ref.slot is not None and pos != ref.slot:
+                continue
+            if ref.meal_type is not None and item["тип прийому"] != ref.meal_type:
+                continue
+            out.add((ref.day, pos))
+    return out
+
+
+def open_slots(
+    days: List[List[Dict[str, Any]]], replace: List[PlanSlotRef], lock: List[PlanSlotRef],
+) -> Set[Tuple[int, int]]:
+    """Слоти для заміни: «замінити» без «зафіксувати»; лише «зафіксувати» — усе інше."""
+    if not replace and not lock:
+        raise ReplanError("Вкажіть слоти «замінити» або «зафіксувати»")
+    locked = _matching(days, lock)
+    if replace:
+        slots = _matching(days, replace) - locked
+    else:
+        slots = {(d, p) for d, items in enumerate(days, start=1) for p in range(len(items))} - locked
+    if not slots:
+        raise ReplanError("Немає слотів для заміни")
+    return slots
+
+
+def day_summary(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "ккал": round(sum(i["ккал"] for i in items), 1),
+        "ціна грн": round(sum(i["ціна грн"] for i in items), 2),
+        "білки г": round(sum(i["білки г"] for i in items), 1),
+        "жири г": round(sum(i["жири г"] for i in items), 1),
+        "вуглеводи г": round(sum(i["вуглеводи г"] for i in items), 1),
+        "позицій": len(items),
+    }
+
+
+def pick_dish(
+    options: List[Any], exclude: Set[Optional[int]], avoid: Set[Optional[int]],
+    target_kcal: float, max_price: float,
+) -> Optional[Any]:
+    """Найближча до цілі ккал страва в межах ціни; повтори з інших днів — в останню чергу."""
+    best = None
+    best_key = None
+    for r in options:
+        if r.id in exclude:
+            continue
+        key = (r.price > max_price, r.id in avoid, abs(r.kcal - target_kcal), r.price)
+        if best_key is None or key < best_key:
+            best, best_key = r, key
+    return best
+
+
+def replan_days(
+    days: List[List[Dict[str, Any]]],
+    slots: Set[Tuple[int, int]],
+    payload: DayPlanIn,
+    pool: List[Any],
+) -> List[Dict[str, Any]]:
+    """
+    Підбирає нові страви у відкриті слоти (days змінюється на місці). Ціль кожного
+    дня — payload.kcal і payload.budget. Повертає список замін {"день", "позиція", "було", "стало"}.
+    """
+    by_type: Dict[str, List[Any]] = {}
+    for r in pool:
+        by_type.setdefault(r.meal_type, []).append(r)
+    min_price = {t: min(r.price for r in lst) for t, lst in by_type.items()}
+
+    open_by_day: Dict[int, List[int]] = {}
+    for d, pos in sorted(slots):
+        open_by_day.setdefault(d, []).append(pos)
+
+    changes: List[Dict[str, Any]] = []
+    for d, positions in open_by_day.items():
+        items = days[d - 1]
+        open_set = set(positions)
+        locked = [i for p, i in enumerate(items) if p not in open_set]
+        kcal_left = payload.kcal - sum(i["ккал"] for i in locked)
+        budget_left = payload.budget - sum(i["ціна грн"] for i in locked)
+        in_day: Set[Optional[int]] = {i.get("ід") for i in locked}
+        # Страви, які користувач замінює, не повертаються в жоден відкритий слот дня
+        replaced: Set[Optional[int]] = {items[p].get("ід") for p in positions}
+        # Страви інших днів: для різноманіття беруться лише за відсутності інших
+        elsewhere: Set[Optional[int]] = {
+            i.get("ід") for n, other in enumerate(days, start=1) if n != d for i in other
+        }
+
+        for k, pos in enumerate(positions):
+            old = items[pos]
+            meal_type = old["тип прийому"]
+            options = by_type.get(meal_type, [])
+            rest = positions[k + 1:]
+            reserve = sum(min_price.get(items[p]["тип прийому"], 0.0) for p in rest)
+            target = kcal_left / (len(rest) + 1)
+            cap = budget_left - reserve
+
+            new = pick_dish(options, in_day | replaced, elsewhere, target, cap)
+            if new is None:
+                # Усі страви цього типу вже є в дні — дозволяємо повтор, але не ту саму
+                new = pick_dish(options, {old.get("ід")}, elsewhere, target, cap)
+            if new is None:
+                label = MEAL_LABELS.get(meal_type, meal_type)
+                raise ReplanError(f"Немає заміни для слоту {d}/{pos} ({label}) під задані умови")
+
+            items[pos] = recipe_to_ua_dict(new)
+            in_day.add(new.id)
+            kcal_left -= new.kcal
+            budget_left -= new.price
+            changes.append({"день": d, "позиція": pos, "було": old.get("ід"), "стало": new.id})
+    return changes
@@ -0,0 +1,158 @@
+"""
+Зберігання історії планів: архівація старих планів і відновлення на вимогу.
+
+Старі плани пачками переносяться у plans_archive (один рядок на план зі стиснутим
+JSON), після чого видаляються з гарячих таблиць. Кожна пачка — окрема коротка
+транзакція, тож блокування тримаються обмежений час.
+"""
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any
+
+from sqlalchemy import select, insert, delete
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from jobs import RunnerLock
+from migrations import upgrade
+from models import Plan, PlanDay, PlanItem, PlanMeal, PlanArchive
+from plan_storage import load_plan_meals, persist_plan
+from settings import settings
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _pack(plan: Plan, meals: List[Dict[str, Any]]) -> bytes:
+    doc = {"kind": plan.kind, "user_id": plan.user_id, "meals": meals}
+    return zlib.compress(json.dumps(doc, ensure_ascii=False, default=str).encode("utf-8"), 6)
+
+
+def _unpack(payload: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def delete_plans(db: Session, plan_ids: List[int]) -> None:
+    """Видаляє плани разом з елементами та підсумками (без завантаження в ORM)."""
+    for model in (PlanItem, PlanDay, PlanMeal):
+        db.execute(delete(model).where(model.plan_id.in_(plan_ids)))
+    db.execute(delete(Plan).where(Plan.id.in_(plan_ids)))
+
+
+def archive_old_plans(
+    policies: Optional[Dict[str, int]] = None,
+    batch_size: Optional[int] = None,
+    pause_s: Optional[float] = None,
+) -> Dict[str, int]:
+    """
+    Переносить у архів плани, старші за політику свого типу (kind -> днів).
+    Повертає кількість заархівованих планів по типах.
+    """
+    policies = settings.retention_days if policies is None else policies
+    batch_size = batch_size or settings.retention_batch_size
+    pause_s = settings.retention_pause_s if pause_s is None else pause_s
+
+    upgrade()
+
+    now = _utcnow()
+    archived: Dict[str, int] = {}
+    for kind, days in policies.items():
+        archived[kind] = 0
+        if days <= 0:
+            continue
+        cutoff = now - timedelta(days=days)
+
+        while True:
+            with SessionLocal() as db:
+                plans = db.execute(
+                    select(Plan)
+                    .where(Plan.kind == kind, Plan.created_at < cutoff)
+                    .order_by(Plan.id)
+                    .limit(batch_size)
+                ).scalars().all()
+                if not plans:
+                    break
+
+                ids = [p.id for p in plans]
+                meals = load_plan_meals(db, ids)
+                db.execute(insert(PlanArchive), [{
+                    "id": p.id, "kind": p.kind, "user_id": p.user_id,
+                    "created_at": p.created_at, "archived_at": now,
+                    "payload": _pack(p, meals[p.id]),
+                } for p in plans])
+                delete_plans(db, ids)
+                db.commit()
+
+            archived[kind] += len(ids)
+            if pause_s:
+                time.sleep(pause_s)
+
+    return archived
+
+
+def restore_plan(db: Session, plan_id: int) -> Optional[Dict[str, Any]]:
+    """Повертає план з архіву в гарячі таблиці з тим самим id. None — плану в архіві нема."""
+    row = db.get(PlanArchive, plan_id)
+    if row is None:
+        return None
+
+    doc = _unpack(row.payload)
+    plan = persist_plan(
+        db,
+        kind=doc["kind"],
+        user_id=doc["user_id"],
+        meals=doc["meals"],
+        plan_id=row.id,
+        created_at=row.created_at,
+    )
+    db.delete(row)
+    db.commit()
+    return plan
+
+
+def is_archived(db: Session, plan_id: int) -> bool:
+    return db.get(PlanArchive, plan_id) is not None
+
+
+# Власник блокування — єдиний процес, що архівує плани
+RETENTION_LOCK = "vitacode.retention"
+
+
+def start_retention_worker() -> Optional[threading.Thread]:
+    """
+    Запускає фонову архівацію в процесі застосунку, якщо задано RETENTION_INTERVAL_S.
+    Потік є в кожному воркері, але архівує лише власник RETENTION_LOCK.
+    """
+    interval = settings.retention_interval_s
+    if interval <= 0:
+        return None
+
+    lock = RunnerLock(RETENTION_LOCK)
+
+    def loop() -> None:
+        while True:
+            try:
+                runner = lock.held()
+            except Exception as exc:
+                print(f"retention: блокування недоступне: {exc}")
+                runner = False
+            if runner:
+                try:
+                    archive_old_plans()
+                except Exception as exc:  # задача не повинна зупиняти застосунок
+                    print(f"retention: помилка архівації: {exc}")
+                try:
+                    from idempotency import purge_expired_keys
+
+                    purge_expired_keys()
+                except Exception as exc:
+                    print(f"retention: помилка очищення ключів ідемпотентності: {exc}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="plan-retention", daemon=True)
+    thread.start()
+    return thread
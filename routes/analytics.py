@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterator, Optional, Literal, List, Dict, Any
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models import Plan, Profile
+
+router = APIRouter(prefix="/analytics", tags=["Аналітика"])
+
+
+def get_db() -> Iterator[Session]:
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _per_day(column):
+    # середнє на день плану: сума по групі / сума днів
+    return func.round(func.sum(column) / func.nullif(func.sum(Plan.days_count), 0), 1)
+
+
+# GET /analytics/plans — згруповані показники, рахуються в SQL
+@router.get(
+    "/plans",
+    summary="Статистика планів за ціллю / користувачем / типом / датою",
+)
+def plan_stats(
+    group_by: Literal["goal", "user", "kind", "day"] = Query("goal", description="Поле групування"),
+    date_from: Optional[date] = Query(None, description="Створені з дати (включно)"),
+    date_to: Optional[date] = Query(None, description="Створені до дати (включно)"),
+    user_id: Optional[int] = Query(None),
+    goal: Optional[Literal["lose", "maintain", "gain"]] = Query(None),
+    kind: Optional[Literal["day", "week"]] = Query(None),
+    db: Session = Depends(get_db),
+) -> List[Dict[str, Any]]:
+    groups = {
+        "goal": Profile.goal,
+        "user": Plan.user_id,
+        "kind": Plan.kind,
+        "day": func.date(Plan.created_at),
+    }
+    key = groups[group_by].label("група")
+
+    total_kcal = func.nullif(func.sum(Plan.total_kcal), 0)
+    q = select(
+        key,
+        func.count(Plan.id).label("планів"),
+        func.count(func.distinct(Plan.user_id)).label("користувачів"),
+        _per_day(Plan.total_kcal).label("ккал/день"),
+        _per_day(Plan.total_price).label("ціна грн/день"),
+        _per_day(Plan.total_protein_g).label("білки г/день"),
+        _per_day(Plan.total_fat_g).label("жири г/день"),
+        _per_day(Plan.total_carbs_g).label("вуглеводи г/день"),
+        _per_day(Plan.items_count).label("позицій/день"),
+        func.round(func.sum(Plan.kcal_breakfast) / total_kcal, 3).label("частка сніданку"),
+        func.round(func.sum(Plan.kcal_lunch) / total_kcal, 3).label("частка обіду"),
+        func.round(func.sum(Plan.kcal_dinner) / total_kcal, 3).label("частка вечері"),
+        func.round(func.sum(Plan.kcal_snack) / total_kcal, 3).label("частка перекусів"),
+    ).select_from(Plan)
+
+    if group_by == "goal" or goal is not None:
+        q = q.outerjoin(Profile, Profile.id == Plan.user_id)
+
+    if date_from is not None:
+        q = q.where(Plan.created_at >= date_from)
+    if date_to is not None:
+        q = q.where(Plan.created_at < date_to + timedelta(days=1))
+    if user_id is not None:
+        q = q.where(Plan.user_id == user_id)
+    if goal is not None:
+        q = q.where(Profile.goal == goal)
+    if kind is not None:
+        q = q.where(Plan.kind == kind)
+
+    rows = db.execute(q.group_by(key).order_by(key)).mappings()
+    # MySQL повертає Decimal для ROUND(SUM(...))
+    return [{k: float(v) if isinstance(v, Decimal) else v for k, v in row.items()} for row in rows]
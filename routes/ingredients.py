@@ -0,0 +1,60 @@
+from typing import Iterator, List, Dict, Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from catalog import get_catalog_version
+from db import SessionLocal
+from ingredients import reprice_recipes, set_ingredient_prices
+from models import Ingredient, RecipeIngredient
+from schemas import IngredientOut, IngredientPriceIn
+from settings import settings
+
+router = APIRouter(prefix="/ingredients", tags=["Інгредієнти"])
+
+
+def get_db() -> Iterator[Session]:
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# GET /ingredients — інгредієнти з цінами та кількістю рецептів
+@router.get("", response_model=List[IngredientOut], response_model_by_alias=True, summary="Інгредієнти")
+def list_ingredients(db: Session = Depends(get_db)):
+    rows = db.execute(
+        select(Ingredient.id, Ingredient.name, Ingredient.price_per_kg,
+               func.count(RecipeIngredient.recipe_id).label("recipes_count"))
+        .outerjoin(RecipeIngredient, RecipeIngredient.ingredient_id == Ingredient.id)
+        .group_by(Ingredient.id, Ingredient.name, Ingredient.price_per_kg)
+        .order_by(Ingredient.name)
+    ).all()
+    return [IngredientOut.model_validate(r) for r in rows]
+
+
+# PUT /ingredients/prices — нові ціни постачальників і перерахунок зачеплених страв
+@router.put("/prices", summary="Оновити ціни інгредієнтів і перерахувати ціни страв")
+def update_prices(items: List[IngredientPriceIn], db: Session = Depends(get_db)) -> Dict[str, Any]:
+    prices = {item.id: item.price_per_kg for item in items}
+    existing = set(db.scalars(select(Ingredient.id).where(Ingredient.id.in_(list(prices)))))
+    unknown = sorted(set(prices) - existing)
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Інгредієнти не знайдено: {unknown}")
+
+    changed = set_ingredient_prices(db, prices)
+    db.commit()
+    # Усі надіслані інгредієнти, а не лише змінені: повтор запиту після збою
+    # допрацьовує перерахунок, перерваний посередині
+    repriced = reprice_recipes(db, list(prices))
+    if settings.catalog_snapshot_path:
+        from catalog_snapshot import ensure_snapshot
+
+        ensure_snapshot(db)
+    return {
+        "оновлено інгредієнтів": len(changed),
+        "перераховано страв": repriced,
+        "версія каталогу": get_catalog_version(db),
+    }
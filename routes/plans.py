@@ -1,11 +1,15 @@
-from typing import Iterator, List, Optional
+from typing import Iterator, List, Optional, Union, Literal, Any, Dict
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, null
 from sqlalchemy.orm import Session
 
 from db import SessionLocal
-from models import Plan, PlanMeal
-from schemas import PlanCreate, PlanOut, PlanWithMealsOut, PlanMealOut
+from export import MEAL_CSV_COLUMNS, meal_csv_cells, stream_rows, export_response
+from models import Plan, PlanItem, PlanMeal, RecipeSnapshot
+from schemas import PlanCreate, PlanOut, PlanWithMealsOut
+from plan_storage import persist_plan, load_plan_meals, SNAPSHOT_FIELDS
+from retention import restore_plan, is_archived
 
 router = APIRouter(prefix="/plans", tags=["Плани"])
 
@@ -30,37 +34,83 @@ def create_plan(
     if not payload.meals:
         raise HTTPException(status_code=400, detail="Список прийомів їжі (meals) порожній")
 
-    # Рахуємо підсумки
-    total_kcal = sum(m.kcal for m in payload.meals)
-    total_price = sum(m.price for m in payload.meals)
-
-    plan = Plan(
+    plan = persist_plan(
+        db,
         kind=payload.kind,
         user_id=payload.user_id,
-        total_kcal=total_kcal,
-        total_price=total_price,
+        meals=[m.model_dump() for m in payload.meals],
     )
-    db.add(plan)
-    db.flush()  # щоб отримати plan.id до коміту
-
-    for m in payload.meals:
-        row = PlanMeal(
-            plan_id=plan.id,
-            day_index=m.day_index,
-            name=m.name,
-            meal_type=m.meal_type,
-            kcal=m.kcal,
-            protein_g=m.protein_g,
-            fat_g=m.fat_g,
-            carbs_g=m.carbs_g,
-            price=m.price,
-        )
-        db.add(row)
-
     db.commit()
-    db.refresh(plan)
     return plan
 
+# Колонки експорту: план + страва
+EXPORT_PLAN_FIELDS = ("plan_id", "user_id", "kind", "day_index", "slot")
+EXPORT_CSV_HEADER = ["План", "Користувач", "Тип плану", "День"] + MEAL_CSV_COLUMNS
+
+
+def _export_row_csv(row: Any) -> List[Any]:
+    return [row.plan_id, row.user_id, row.kind, row.day_index] + meal_csv_cells(
+        row.meal_type, row.name, row.description, row.weight_g,
+        row.kcal, row.protein_g, row.fat_g, row.carbs_g, row.price,
+    )
+
+
+def _export_row_json(row: Any) -> Dict[str, Any]:
+    return {k: row._mapping[k] for k in EXPORT_PLAN_FIELDS + SNAPSHOT_FIELDS}
+
+
+# GET /plans/export — потоковий експорт історії планів (рядок на страву)
+@router.get(
+    "/export",
+    summary="Експорт планів зі стравами (CSV / NDJSON, потоково)",
+)
+def export_plans(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    gzip: bool = Query(False, description="Стиснути файл gzip"),
+    user_id: Optional[int] = Query(None),
+    kind: Optional[Literal["day", "week"]] = Query(None),
+    id_from: Optional[int] = Query(None, description="Плани з id >= id_from"),
+    id_to: Optional[int] = Query(None, description="Плани з id <= id_to"),
+):
+    def filtered(q, plan_id_col):
+        if user_id is not None:
+            q = q.where(Plan.user_id == user_id)
+        if kind is not None:
+            q = q.where(Plan.kind == kind)
+        if id_from is not None:
+            q = q.where(plan_id_col >= id_from)
+        if id_to is not None:
+            q = q.where(plan_id_col <= id_to)
+        return q
+
+    compact = filtered(
+        select(
+            PlanItem.plan_id, Plan.user_id, Plan.kind, PlanItem.day_index, PlanItem.slot,
+            *(getattr(RecipeSnapshot, f) for f in SNAPSHOT_FIELDS),
+        )
+        .join(Plan, Plan.id == PlanItem.plan_id)
+        .join(RecipeSnapshot, RecipeSnapshot.id == PlanItem.snapshot_id),
+        PlanItem.plan_id,
+    ).order_by(PlanItem.plan_id, PlanItem.day_index, PlanItem.slot)
+
+    # рядки старого формату (ще не перенесені manage.py migrate-plan-storage)
+    legacy = filtered(
+        select(
+            PlanMeal.plan_id, Plan.user_id, Plan.kind, PlanMeal.day_index, PlanMeal.id.label("slot"),
+            *(getattr(PlanMeal, f) if f != "recipe_id" else null().label(f) for f in SNAPSHOT_FIELDS),
+        )
+        .join(Plan, Plan.id == PlanMeal.plan_id),
+        PlanMeal.plan_id,
+    ).order_by(PlanMeal.plan_id, PlanMeal.day_index, PlanMeal.id)
+
+    return export_response(
+        format, gzip, "plans",
+        rows=stream_rows([compact, legacy]),
+        csv_header=EXPORT_CSV_HEADER,
+        to_csv=_export_row_csv,
+        to_json=_export_row_json,
+    )
+
 # GET /plans/{plan_id} — один план з переліком прийомів їжі
 @router.get(
     "/{plan_id}",
@@ -70,21 +120,59 @@ def create_plan(
 def get_plan(plan_id: int, db: Session = Depends(get_db)):
     plan = db.get(Plan, plan_id)
     if not plan:
+        if is_archived(db, plan_id):
+            raise HTTPException(
+                status_code=404,
+                detail=f"План в архіві; відновіть його через POST /plans/{plan_id}/restore",
+            )
         raise HTTPException(status_code=404, detail="План не знайдено")
+    out = PlanOut.model_validate(plan).model_dump()
+    out["meals"] = load_plan_meals(db, [plan.id])[plan.id]
+    return out
+
+# POST /plans/{plan_id}/restore — повернути план з архіву
+@router.post(
+    "/{plan_id}/restore",
+    response_model=PlanOut,
+    summary="Відновити заархівований план",
+)
+def restore_archived_plan(plan_id: int, db: Session = Depends(get_db)):
+    if db.get(Plan, plan_id):
+        raise HTTPException(status_code=409, detail="План не в архіві")
+    plan = restore_plan(db, plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="План не знайдено в архіві")
     return plan
 
-# GET /plans — список планів (опційно за user_id)
+# GET /plans — список планів (опційно за user_id), keyset-пагінація за id
 @router.get(
     "",
-    response_model=List[PlanOut],
+    response_model=List[Union[PlanWithMealsOut, PlanOut]],
     summary="Список планів (опційно відфільтрованих за user_id)",
 )
 def list_plans(
+    response: Response,
     user_id: Optional[int] = Query(None, description="Ідентифікатор користувача (profile_id)"),
+    after_id: Optional[int] = Query(None, description="Курсор: повернути плани з id < after_id"),
+    limit: int = Query(50, ge=1, le=200, description="Розмір сторінки"),
+    include: Optional[Literal["meals"]] = Query(None, description="meals — додати елементи планів"),
     db: Session = Depends(get_db),
 ):
-    q = db.query(Plan)
+    q = select(Plan)
     if user_id is not None:
-        q = q.filter(Plan.user_id == user_id)
-    items = q.order_by(Plan.id.desc()).all()
-    return items
+        q = q.where(Plan.user_id == user_id)
+    if after_id is not None:
+        q = q.where(Plan.id < after_id)
+    items = db.execute(q.order_by(Plan.id.desc()).limit(limit)).scalars().all()
+
+    # Курсор наступної сторінки
+    if len(items) == limit:
+        response.headers["X-Next-After-Id"] = str(items[-1].id)
+
+    rows = [PlanOut.model_validate(p).model_dump() for p in items]
+    if include == "meals":
+        # Елементи для всієї сторінки — фіксована кількість запитів
+        meals = load_plan_meals(db, [row["id"] for row in rows])
+        for row in rows:
+            row["meals"] = meals[row["id"]]
+    return rows
@@ -1,15 +1,28 @@
-from typing import List, Optional, Dict, Any, Iterator, Set
+from typing import List, Literal, Optional, Dict, Any, Iterator, Set, Tuple
 
-from fastapi import APIRouter, Query, Depends, HTTPException
+import orjson
+from fastapi import APIRouter, Query, Depends, HTTPException, Response
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from db import SessionLocal
-from models import Recipe, Profile
-from schemas import RecipeOutUA, DayPlanIn, WeekPlanIn, WeekPlanOut
+from models import Plan, Recipe, Profile
+from schemas import RecipeOutUA, RecipeSearchOutUA, DayPlanIn, WeekPlanIn, WeekPlanOut, ReplanIn
+from cache import LRUCache, cache_generation, register_invalidation
+from compact import SCALED_COLUMNS, compact_plan, compact_recipe_list
+from feasibility import classify, pool_summary
+from catalog import RecipeRecord, fetch_records, known_catalog_version, record_select, recipe_to_ua_dict
+from plan_cache import plan_cache_key, get_cached_plan, store_plan
+from plan_storage import load_plan_meals, persist_plan, meal_rows_from_days
+from plan_templates import lookup, match_key
+from replan import ReplanError, day_summary, open_slots, pick_dish, plan_days, replan_days, stored_days
+from search import ensure_index
+from settings import settings
 
 router = APIRouter(tags=["Страви та плани"])
 
+recipes_table = Recipe.__table__
+
 
 # Сервіс: сесія БД
 def get_db() -> Iterator[Session]:
@@ -20,29 +33,58 @@ def get_db() -> Iterator[Session]:
         db.close()
 
 
-# UA-словник
-def recipe_to_ua_dict(r: Recipe) -> Dict[str, Any]:
-    return {
-        "ід": r.id,
-        "назва": r.name,
-        "тип прийому": r.meal_type,
-        "ккал": float(r.kcal),
-        "білки г": float(r.protein_g),
-        "жири г": float(r.fat_g),
-        "вуглеводи г": float(r.carbs_g),
-        "ціна грн": float(r.price),
-        "вага г": float(r.weight_g or 0),
-        "опис": str(r.description or ""),
-        "дієт-теґи": list(r.diet_tags or []),
-        "алергени": list(r.allergens or []),
-    }
+def current_snapshot(db: Session) -> Optional[Any]:
+    """
+    Знімок каталогу, якщо його версія збігається з версією каталогу; застарілий знімок
+    (каталог змінили без перезапису файлу) — None, і дані беруться з БД. Модуль знімка
+    (з numpy) імпортується, лише коли знімки увімкнені.
+    """
+    if not settings.catalog_snapshot_path:
+        return None
+    from catalog_snapshot import current_snapshot as _current
+
+    snap = _current()
+    if snap is None or snap.version != known_catalog_version(db):
+        return None
+    return snap
+
+
+def _json(data: Any) -> Response:
+    """Готова JSON-відповідь без валідації response_model (компактний формат)."""
+    return Response(content=orjson.dumps(data), media_type="application/json")
+
+
+# Порядок прийомів їжі у згрупованій відповіді
+MEAL_ORDER = {"breakfast": 1, "lunch": 2, "dinner": 3, "snack": 4}
+
+
+def group_selected(selected: List[Recipe]) -> List[Dict[str, Any]]:
+    """Однакові страви -> один елемент з count і сумарними значеннями, у порядку прийомів їжі."""
+    counts: Dict[int, int] = {}
+    first: Dict[int, Recipe] = {}
+    for r in selected:
+        counts[r.id] = counts.get(r.id, 0) + 1
+        first.setdefault(r.id, r)
+
+    items = []
+    for rid, r in first.items():
+        item = recipe_to_ua_dict(r)
+        n = counts[rid]
+        if n > 1:
+            for k in SCALED_COLUMNS:
+                item[k] *= n
+        item["count"] = n
+        items.append(item)
+
+    items.sort(key=lambda x: MEAL_ORDER.get(x["тип прийому"], 99))
+    return items
 
 
 # /recipes — список страв із фільтрами
+# Відповідь — готовий JSON (зі знімка або orjson), тож модель лише для документації
 @router.get(
     "/recipes",
-    response_model=List[RecipeOutUA],
-    response_model_by_alias=True,
+    responses={200: {"model": List[RecipeOutUA], "description": "Страви (format=compact — колонки)"}},
     summary="Список страв",
 )
 def list_recipes(
@@ -56,46 +98,160 @@ def list_recipes(
     exclude_allergens: Optional[List[str]] = Query(
         None, description="алергени, яких уникати (напр. gluten)"
     ),
+    format: Literal["full", "compact"] = Query("full", description="compact — колонки замість об'єктів"),
     db: Session = Depends(get_db),
 ):
-    q = db.query(Recipe)
+    snap = current_snapshot(db)
+    if snap is not None:
+        # Готові UA-словники зі знімка — без запиту до БД і без серіалізації
+        idx = snap.select(diet or [], exclude_allergens or [])
+        cols = snap.columns
+        if meal_type:
+            code = snap.meal_types.index(meal_type) if meal_type in snap.meal_types else -1
+            idx = idx[cols["meal_type"][idx] == code]
+        if min_kcal is not None:
+            idx = idx[cols["kcal"][idx] >= min_kcal]
+        if max_kcal is not None:
+            idx = idx[cols["kcal"][idx] <= max_kcal]
+        if max_price is not None:
+            idx = idx[cols["price"][idx] <= max_price]
+        idx = idx[cols["price"][idx].argsort(kind="stable")]
+        if format == "compact":
+            return _json(compact_recipe_list(orjson.loads(snap.payload(int(i))) for i in idx))
+        body = b"[" + b",".join(snap.payload(int(i)) for i in idx) + b"]"
+        return Response(content=body, media_type="application/json")
+
+    # Лише колонки запису через Core — без ORM-об'єктів і повторної валідації Pydantic
+    c = recipes_table.c
+    q = record_select()
 
     if meal_type:
-        q = q.filter(Recipe.meal_type == meal_type)
+        q = q.where(c.meal_type == meal_type)
 
     if min_kcal is not None:
-        q = q.filter(Recipe.kcal >= min_kcal)
+        q = q.where(c.kcal >= min_kcal)
 
     if max_kcal is not None:
-        q = q.filter(Recipe.kcal <= max_kcal)
+        q = q.where(c.kcal <= max_kcal)
 
     if max_price is not None:
-        q = q.filter(Recipe.price <= max_price)
+        q = q.where(c.price <= max_price)
 
     # усі вказані дієт-теґи мають бути присутні
     if diet:
-        for tag in diet:
-            q = q.filter(text("JSON_CONTAINS(diet_tags, :t)")).params(t=f'["{tag}"]')
+        for i, tag in enumerate(diet):
+            q = q.where(text(f"JSON_CONTAINS(diet_tags, :t{i})").bindparams(**{f"t{i}": f'["{tag}"]'}))
 
     # жоден із вказаних алергенів не повинен зустрічатися
     if exclude_allergens:
-        for al in exclude_allergens:
-            q = q.filter(text("NOT JSON_CONTAINS(allergens, :a)")).params(
-                a=f'["{al}"]'
-            )
+        for i, al in enumerate(exclude_allergens):
+            q = q.where(text(f"NOT JSON_CONTAINS(allergens, :a{i})").bindparams(**{f"a{i}": f'["{al}"]'}))
+
+    items = [recipe_to_ua_dict(r) for r in fetch_records(db, q.order_by(c.price.asc()))]
+
+    if format == "compact":
+        return _json(compact_recipe_list(items))
+    return _json(items)
+
+
+# /recipes/search — пошук за назвою та описом (триграмний індекс у пам'яті)
+@router.get(
+    "/recipes/search",
+    response_model=List[RecipeSearchOutUA],
+    response_model_by_alias=True,
+    summary="Пошук страв",
+)
+def search_recipes(
+    q: str = Query(..., min_length=2, description="текст запиту (назва, інгредієнт)"),
+    meal_type: Optional[str] = Query(None, description="breakfast/lunch/dinner/snack"),
+    diet: Optional[List[str]] = Query(None, description="включити дієт-теґи"),
+    exclude_allergens: Optional[List[str]] = Query(None, description="алергени, яких уникати"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    hits = ensure_index(db).search(
+        q, limit=limit, meal_type=meal_type, diet=diet, exclude_allergens=exclude_allergens,
+    )
+    return [RecipeSearchOutUA(**rec._asdict(), score=score) for score, rec in hits]
+
+
+# Пули страв з БД: (дієт-теґи, алергени) -> записи; скидаються при зміні каталогу
+pool_cache = LRUCache(maxsize=settings.catalog_pool_cache_size)
+register_invalidation("recipes.pools", pool_cache.clear)
+
+
+def pool_key(payload: DayPlanIn) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    return tuple(payload.diet_tags or ()), tuple(sorted(payload.exclude_allergens or ()))
 
-    items = q.order_by(Recipe.price.asc()).all()
 
-    return [RecipeOutUA.model_validate(r) for r in items]
+def load_pool(db: Session, payload: DayPlanIn, generation: Optional[int] = None) -> List[Any]:
+    """
+    Страви під дієт-теґи та алергени запиту: зі знімка каталогу, якщо він увімкнений і актуальний,
+    інакше з кешу пулів процесу (запит до БД лише на промаху). generation —
+    cache_generation() на початку запиту: пул, прочитаний до зміни каталогу, не кешується.
+    """
+    snap = current_snapshot(db)
+    if snap is not None:
+        return snap.pool(payload)
+
+    key = pool_key(payload)
+    if generation is None:
+        generation = cache_generation()
+    pool = pool_cache.get(key)
+    if pool is None:
+        pool = _query_pool(db, payload)
+        pool_cache.set(key, pool, generation=generation)
+    return pool
+
+
+def _query_pool(db: Session, payload: DayPlanIn) -> List[RecipeRecord]:
+    q = record_select()
+    # Окреме ім'я параметра для кожної умови, інакше значення перезаписують одне одне
+    for i, tag in enumerate(payload.diet_tags or []):
+        q = q.where(text(f"JSON_CONTAINS(diet_tags, :t{i})").bindparams(**{f"t{i}": f'["{tag}"]'}))
+    for i, al in enumerate(payload.exclude_allergens or []):
+        q = q.where(text(f"NOT JSON_CONTAINS(allergens, :a{i})").bindparams(**{f"a{i}": f'["{al}"]'}))
+    return fetch_records(db, q)
+
+
+def kcal_limits(target: float) -> Tuple[float, float]:
+    """(допустиме перевищення, достатнє заповнення) цілі ккал — частки від target."""
+    if target < 2000:
+        # Режим "Схуднення": максимум +3%, досить набрати 85%
+        return 1.03, 0.85
+    if target > 2800:
+        # Режим "Набір": можна перебрати до 10%, але треба набрати хоча б 97%
+        return 1.10, 0.97
+    # Збалансований режим: максимум +5%, мінімально 90%
+    return 1.05, 0.90
+
+
+def day_response(selected: List[Any], grouped: bool = False) -> Dict[str, Any]:
+    """Відповідь дня з відібраних страв (Recipe або RecipeRecord): підсумок та елементи."""
+    resp_items = group_selected(selected) if grouped else [recipe_to_ua_dict(r) for r in selected]
+    summary = {
+        "ккал": round(sum(r.kcal for r in selected), 1),
+        "ціна грн": round(sum(r.price for r in selected), 2),
+        "білки г": round(sum(r.protein_g for r in selected), 1),
+        "жири г": round(sum(r.fat_g for r in selected), 1),
+        "вуглеводи г": round(sum(r.carbs_g for r in selected), 1),
+        "позицій": len(selected),
+    }
+    return {"підсумок": summary, "елементи": resp_items}
 
 
 # Внутрішній генератор дня (Логіка алгоритму)
 def _generate_day_plan_internal(
     payload: DayPlanIn,
-    db: Session,
+    db: Optional[Session],
     used_ids: Optional[Set[int]] = None,
+    grouped: bool = False,
+    pool: Optional[List[Any]] = None,
 ) -> Dict[str, Any]:
     """
+    grouped=True — однакові страви об'єднуються (count), елементи впорядковані за прийомом їжі.
+    pool — вже відібрані страви (Recipe або RecipeRecord); тоді db не потрібна.
+
     Розумна генерація:
     - Для малих цілей (<2000) -> суворі ліміти зверху, м'які знизу.
     - Для великих цілей (>2800) -> м'які ліміти зверху, суворі знизу (агресивний добір).
@@ -103,29 +259,12 @@ def _generate_day_plan_internal(
     
     # Налаштування порогів 
     target = payload.kcal
-    
-    if target < 2000:
-        # Режим "Схуднення"
-        OVERFLOW_LIMIT = 1.03   # Максимум +3%
-        FILLING_GOAL = 0.85     # Досить набрати 85%
-    elif target > 2800:
-        # Режим "Набір"
-        OVERFLOW_LIMIT = 1.10   # Можна перебрати до 10%
-        FILLING_GOAL = 0.97     # Але треба набрати хоча б 97%
-    else:
-        # Збалансований режим
-        OVERFLOW_LIMIT = 1.05   # Максимум +5%
-        FILLING_GOAL = 0.90     # Мінімально 90%
-        
+    OVERFLOW_LIMIT, FILLING_GOAL = kcal_limits(target)
 
-    # 1. Отримуємо пул страв
-    q = db.query(Recipe)
-    for tag in (payload.diet_tags or []):
-        q = q.filter(text("JSON_CONTAINS(diet_tags, :t)")).params(t=f'["{tag}"]')
-    for al in (payload.exclude_allergens or []):
-        q = q.filter(text("NOT JSON_CONTAINS(allergens, :a)")).params(a=f'["{al}"]')
 
-    pool: List[Recipe] = q.all()
+    # 1. Пул страв під дієт-теґи та алергени
+    if pool is None:
+        pool = load_pool(db, payload)
     if not pool:
         raise HTTPException(status_code=404, detail="Не знайдено страв під задані умови")
 
@@ -247,14 +386,82 @@ def _generate_day_plan_internal(
     if used_ids is not None:
         used_ids.update(r.id for r in selected)
 
-    final_kcal, final_price = get_totals(selected)
-    resp_items = [recipe_to_ua_dict(r) for r in selected]
-    summary = {
-        "ккал": round(final_kcal, 1),
-        "ціна грн": round(final_price, 2),
-        "позицій": len(selected),
-    }
-    return {"підсумок": summary, "елементи": resp_items}
+    return day_response(selected, grouped)
+
+
+def precheck_plan(
+    db: Session, payload: DayPlanIn, pool: List[Any], generation: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Здійсненність запиту за зведенням пулу (див. feasibility.py). Нездійсненний запит —
+    422 з причинами та зведенням, без запуску генератора.
+    """
+    if not pool:
+        raise HTTPException(status_code=404, detail="Не знайдено страв під задані умови")
+    snap = current_snapshot(db)
+    summary = pool_summary((snap.version if snap is not None else None, *pool_key(payload)), pool, generation)
+    result = classify(summary, payload)
+    if result["статус"] == "infeasible":
+        raise HTTPException(status_code=422, detail={"повідомлення": "План з такими умовами неможливий", **result})
+    return result
+
+
+# Пул як словник ід -> запис для зборки планів із шаблонів; скидається разом із пулами
+pool_index = LRUCache(maxsize=settings.catalog_pool_cache_size)
+register_invalidation("recipes.pool_index", pool_index.clear)
+
+
+def template_days(
+    db: Session, payload: DayPlanIn, pool: List[Any], days: int, grouped: bool = False,
+    generation: Optional[int] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Дні плану з готового шаблону (plan_templates.py) або None, якщо запит не потрапляє
+    в сітку чи шаблон ще не згенерований. День, що після переходу від відра до цілі
+    запиту вийшов за межі ккал, отримує заміну однієї страви, що найкраще наближає його до цілі;
+    якщо й після неї день поза межами — None (план складе генератор).
+    """
+    key = match_key(payload)
+    if key is None:
+        return None
+    stored = lookup(db, key, known_catalog_version(db))
+    if stored is None or len(stored) < days:
+        return None
+
+    snap = current_snapshot(db)
+    index_key = (snap.version if snap is not None else None, *pool_key(payload))
+    by_id = pool_index.get(index_key)
+    if by_id is None:
+        by_id = {r.id: r for r in pool}
+        pool_index.set(index_key, by_id, generation=generation)
+    try:
+        selected_days = [[by_id[rid] for rid in ids] for ids in stored[:days]]
+    except KeyError:
+        return None  # шаблон з іншого пулу (каталог щойно змінився)
+
+    overflow, filling = kcal_limits(payload.kcal)
+    for selected in selected_days:
+        kcal = sum(r.kcal for r in selected)
+        price = sum(r.price for r in selected)
+        if payload.kcal * filling <= kcal <= payload.kcal * overflow:
+            continue
+        pick = max if kcal > payload.kcal else min
+        i = pick(range(len(selected)), key=lambda n: selected[n].kcal)
+        old = selected[i]
+        headroom = payload.budget - (price - old.price)
+        new = pick_dish(
+            [r for r in pool if r.meal_type == old.meal_type], {r.id for r in selected}, set(),
+            payload.kcal - (kcal - old.kcal), headroom,
+        )
+        # Замінюємо, лише якщо це наближає день до цілі в межах бюджету
+        if new is not None and new.price <= headroom and (
+            abs(kcal - old.kcal + new.kcal - payload.kcal) < abs(kcal - payload.kcal)
+        ):
+            selected[i] = new
+            kcal += new.kcal - old.kcal
+        if not payload.kcal * filling <= kcal <= payload.kcal * overflow:
+            return None
+    return [day_response(selected, grouped) for selected in selected_days]
 
 
 # /plan/day — генерація денного плану
@@ -264,9 +471,53 @@ def _generate_day_plan_internal(
 )
 def make_day_plan(
     payload: DayPlanIn,
+    save: bool = False,
+    user_id: Optional[int] = None,
+    grouped: bool = False,
+    format: Literal["full", "compact"] = "full",
     db: Session = Depends(get_db),
 ):
-    return _generate_day_plan_internal(payload=payload, db=db, used_ids=None)
+    generation = cache_generation()
+    pool = load_pool(db, payload, generation)
+    feasibility = precheck_plan(db, payload, pool, generation)
+    templated = template_days(db, payload, pool, 1, grouped=grouped, generation=generation)
+    if templated is not None:
+        day_plan = templated[0]
+    else:
+        day_plan = _generate_day_plan_internal(payload=payload, db=db, used_ids=None, grouped=grouped, pool=pool)
+    if feasibility["статус"] != "ok":
+        day_plan["здійсненність"] = feasibility
+
+    # save=true — зберігаємо план у тій самій транзакції
+    if save:
+        plan = persist_plan(db, kind="day", user_id=user_id, meals=meal_rows_from_days([day_plan]))
+        db.commit()
+        day_plan["ід плану"] = plan["id"]
+
+    if format == "compact":
+        return _json(compact_plan(day_plan))
+    return day_plan
+
+
+def week_result(plans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Тижнева відповідь з готових днів: кількість днів і загальні підсумки."""
+    return {
+        "днів": len(plans),
+        "плани": plans,
+        "загалом ккал": round(sum(float(p["підсумок"]["ккал"]) for p in plans), 1),
+        "загалом ціна грн": round(sum(float(p["підсумок"]["ціна грн"]) for p in plans), 2),
+    }
+
+
+def build_week_plan(payload: WeekPlanIn, pool: List[Any], grouped: bool = False) -> Dict[str, Any]:
+    """Тижневий план з одного пулу страв (без повторних запитів до БД на кожен день)."""
+    days = max(1, min(14, payload.days))
+    used_ids: Set[int] = set()
+    plans = [
+        _generate_day_plan_internal(payload=payload, db=None, used_ids=used_ids, grouped=grouped, pool=pool)
+        for _ in range(days)
+    ]
+    return week_result(plans)
 
 
 # /plan/week — тижневий план з різноманіттям
@@ -278,46 +529,155 @@ def make_day_plan(
 )
 def make_week_plan(
     payload: WeekPlanIn,
+    save: bool = False,
+    user_id: Optional[int] = None,
+    grouped: bool = False,
+    format: Literal["full", "compact"] = "full",
     db: Session = Depends(get_db),
 ):
-    days = max(1, min(14, payload.days))
-    used_ids: Set[int] = set()
-    plans: List[Dict[str, Any]] = []
-    total_kcal = 0.0
-    total_price = 0.0
+    generation = cache_generation()
+    pool = load_pool(db, payload, generation)
+    feasibility = precheck_plan(db, payload, pool, generation)
+    templated = template_days(
+        db, payload, pool, max(1, min(14, payload.days)), grouped=grouped, generation=generation,
+    )
+    result = week_result(templated) if templated is not None else build_week_plan(payload, pool, grouped=grouped)
+    if feasibility["статус"] != "ok":
+        result["здійсненність"] = feasibility
 
-    for _ in range(days):
-        day_plan = _generate_day_plan_internal(payload=payload, db=db, used_ids=used_ids)
-        plans.append(day_plan)
-        total_kcal += float(day_plan["підсумок"]["ккал"])
-        total_price += float(day_plan["підсумок"]["ціна грн"])
+    if save:
+        plan = persist_plan(db, kind="week", user_id=user_id, meals=meal_rows_from_days(result["плани"]))
+        db.commit()
+        result["ід плану"] = plan["id"]
 
-    return {
-        "днів": days,
-        "плани": plans,
-        "загалом ккал": round(total_kcal, 1),
-        "загалом ціна грн": round(total_price, 2),
-    }
+    if format == "compact":
+        return _json(compact_plan(result))
+    return result
 
 
+# /plan/replan — заміна окремих страв у готовому плані
 @router.post(
-    "/plan/day/by-user/{profile_id}",
-    tags=["Плани"],
-    summary="Згенерувати денний план за профілем",
+    "/plan/replan",
+    summary="Замінити окремі страви в плані, зберігши зафіксовані",
 )
-def make_day_plan_by_user(profile_id: int, db: Session = Depends(get_db)):
-    prof = db.get(Profile, profile_id)
-    if not prof:
-        raise HTTPException(status_code=404, detail="Профіль не знайдено")
+def replan_plan(
+    payload: ReplanIn,
+    save: bool = False,
+    user_id: Optional[int] = None,
+    format: Literal["full", "compact"] = "full",
+    db: Session = Depends(get_db),
+):
+    pool = load_pool(db, payload)
+    if not pool:
+        raise HTTPException(status_code=404, detail="Не знайдено страв під задані умови")
+
+    if payload.plan_id is not None:
+        saved = db.get(Plan, payload.plan_id)
+        if saved is None:
+            raise HTTPException(status_code=404, detail="План не знайдено")
+        days = stored_days(load_plan_meals(db, [saved.id])[saved.id], {r.id: r for r in pool})
+        weekly = saved.kind == "week"
+    elif payload.plan is not None:
+        try:
+            days, weekly = plan_days(payload.plan)
+        except ReplanError as exc:
+            raise HTTPException(status_code=422, detail=str(exc))
+        except (KeyError, IndexError, TypeError, ValueError) as exc:
+            raise HTTPException(status_code=422, detail=f"Неправильний формат плану: {exc}")
+    else:
+        raise HTTPException(status_code=422, detail="Вкажіть «план» або «ід_плану»")
 
-    payload = DayPlanIn(
+    try:
+        changes = replan_days(days, open_slots(days, payload.replace, payload.lock), payload, pool)
+    except ReplanError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    plans = [{"підсумок": day_summary(items), "елементи": items} for items in days]
+    result = week_result(plans) if weekly else plans[0]
+    result["замінено"] = changes
+
+    if save:
+        plan = persist_plan(db, kind="week" if weekly else "day", user_id=user_id, meals=meal_rows_from_days(plans))
+        db.commit()
+        result["ід плану"] = plan["id"]
+
+    if format == "compact":
+        return _json(compact_plan(result))
+    return result
+
+
+def profile_day_payload(prof: Profile) -> DayPlanIn:
+    """Вхідні дані генератора для профілю."""
+    return DayPlanIn(
         kcal=int(prof.target_kcal or prof.tdee or prof.bmr or 2000),
         budget=float(prof.budget_per_day or 200),
         snacks=0,
         diet_tags=[],
         exclude_allergens=list(prof.allergies or []),
     )
-    return make_day_plan(payload, db)
+
+
+def profile_week_payload(prof: Profile) -> WeekPlanIn:
+    return WeekPlanIn(days=7, **profile_day_payload(prof).model_dump())
+
+
+# Поточні плани профілю: вхідні дані та генерація для кожного типу
+PROFILE_PLAN_KINDS = {
+    "day": (profile_day_payload, lambda payload, pool: _generate_day_plan_internal(payload=payload, db=None, pool=pool)),
+    "week": (profile_week_payload, build_week_plan),
+}
+
+
+def current_profile_plan(
+    db: Session, prof: Profile, kind: str, catalog_version: int,
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Поточний план профілю: збережений, якщо він ще актуальний, інакше — згенерований
+    заново й збережений. Повертає (план, чи взято зі збереженого).
+    """
+    make_payload, generate = PROFILE_PLAN_KINDS[kind]
+    payload = make_payload(prof)
+    key = plan_cache_key(payload)
+    plan = get_cached_plan(db, prof.id, kind, key, catalog_version)
+    if plan is not None:
+        return plan, True
+
+    generation = cache_generation()
+    pool = load_pool(db, payload, generation)
+    precheck_plan(db, payload, pool, generation)
+    plan = generate(payload, pool)
+    store_plan(db, prof.id, kind, key, catalog_version, plan)
+    return plan, False
+
+
+def _serve_profile_plan(db: Session, profile_id: int, kind: str, response: Response) -> Dict[str, Any]:
+    prof = db.get(Profile, profile_id)
+    if not prof:
+        raise HTTPException(status_code=404, detail="Профіль не знайдено")
+
+    plan, hit = current_profile_plan(db, prof, kind, known_catalog_version(db))
+    if not hit:
+        db.commit()
+    response.headers["X-Plan-Cache"] = "hit" if hit else "miss"
+    return plan
+
+
+@router.post(
+    "/plan/day/by-user/{profile_id}",
+    tags=["Плани"],
+    summary="Денний план за профілем (перегенеровується лише після зміни профілю чи каталогу)",
+)
+def make_day_plan_by_user(profile_id: int, response: Response, db: Session = Depends(get_db)):
+    return _serve_profile_plan(db, profile_id, "day", response)
+
+
+@router.post(
+    "/plan/week/by-user/{profile_id}",
+    tags=["Плани"],
+    summary="Тижневий план за профілем (перегенеровується лише після зміни профілю чи каталогу)",
+)
+def make_week_plan_by_user(profile_id: int, response: Response, db: Session = Depends(get_db)):
+    return _serve_profile_plan(db, profile_id, "week", response)
 
 
 
@@ -372,5 +732,10 @@ def force_add_light_meals(db: Session = Depends(get_db)):
             existing.weight_g = item.weight_g
             existing.description = item.description
             
+    # Flush рецептів збільшує версію каталогу (див. catalog.py) — збережені плани застаріють
     db.commit()
+    if settings.catalog_snapshot_path:
+        from catalog_snapshot import ensure_snapshot
+
+        ensure_snapshot(db)
     return {"status": "ok", "added": added_count, "message": "Легкі страви перевірено/додано!"}
\ No newline at end of file
@@ -1,12 +1,20 @@
-from typing import Iterator
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+import json
+from typing import TYPE_CHECKING, Iterator, Optional, Literal, Any, Dict, List, Mapping, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, insert, Select
 
 from db import SessionLocal
+from export import stream_rows, export_response
 from models import Profile
 from schemas import ProfileIn, ProfileOut
 
+if TYPE_CHECKING:
+    import numpy as np
+
 router = APIRouter(prefix="/users", tags=["Користувачі"])
 
 def get_db() -> Iterator[Session]:
@@ -17,61 +25,219 @@ def get_db() -> Iterator[Session]:
         db.close()
 
 # Розрахунки 
+# Коефіцієнти цілі та поправка статі у формулі Міффліна-Сан Жеора
+GOAL_MULTIPLIERS = {"lose": 0.8, "maintain": 1.0, "gain": 1.15}
+SEX_OFFSETS = {"male": 5, "female": -161}
+
+
+def normalize_sex(sex: Any) -> str:
+    """Стать у тому вигляді, в якому вона зберігається, хешується й іде у формулу ("Male " -> "male")."""
+    return str(sex).strip().lower()
+
+
 def calc_bmr(sex: str, weight: float, height_cm: float, age: int) -> float:
     # Формула Міффліна-Сан Жеора
-    if sex == "male":
-        return 10 * weight + 6.25 * height_cm - 5 * age + 5
-    else:
-        return 10 * weight + 6.25 * height_cm - 5 * age - 161
+    offset = SEX_OFFSETS["male"] if normalize_sex(sex) == "male" else SEX_OFFSETS["female"]
+    return 10 * weight + 6.25 * height_cm - 5 * age + offset
 
 def calc_tdee(bmr: float, activity: float) -> float:
     return bmr * activity
 
+def calc_targets(payload: ProfileIn) -> Tuple[float, float, int]:
+    """BMR, TDEE та цільові ккал (округлені) для профілю."""
+    bmr = calc_bmr(payload.sex, payload.weight_kg, payload.height_cm, payload.age)
+    tdee = calc_tdee(bmr, payload.activity_factor)
+    target_raw = tdee * GOAL_MULTIPLIERS.get(payload.goal, 1.0)
+
+    # Не опускаємось нижче BMR
+    return bmr, tdee, round(max(bmr, target_raw))
+
+
+def calc_targets_batch(
+    sex: "np.ndarray", age: "np.ndarray", height_cm: "np.ndarray", weight_kg: "np.ndarray",
+    activity_factor: "np.ndarray", goal: "np.ndarray",
+) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """calc_targets над масивами колонок: BMR, TDEE та цільові ккал для пачки профілів."""
+    import numpy as np  # лише для пакетних задач — не сповільнює старт застосунку
+
+    male = np.array([normalize_sex(s) == "male" for s in sex], dtype=bool)
+    offset = np.where(male, SEX_OFFSETS["male"], SEX_OFFSETS["female"])
+    bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age + offset
+    tdee = bmr * activity_factor
+
+    multiplier = np.ones(len(goal))
+    for key, value in GOAL_MULTIPLIERS.items():
+        multiplier[goal == key] = value
+
+    target = np.rint(np.maximum(bmr, tdee * multiplier))
+    return bmr, tdee, target
+
+
+# Вхідні поля профілю, з яких рахується хеш
+PROFILE_INPUT_FIELDS = (
+    "sex", "age", "height_cm", "weight_kg", "activity_factor", "budget_per_day", "goal", "allergies",
+)
+
+
+def profile_input_hash(data: Mapping[str, Any]) -> str:
+    """Хеш нормалізованих вхідних даних: однакові анкети дають один профіль."""
+    values = [
+        normalize_sex(data["sex"]),
+        int(data["age"]),
+        round(float(data["height_cm"]), 1),
+        round(float(data["weight_kg"]), 1),
+        round(float(data["activity_factor"]), 3),
+        round(float(data["budget_per_day"] or 0), 2),
+        data["goal"] or "maintain",
+        sorted({str(a).strip().lower() for a in data["allergies"] or [] if str(a).strip()}),
+    ]
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _profile_row(payload: ProfileIn, input_hash: str) -> Dict[str, Any]:
+    bmr, tdee, target = calc_targets(payload)
+    return {
+        "sex": normalize_sex(payload.sex),
+        "age": payload.age,
+        "height_cm": payload.height_cm,
+        "weight_kg": payload.weight_kg,
+        "activity_factor": payload.activity_factor,
+        "budget_per_day": payload.budget_per_day,
+        "allergies": list(payload.allergies or []),
+        "goal": payload.goal,
+        "bmr": float(bmr),
+        "tdee": float(tdee),
+        "target_kcal": float(target),
+        "input_hash": input_hash,
+    }
+
+
+def get_or_create_profile(db: Session, payload: ProfileIn) -> Profile:
+    """
+    Повертає існуючий профіль з тими самими вхідними даними (разом з розрахованими
+    показниками) або створює новий. Профіль комітиться одразу.
+    """
+    input_hash = profile_input_hash(payload.model_dump())
+
+    def lookup() -> Optional[Profile]:
+        return db.execute(select(Profile).where(Profile.input_hash == input_hash)).scalar_one_or_none()
+
+    row = lookup()
+    if row is not None:
+        return row
+
+    row = Profile(**_profile_row(payload, input_hash))
+    try:
+        db.add(row)
+        db.commit()
+    except IntegrityError:
+        # Паралельний запит уже створив такий самий профіль
+        db.rollback()
+        return lookup()
+    db.refresh(row)
+    return row
+
+
 # ендпоїнти
 @router.post(
     "",
     response_model=ProfileOut,
     response_model_by_alias=True,
-    summary="Створити профіль та порахувати BMR/TDEE/target_kcal",
+    summary="Створити профіль (або повернути такий самий існуючий) та порахувати BMR/TDEE/target_kcal",
 )
 def upsert_profile(payload: ProfileIn, db: Session = Depends(get_db)):
-    # 1. Розрахунок BMR та TDEE
-    bmr = calc_bmr(payload.sex, payload.weight_kg, payload.height_cm, payload.age)
-    tdee = calc_tdee(bmr, payload.activity_factor)
+    return get_or_create_profile(db, payload)
 
-    # 2. Логіка цілі 
-    goal_key = payload.goal or "maintain"
+# Максимум профілів в одному запиті /users/bulk
+BULK_MAX_PROFILES = 5000
+# Спроб вставки, якщо ті самі профілі паралельно вставляють інші запити
+BULK_INSERT_ATTEMPTS = 3
 
-    if goal_key == "lose":
-        target_raw = tdee * 0.8
-    elif goal_key == "gain":
-        target_raw = tdee * 1.15
-    else:  
-        target_raw = tdee
 
-    # Не опускаємось нижче BMR
-    target = max(bmr, target_raw)
-    target_rounded = round(target)
-
-    # 3. Створюємо запис профілю
-    row = Profile(
-        sex=payload.sex,
-        age=payload.age,
-        height_cm=payload.height_cm,
-        weight_kg=payload.weight_kg,
-        activity_factor=payload.activity_factor,
-        budget_per_day=payload.budget_per_day,
-        allergies=list(payload.allergies or []),
-        goal=goal_key,
-        bmr=float(bmr),
-        tdee=float(tdee),
-        target_kcal=float(target_rounded),
-    )
+@router.post(
+    "/bulk",
+    response_model=list[ProfileOut],
+    response_model_by_alias=True,
+    summary="Створити багато профілів одним запитом (однакові анкети не дублюються)",
+)
+def bulk_create_profiles(payloads: List[ProfileIn], db: Session = Depends(get_db)):
+    if len(payloads) > BULK_MAX_PROFILES:
+        raise HTTPException(status_code=422, detail=f"Не більше {BULK_MAX_PROFILES} профілів за запит")
 
-    db.add(row)
-    db.commit()
-    db.refresh(row)
-    return row
+    hashes = [profile_input_hash(p.model_dump()) for p in payloads]
+    unique = dict(zip(hashes, payloads))
+
+    def lookup(keys: List[str]) -> Dict[str, Profile]:
+        rows = db.execute(select(Profile).where(Profile.input_hash.in_(keys))).scalars()
+        return {row.input_hash: row for row in rows}
+
+    found = lookup(list(unique))
+    missing = [h for h in unique if h not in found]
+    if not missing:
+        return [found[h] for h in hashes]
+
+    for _ in range(BULK_INSERT_ATTEMPTS):
+        try:
+            db.execute(insert(Profile), [_profile_row(unique[h], h) for h in missing])
+            db.commit()
+            break
+        except IntegrityError:
+            # Паралельний запит уже вставив частину профілів; після відкату вони видимі
+            db.rollback()
+            found.update(lookup(missing))
+            missing = [h for h in missing if h not in found]
+            if not missing:
+                break
+    else:
+        raise HTTPException(status_code=409, detail="Ті самі профілі саме створює інший запит; повторіть запит")
+
+    # Коміт/відкат прострочує завантажені профілі — дочитуємо всі одним запитом
+    found = lookup(list(unique))
+    return [found[h] for h in hashes]
+
+
+# Колонки експорту профілів — ключі як у ProfileOut (UA-аліаси)
+EXPORT_PROFILE_FIELDS = {name: f.serialization_alias for name, f in ProfileOut.model_fields.items()}
+
+
+def _export_row_json(row: Any) -> Dict[str, Any]:
+    return {alias: row._mapping[name] for name, alias in EXPORT_PROFILE_FIELDS.items()}
+
+
+def _export_row_csv(row: Any) -> List[Any]:
+    return [
+        ",".join(v) if isinstance(v, list) else v
+        for v in (row._mapping[name] for name in EXPORT_PROFILE_FIELDS)
+    ]
+
+
+@router.get("/export", summary="Експорт профілів (CSV / NDJSON, потоково)")
+def export_profiles(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    gzip: bool = Query(False, description="Стиснути файл gzip"),
+    goal: Optional[Literal["lose", "maintain", "gain"]] = Query(None),
+    sex: Optional[str] = Query(None),
+    id_from: Optional[int] = Query(None),
+    id_to: Optional[int] = Query(None),
+):
+    q = select(*(getattr(Profile, name) for name in EXPORT_PROFILE_FIELDS))
+    if goal is not None:
+        q = q.where(Profile.goal == goal)
+    if sex is not None:
+        q = q.where(Profile.sex == sex)
+    if id_from is not None:
+        q = q.where(Profile.id >= id_from)
+    if id_to is not None:
+        q = q.where(Profile.id <= id_to)
+
+    return export_response(
+        format, gzip, "profiles",
+        rows=stream_rows([q.order_by(Profile.id)]),
+        csv_header=list(EXPORT_PROFILE_FIELDS.values()),
+        to_csv=_export_row_csv,
+        to_json=_export_row_json,
+    )
 
 @router.get("/{profile_id}", response_model=ProfileOut, response_model_by_alias=True, summary="Отримати профіль за ідентифікатором")
 def get_profile(profile_id: int, db: Session = Depends(get_db)):
@@ -80,7 +246,46 @@ def get_profile(profile_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Профіль не знайдено")
     return row
 
+def profile_filters(
+    q: Select,
+    goal: Optional[str] = None,
+    sex: Optional[str] = None,
+    age_min: Optional[int] = None,
+    age_max: Optional[int] = None,
+) -> Select:
+    """Фільтри списку профілів (ціль, стать, вік) — спільні для API та веб-інтерфейсу."""
+    if goal is not None:
+        q = q.where(Profile.goal == goal)
+    if sex is not None:
+        q = q.where(Profile.sex == sex)
+    if age_min is not None:
+        q = q.where(Profile.age >= age_min)
+    if age_max is not None:
+        q = q.where(Profile.age <= age_max)
+    return q
+
+
+# GET /users — keyset-пагінація за id (від нових до старих), лише колонки ProfileOut
 @router.get("", response_model=list[ProfileOut], response_model_by_alias=True, summary="Список профілів")
-def list_profiles(db: Session = Depends(get_db)):
-    items = db.execute(select(Profile).order_by(Profile.id.desc())).scalars().all()
-    return items
+def list_profiles(
+    response: Response,
+    after_id: Optional[int] = Query(None, description="Курсор: повернути профілі з id < after_id"),
+    limit: int = Query(50, ge=1, le=500, description="Розмір сторінки"),
+    goal: Optional[Literal["lose", "maintain", "gain"]] = Query(None),
+    sex: Optional[str] = Query(None),
+    age_min: Optional[int] = Query(None, ge=0),
+    age_max: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_db),
+):
+    q = profile_filters(
+        select(*(getattr(Profile, name) for name in EXPORT_PROFILE_FIELDS)),
+        goal=goal, sex=sex, age_min=age_min, age_max=age_max,
+    )
+    if after_id is not None:
+        q = q.where(Profile.id < after_id)
+    rows = db.execute(q.order_by(Profile.id.desc()).limit(limit)).mappings().all()
+
+    # Курсор наступної сторінки
+    if len(rows) == limit:
+        response.headers["X-Next-After-Id"] = str(rows[-1]["id"])
+    return rows
@@ -1,21 +1,69 @@
-import json
 import csv
+import hashlib
+import hmac
 import io
-from typing import Iterator, List, Any, Optional
-
-from fastapi import APIRouter, Depends, Form, Request, Query
-from fastapi.responses import HTMLResponse, Response, RedirectResponse
-from fastapi.templating import Jinja2Templates
+import os
+import re
+import secrets
+import threading
+from urllib.parse import urlencode
+from typing import TYPE_CHECKING, Iterator, List, Any, Optional, Dict, Tuple
+
+import orjson
+from fastapi import APIRouter, Depends, Form, HTTPException, Request, Query
+from fastapi.responses import HTMLResponse, Response, RedirectResponse, StreamingResponse
+from markupsafe import Markup
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from cache import LRUCache
+from export import MEAL_CSV_COLUMNS, meal_csv_cells
 from db import SessionLocal
-from models import Profile
-from schemas import DayPlanIn, WeekPlanIn
-from routes.recipes import make_day_plan, make_week_plan
-from routes.users import calc_bmr, calc_tdee
+from models import Plan, Profile
+from schemas import DayPlanIn, WeekPlanIn, ProfileIn
+from routes.recipes import make_day_plan, make_week_plan, MEAL_ORDER
+from routes.users import get_or_create_profile, profile_filters
+from plan_storage import persist_plan, meal_rows_from_days, load_plan_meals, plan_aggregates
+from settings import settings
+
+if TYPE_CHECKING:
+    from fastapi.templating import Jinja2Templates
 
 router = APIRouter(prefix="/ui", tags=["Web UI"])
-templates = Jinja2Templates(directory="templates")
+
+# Середовище шаблонів створюється при першому рендері, а не під час імпорту (холодний старт)
+_templates: Optional["Jinja2Templates"] = None
+_templates_lock = threading.Lock()
+
+
+def get_templates() -> "Jinja2Templates":
+    global _templates
+    if _templates is None:
+        with _templates_lock:
+            if _templates is None:
+                from fastapi.templating import Jinja2Templates
+                from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+                # Скомпільовані шаблони зберігаються на диску й переживають перезапуск процесу
+                os.makedirs(settings.template_cache_dir, exist_ok=True)
+                _templates = Jinja2Templates(env=Environment(
+                    loader=FileSystemLoader("templates"),
+                    autoescape=True,
+                    bytecode_cache=FileSystemBytecodeCache(settings.template_cache_dir),
+                ))
+    return _templates
+
+# Відрендерені таблиці днів: хеш вмісту дня -> HTML
+day_fragments = LRUCache(maxsize=settings.ui_fragment_cache_size)
+
+# Згенеровані у веб-інтерфейсі плани: токен -> {"plans", "is_week", "plan_id"}
+plan_store = LRUCache(maxsize=settings.ui_plan_store_size, ttl=settings.ui_plan_store_ttl_s)
+
+# Ключ підпису токенів збережених планів; без SECRET_KEY — випадковий на процес.
+# Збережені UI-плани мають відкриватися в будь-якому воркері, тож без ключа не стартуємо
+if settings.ui_persist_plans and not settings.secret_key:
+    raise RuntimeError("UI_PERSIST_PLANS=true потребує SECRET_KEY (однакового для всіх воркерів)")
+_TOKEN_KEY = settings.secret_key.encode("utf-8") or secrets.token_bytes(32)
 
 
 def get_db() -> Iterator[Session]:
@@ -26,9 +74,112 @@ def get_db() -> Iterator[Session]:
         db.close()
 
 
+def _sign(plan_id: int) -> str:
+    return hmac.new(_TOKEN_KEY, str(plan_id).encode("utf-8"), hashlib.sha256).hexdigest()[:24]
+
+
+def issue_plan_token(plan_id: Optional[int] = None) -> str:
+    """Непрозорий токен плану; для збереженого плану — підписаний, щоб працював у будь-якому воркері."""
+    if plan_id is None:
+        return secrets.token_urlsafe(16)
+    return f"p{plan_id}.{_sign(plan_id)}"
+
+
+def _signed_plan_id(token: str) -> Optional[int]:
+    m = re.fullmatch(r"p(\d+)\.([0-9a-f]{24})", token)
+    if m and hmac.compare_digest(m.group(2), _sign(int(m.group(1)))):
+        return int(m.group(1))
+    return None
+
+
+# Групування однакових страв у дні (x2) та сортування за прийомом їжі
+def group_day_items(raw_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    grouped_map: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+
+    for item in raw_items:
+        m_type = item.get("тип прийому")
+        name = item.get("назва")
+        key = (m_type, name)
+
+        if key in grouped_map:
+            existing = grouped_map[key]
+            existing["count"] = existing.get("count", 1) + 1
+            existing["ккал"] += item.get("ккал", 0)
+            existing["білки г"] += item.get("білки г", 0)
+            existing["жири г"] += item.get("жири г", 0)
+            existing["вуглеводи г"] += item.get("вуглеводи г", 0)
+            existing["ціна грн"] += item.get("ціна грн", 0)
+            existing["вага г"] = existing.get("вага г", 0) + item.get("вага г", 0)
+        else:
+            new_item = item.copy()
+            new_item["count"] = 1
+            if "вага г" not in new_item: new_item["вага г"] = 0
+            if "опис" not in new_item: new_item["опис"] = ""
+            grouped_map[key] = new_item
+
+    new_list = list(grouped_map.values())
+    new_list.sort(key=lambda x: MEAL_ORDER.get(x.get("тип прийому"), 99))
+    return new_list
+
+
+def _plans_from_db(db: Session, plan_id: int) -> Optional[Dict[str, Any]]:
+    """Відновлює дні збереженого плану у форматі веб-інтерфейсу."""
+    plan = db.get(Plan, plan_id)
+    if plan is None:
+        return None
+
+    by_day: Dict[int, List[Dict[str, Any]]] = {}
+    for m in load_plan_meals(db, [plan_id])[plan_id]:
+        by_day.setdefault(m["day_index"], []).append(m)
+
+    plans_list = []
+    for day_index in sorted(by_day):
+        meals = by_day[day_index]
+        _, (totals,) = plan_aggregates(meals)
+        items = [{
+            "ід": m.get("recipe_id"), "назва": m["name"], "тип прийому": m["meal_type"],
+            "ккал": m["kcal"], "білки г": m["protein_g"], "жири г": m["fat_g"],
+            "вуглеводи г": m["carbs_g"], "ціна грн": m["price"],
+            "вага г": m["weight_g"] or 0, "опис": m["description"] or "",
+        } for m in meals]
+        plans_list.append({
+            "підсумок": {
+                "ккал": round(totals["kcal"], 1), "ціна грн": round(totals["price"], 2),
+                "білки г": round(totals["protein_g"], 1), "жири г": round(totals["fat_g"], 1),
+                "вуглеводи г": round(totals["carbs_g"], 1), "позицій": totals["items_count"],
+            },
+            "елементи": group_day_items(items),
+        })
+
+    return {"plans": plans_list, "is_week": plan.kind == "week", "plan_id": plan_id}
+
+
+def render_day_table(day_plan: Dict[str, Any], day_number: int, is_week: bool) -> Markup:
+    """HTML таблиці дня; однаковий вміст дня рендериться лише один раз."""
+    key = hashlib.sha1(
+        orjson.dumps([day_plan, day_number, is_week], option=orjson.OPT_SORT_KEYS)
+    ).hexdigest()
+    html = day_fragments.get(key)
+    if html is None:
+        html = Markup(get_templates().get_template("_day_table.html").render(
+            day_plan=day_plan, day_number=day_number, is_week=is_week,
+        ))
+        day_fragments.set(key, html)
+    return html
+
+
+def _infeasible_form(request: Request, exc: HTTPException) -> HTMLResponse:
+    """Форма знову, з причинами, чому план з такими умовами неможливий."""
+    if exc.status_code != 422:
+        raise exc
+    return get_templates().TemplateResponse(
+        request, "profile_form.html", {"feasibility": exc.detail}, status_code=422,
+    )
+
+
 @router.get("/plan", response_class=HTMLResponse)
 def show_plan_form(request: Request) -> HTMLResponse:
-    return templates.TemplateResponse("profile_form.html", {"request": request})
+    return get_templates().TemplateResponse(request, "profile_form.html", {})
 
 
 @router.post("/plan", response_class=HTMLResponse)
@@ -60,33 +211,15 @@ def create_plan_from_form(
     
     allergy_list = [a.strip().lower() for a in allergies.split(",") if a.strip()]
 
-    # 2. Розрахунок
-    bmr = calc_bmr(sex_key, weight_kg, height_cm, age)
-    tdee = calc_tdee(bmr, activity_factor)
+    snacks_goal = {"lose": 0, "maintain": 1, "gain": 2}[goal_key]
 
-    if goal_key == "lose":
-        target_raw = tdee * 0.8
-        snacks_goal = 0
-    elif goal_key == "gain":
-        target_raw = tdee * 1.15
-        snacks_goal = 2
-    else:
-        target_raw = tdee
-        snacks_goal = 1
-
-    target = max(bmr, target_raw)
-    target_rounded = round(target)
-
-    # 3. Збереження профілю
-    profile = Profile(
+    # 2. Профіль: однакова анкета повертає вже збережений профіль з його показниками
+    profile = get_or_create_profile(db, ProfileIn(
         sex=sex_key, age=age, height_cm=height_cm, weight_kg=weight_kg,
         activity_factor=activity_factor, budget_per_day=budget_per_day,
         allergies=allergy_list, goal=goal_key,
-        bmr=float(bmr), tdee=float(tdee), target_kcal=float(target_rounded),
-    )
-    db.add(profile)
-    db.commit()
-    db.refresh(profile)
+    ))
+    target_rounded = round(profile.target_kcal)
 
     # 4. Генерація плану
     plans_list = []
@@ -102,7 +235,10 @@ def create_plan_from_form(
             diet_tags=["standard"],
             exclude_allergens=allergy_list
         )
-        result = make_week_plan(payload, db)
+        try:
+            result = make_week_plan(payload, grouped=True, db=db)
+        except HTTPException as exc:
+            return _infeasible_form(request, exc)
         plans_list = result["плани"]
         
         stats["total_kcal"] = result["загалом ккал"]
@@ -119,7 +255,10 @@ def create_plan_from_form(
             diet_tags=["standard"],
             exclude_allergens=allergy_list
         )
-        day_result = make_day_plan(payload, db)
+        try:
+            day_result = make_day_plan(payload, grouped=True, db=db)
+        except HTTPException as exc:
+            return _infeasible_form(request, exc)
         plans_list = [day_result]
         
         stats["total_kcal"] = day_result["підсумок"]["ккал"]
@@ -128,82 +267,49 @@ def create_plan_from_form(
         stats["budget_period"] = budget_per_day
         stats["items_count"] = len(day_result["елементи"])
 
-    # Сортування та групування (x2)
-    meal_order = {"breakfast": 1, "lunch": 2, "dinner": 3, "snack": 4}
-
-    for day in plans_list:
-        raw_items = day["елементи"]
-        grouped_map = {}
-
-        for item in raw_items:
-            m_type = item.get("тип прийому")
-            name = item.get("назва")
-            key = (m_type, name)
-
-            if key in grouped_map:
-                existing = grouped_map[key]
-                existing["count"] = existing.get("count", 1) + 1
-                existing["ккал"] += item.get("ккал", 0)
-                existing["білки г"] += item.get("білки г", 0)
-                existing["жири г"] += item.get("жири г", 0)
-                existing["вуглеводи г"] += item.get("вуглеводи г", 0)
-                existing["ціна грн"] += item.get("ціна грн", 0)
-                existing["вага г"] = existing.get("вага г", 0) + item.get("вага г", 0)
-            else:
-                new_item = item.copy()
-                new_item["count"] = 1
-                if "вага г" not in new_item: new_item["вага г"] = 0
-                if "опис" not in new_item: new_item["опис"] = ""
-                grouped_map[key] = new_item
-        
-        new_list = list(grouped_map.values())
-        new_list.sort(key=lambda x: meal_order.get(x.get("тип прийому"), 99))
-        day["елементи"] = new_list
+    # За налаштуванням зберігаємо план у БД (згруповані страви розгортаються в окремі рядки)
+    plan_id = None
+    if settings.ui_persist_plans:
+        saved = persist_plan(
+            db, kind="week" if is_week else "day", user_id=profile.id,
+            meals=meal_rows_from_days(plans_list),
+        )
+        db.commit()
+        plan_id = saved["id"]
 
     stats["items_count"] = sum(len(d["елементи"]) for d in plans_list)
 
     goal_label_map = {"lose": "Схуднення", "maintain": "Утримання ваги", "gain": "Набір"}
     goal_label = goal_label_map.get(goal_key, goal_key)
     
-    plans_json = json.dumps(plans_list, default=str, ensure_ascii=False)
+    # План лишається на сервері; сторінка отримує лише токен для завантаження
+    plan_token = issue_plan_token(plan_id)
+    plan_store.set(plan_token, {"plans": plans_list, "is_week": is_week, "plan_id": plan_id})
 
-    return templates.TemplateResponse(
+    return get_templates().TemplateResponse(
+        request,
         "plan_result.html",
         {
-            "request": request, "profile": profile, "plans_list": plans_list,
-            "plans_json": plans_json, "stats": stats, "goal_label": goal_label, "is_week": is_week
+            "profile": profile, "plan_token": plan_token,
+            "day_tables": [render_day_table(d, i, is_week) for i, d in enumerate(plans_list, start=1)],
+            "plan_id": plan_id, "stats": stats, "goal_label": goal_label, "is_week": is_week
         },
     )
 
 
-# Маршрут CSV 
-@router.post("/download")
-def download_plan_file(
-    plan_json: str = Form(...),
-    is_week: bool = Form(...)
-):
-    """
-    Генерує CSV, розбитий на блоки по днях (як на сайті).
-    """
-    try:
-        plans_data = json.loads(plan_json)
-    except json.JSONDecodeError:
-        return Response(content="Помилка обробки даних", status_code=400)
-
+# Рядки CSV, розбиті на блоки по днях (як на сайті)
+def iter_plan_csv(plans_data: List[Dict[str, Any]], is_week: bool) -> Iterator[str]:
     output = io.StringIO()
-    # BOM для коректного відображення кирилиці в Excel
-    output.write('\ufeff')
-    
     writer = csv.writer(output)
-    
-    # Словник для перекладу типів страв
-    type_map = {
-        "breakfast": "Сніданок", "lunch": "Обід", 
-        "dinner": "Вечеря", "snack": "Перекус"
-    }
 
-    # Заголовки колонок 
-    col_headers = ["Тип", "Назва", "Склад", "Вага (г)", "Ккал", "Білки", "Жири", "Вугл", "Ціна (грн)"]
+    def flush() -> str:
+        chunk = output.getvalue()
+        output.seek(0)
+        output.truncate(0)
+        return chunk
+
+    # BOM для коректного відображення кирилиці в Excel
+    yield '\ufeff'
 
     total_price_all = 0
     total_kcal_all = 0
@@ -216,35 +322,31 @@ def download_plan_file(
             writer.writerow(["--- ПЛАН ХАРЧУВАННЯ ---"])
         
         # 2. Шапка таблиці
-        writer.writerow(col_headers)
+        writer.writerow(MEAL_CSV_COLUMNS)
+        yield flush()
 
         items = day_plan.get("елементи", [])
         day_summary = day_plan.get("підсумок", {})
         
-        # Підрахунок БЖВ за день 
-        sum_p = sum(item.get("білки г", 0) for item in items)
-        sum_f = sum(item.get("жири г", 0) for item in items)
-        sum_c = sum(item.get("вуглеводи г", 0) for item in items)
+        # БЖВ за день — з підсумку генератора
+        sum_p = day_summary.get("білки г", 0)
+        sum_f = day_summary.get("жири г", 0)
+        sum_c = day_summary.get("вуглеводи г", 0)
 
         # 3. Рядки зі стравами
         for item in items:
-            m_type = type_map.get(item.get("тип прийому"), item.get("тип прийому"))
-            
             # Назва + (x2)
             name = item.get("назва", "")
             count = item.get("count", 1)
             if count > 1:
                 name += f" (x{count})"
-            
-            description = item.get("опис", "")
-            weight = round(item.get("вага г", 0))
-            kcal = round(item.get("ккал", 0), 1)
-            p = round(item.get("білки г", 0), 1)
-            f = round(item.get("жири г", 0), 1)
-            c = round(item.get("вуглеводи г", 0), 1)
-            price = round(item.get("ціна грн", 0), 2)
 
-            writer.writerow([m_type, name, description, weight, kcal, p, f, c, price])
+            writer.writerow(meal_csv_cells(
+                item.get("тип прийому"), name, item.get("опис", ""), item.get("вага г", 0),
+                item.get("ккал", 0), item.get("білки г", 0), item.get("жири г", 0),
+                item.get("вуглеводи г", 0), item.get("ціна грн", 0),
+            ))
+            yield flush()
 
         # 4. Підсумок Дня 
         d_kcal = round(day_summary.get("ккал", 0), 1)
@@ -260,6 +362,7 @@ def download_plan_file(
         ])
         
         writer.writerow([])
+        yield flush()
         
         total_kcal_all += d_kcal
         total_price_all += d_price
@@ -268,20 +371,89 @@ def download_plan_file(
     writer.writerow([])
     writer.writerow(["ЗАГАЛОМ ЗА ВЕСЬ ПЕРІОД", "", "", "", round(total_kcal_all), "", "", "", round(total_price_all, 2)])
     writer.writerow(["VitaCode Generator", "", "", "", "", "", "", "", ""])
+    yield flush()
 
-    filename = "plan_week.csv" if is_week else "plan_day.csv"
-    
-    return Response(
-        content=output.getvalue(),
+
+# Маршрут CSV 
+@router.get("/download")
+def download_plan_file(
+    token: str = Query(...),
+    db: Session = Depends(get_db),
+):
+    """
+    Віддає CSV плану за токеном зі сторінки результату (потоково, рядок за рядком).
+    """
+    entry = plan_store.get(token)
+    if entry is None:
+        # Збережений план доступний з будь-якого воркера за підписаним токеном
+        plan_id = _signed_plan_id(token)
+        if plan_id is not None:
+            entry = _plans_from_db(db, plan_id)
+    if entry is None:
+        return Response(content="План не знайдено або термін дії посилання минув", status_code=404)
+
+    filename = "plan_week.csv" if entry["is_week"] else "plan_day.csv"
+
+    return StreamingResponse(
+        iter_plan_csv(entry["plans"], entry["is_week"]),
         media_type="text/csv",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 
+# Колонки, які показує список профілів
+PROFILE_LIST_COLUMNS = ("id", "sex", "age", "height_cm", "weight_kg", "goal", "budget_per_day")
+PROFILES_PAGE_SIZE = 50
+
+
 @router.get("/profiles", response_class=HTMLResponse)
-def list_profiles(request: Request, db: Session = Depends(get_db)):
-    profiles = db.query(Profile).order_by(Profile.id.desc()).all()
-    return templates.TemplateResponse("profiles_list.html", {"request": request, "profiles": profiles})
+def list_profiles(
+    request: Request,
+    after_id: Optional[int] = Query(None),
+    before_id: Optional[int] = Query(None),
+    goal: Optional[str] = Query(None),
+    sex: Optional[str] = Query(None),
+    age_min: Optional[str] = Query(None),
+    age_max: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    # Порожні поля форми фільтра приходять як ""
+    filters = {
+        "goal": goal or None,
+        "sex": sex or None,
+        "age_min": int(age_min) if age_min and age_min.isdigit() else None,
+        "age_max": int(age_max) if age_max and age_max.isdigit() else None,
+    }
+    q = profile_filters(select(*(getattr(Profile, c) for c in PROFILE_LIST_COLUMNS)), **filters)
+
+    # Keyset-сторінки від нових до старих; «назад» читається у зворотному порядку
+    if before_id is not None:
+        rows = db.execute(
+            q.where(Profile.id > before_id).order_by(Profile.id.asc()).limit(PROFILES_PAGE_SIZE + 1)
+        ).all()
+        has_newer = len(rows) > PROFILES_PAGE_SIZE
+        profiles = list(reversed(rows[:PROFILES_PAGE_SIZE]))
+        has_older = True
+    else:
+        if after_id is not None:
+            q = q.where(Profile.id < after_id)
+        rows = db.execute(q.order_by(Profile.id.desc()).limit(PROFILES_PAGE_SIZE + 1)).all()
+        has_older = len(rows) > PROFILES_PAGE_SIZE
+        profiles = rows[:PROFILES_PAGE_SIZE]
+        has_newer = after_id is not None
+
+    query = {k: v for k, v in filters.items() if v is not None}
+    newer_url = older_url = None
+    if profiles and has_newer:
+        newer_url = "/ui/profiles?" + urlencode({**query, "before_id": profiles[0].id})
+    if profiles and has_older:
+        older_url = "/ui/profiles?" + urlencode({**query, "after_id": profiles[-1].id})
+
+    return get_templates().TemplateResponse(request, "profiles_list.html", {
+        "profiles": profiles, "filters": filters,
+        "first_url": ("/ui/profiles?" + urlencode(query)).rstrip("?") if has_newer else None,
+        "newer_url": newer_url, "older_url": older_url,
+    })
 
 
 @router.post("/profile/delete/{profile_id}")
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 from typing import Literal
 
@@ -19,6 +20,10 @@ class RecipeOutUA(BaseModel):
     allergens: List[str] = Field(serialization_alias="алергени")
     model_config = ConfigDict(populate_by_name=True, from_attributes=True)
 
+# Результат пошуку страв
+class RecipeSearchOutUA(RecipeOutUA):
+    score: float = Field(serialization_alias="релевантність")
+
 # План дня (вхід)
 class DayPlanIn(BaseModel):
     kcal: int = Field(..., validation_alias="ккал")
@@ -32,6 +37,20 @@ class DayPlanIn(BaseModel):
 class WeekPlanIn(DayPlanIn):
     days: int = Field(7, ge=1, le=14, validation_alias="днів")
 
+# Слот плану: день (з 1); позиція в дні (з 0) та/або тип прийому звужують вибір
+class PlanSlotRef(BaseModel):
+    day: int = Field(1, ge=1, validation_alias="день")
+    slot: Optional[int] = Field(None, ge=0, validation_alias="позиція")
+    meal_type: Optional[str] = Field(None, validation_alias="тип_прийому")
+    model_config = ConfigDict(populate_by_name=True)
+
+# Повторний підбір частини плану (вхід): план або ід збереженого плану + слоти
+class ReplanIn(DayPlanIn):
+    plan: Optional[Dict[str, Any]] = Field(None, validation_alias="план")
+    plan_id: Optional[int] = Field(None, validation_alias="ід_плану")
+    replace: List[PlanSlotRef] = Field(default_factory=list, validation_alias="замінити")
+    lock: List[PlanSlotRef] = Field(default_factory=list, validation_alias="зафіксувати")
+
 # План дня (вихід) 
 class DayPlanOut(BaseModel):
     summary: Dict[str, Any] = Field(serialization_alias="підсумок")
@@ -87,6 +106,7 @@ class ProfileOut(BaseModel):
 
 class PlanMealBase(BaseModel):
     day_index: int
+    recipe_id: Optional[int] = None
     name: str
     meal_type: str
     kcal: float
@@ -102,7 +122,8 @@ class PlanMealCreate(PlanMealBase):
     pass
 
 class PlanMealOut(PlanMealBase):
-    id: int
+    id: Optional[int] = None      # є лише у рядках старого формату
+    slot: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
 
 class PlanBase(BaseModel):
@@ -114,10 +135,34 @@ class PlanCreate(PlanBase):
 
 class PlanOut(PlanBase):
     id: int
+    created_at: Optional[datetime] = None
     total_kcal: float
     total_price: float
+    total_protein_g: Optional[float] = None
+    total_fat_g: Optional[float] = None
+    total_carbs_g: Optional[float] = None
+    items_count: Optional[int] = None
+    days_count: Optional[int] = None
+    kcal_breakfast: Optional[float] = None
+    kcal_lunch: Optional[float] = None
+    kcal_dinner: Optional[float] = None
+    kcal_snack: Optional[float] = None
     model_config = ConfigDict(from_attributes=True)
 
 class PlanWithMealsOut(PlanOut):
     meals: List[PlanMealOut]
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+# Інгредієнти та ціни постачальників
+
+class IngredientOut(BaseModel):
+    id: int = Field(serialization_alias="ід")
+    name: str = Field(serialization_alias="назва")
+    price_per_kg: Optional[float] = Field(serialization_alias="ціна грн/кг")
+    recipes_count: int = Field(0, serialization_alias="рецептів")
+    model_config = ConfigDict(populate_by_name=True, from_attributes=True)
+
+class IngredientPriceIn(BaseModel):
+    id: int = Field(..., validation_alias="ід")
+    price_per_kg: Optional[float] = Field(..., ge=0, validation_alias="ціна грн/кг")
+    model_config = ConfigDict(populate_by_name=True)
@@ -0,0 +1,153 @@
+"""
+Повнотекстовий пошук страв: інвертований індекс триграм за назвою та описом.
+
+Текст нормалізується з урахуванням кирилиці (регістр, апостроф, ґ/ї/й/ё, латинські
+двійники кириличних літер у кириличних словах), тож «Гречка», «гречка» і «грeчка»
+дають однакові триграми. Індекс живе в пам'яті процесу й при зміні версії каталогу
+оновлюється інкрементально: переіндексуються лише додані, змінені та видалені страви.
+"""
+import heapq
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from catalog import RecipeRecord, known_catalog_version, load_catalog_records
+
+# Вага збігу триграми в назві та в описі
+NAME_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.5
+# Бонус, якщо запит цілком міститься в назві
+NAME_SUBSTRING_BONUS = 0.5
+
+_APOSTROPHES = str.maketrans("", "", "'’ʼ`")
+_LETTER_VARIANTS = str.maketrans({"ё": "е", "ґ": "г", "ї": "і", "й": "и"})
+# Латинські літери, що виглядають як кириличні (типові опечатки з іншої розкладки)
+_LATIN_TO_CYRILLIC = str.maketrans("aceiopxyk", "асеіорхук")
+_CYRILLIC = re.compile(r"[а-яіїєґё]")
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> List[str]:
+    """Слова тексту в нормалізованій формі."""
+    text = text.casefold().translate(_APOSTROPHES)
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if _CYRILLIC.search(token):
+            token = token.translate(_LATIN_TO_CYRILLIC)
+        tokens.append(token.translate(_LETTER_VARIANTS))
+    return tokens
+
+
+def trigrams(tokens: Iterable[str]) -> Set[str]:
+    """Триграми слів з пробілами на межах (короткі слова теж дають триграму)."""
+    grams = set()
+    for token in tokens:
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """Триграмний індекс над RecipeRecord; потокобезпечний, оновлюється через sync()."""
+
+    def __init__(self) -> None:
+        self.version: Optional[int] = None
+        self._records: Dict[int, RecipeRecord] = {}
+        self._names: Dict[int, str] = {}
+        # триграма -> {id рецепта: вага}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _doc_grams(self, rec: RecipeRecord) -> Dict[str, float]:
+        weights = {g: DESCRIPTION_WEIGHT for g in trigrams(normalize(rec.description))}
+        weights.update({g: NAME_WEIGHT for g in trigrams(normalize(rec.name))})
+        return weights
+
+    def _add(self, rec: RecipeRecord) -> None:
+        self._records[rec.id] = rec
+        self._names[rec.id] = " ".join(normalize(rec.name))
+        for gram, weight in self._doc_grams(rec).items():
+            self._postings.setdefault(gram, {})[rec.id] = weight
+
+    def _remove(self, recipe_id: int) -> None:
+        rec = self._records.pop(recipe_id)
+        self._names.pop(recipe_id)
+        for gram in self._doc_grams(rec):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.pop(recipe_id, None)
+                if not postings:
+                    del self._postings[gram]
+
+    def sync(self, records: Iterable[RecipeRecord], version: int) -> Tuple[int, int]:
+        """Доводить індекс до переданого каталогу. Повертає (переіндексовано, видалено)."""
+        with self._lock:
+            fresh = {r.id: r for r in records}
+            removed = [rid for rid in self._records if rid not in fresh]
+            changed = [r for rid, r in fresh.items() if self._records.get(rid) != r]
+            for rid in removed:
+                self._remove(rid)
+            for rec in changed:
+                if rec.id in self._records:
+                    self._remove(rec.id)
+                self._add(rec)
+            self.version = version
+            return len(changed), len(removed)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        meal_type: Optional[str] = None,
+        diet: Optional[List[str]] = None,
+        exclude_allergens: Optional[List[str]] = None,
+        min_score: float = 0.5,
+    ) -> List[Tuple[float, RecipeRecord]]:
+        """Найкращі limit страв за релевантністю (частка збіглих триграм запиту + бонус назви)."""
+        tokens = normalize(query)
+        grams = trigrams(tokens)
+        if not grams:
+            return []
+        phrase = " ".join(tokens)
+        tags = set(diet or [])
+        allergens = set(exclude_allergens or [])
+
+        with self._lock:
+            scores: Dict[int, float] = {}
+            for gram in grams:
+                for rid, weight in self._postings.get(gram, {}).items():
+                    scores[rid] = scores.get(rid, 0.0) + weight
+
+            hits = []
+            for rid, total in scores.items():
+                score = total / len(grams)
+                if phrase in self._names[rid]:
+                    score += NAME_SUBSTRING_BONUS
+                if score < min_score:
+                    continue
+                rec = self._records[rid]
+                if meal_type and rec.meal_type != meal_type:
+                    continue
+                if not tags.issubset(rec.diet_tags) or not allergens.isdisjoint(rec.allergens):
+                    continue
+                hits.append((round(score, 3), rec))
+
+        # За рівної релевантності — дешевші страви вище
+        return heapq.nlargest(limit, hits, key=lambda h: (h[0], -h[1].price, -h[1].id))
+
+
+# Індекс цього процесу
+index = SearchIndex()
+
+
+def ensure_index(db: Session) -> SearchIndex:
+    """Індекс, актуальний для поточної версії каталогу (перебудова — лише при зміні версії)."""
+    version = known_catalog_version(db)
+    if index.version != version:
+        index.sync(load_catalog_records(db), version)
+    return index
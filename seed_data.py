@@ -1,13 +1,15 @@
 from typing import List, Dict, Any
 from sqlalchemy.orm import Session
 
-from db import Base, engine, SessionLocal
+from catalog_snapshot import ensure_snapshot
+from db import SessionLocal
+from migrations import upgrade
 from models import Recipe
 
 
 def ensure_schema() -> None:
     """Створюємо таблиці, якщо ще нема."""
-    Base.metadata.create_all(bind=engine)
+    upgrade()
 
 
 def recipes_payload() -> List[Dict[str, Any]]:
@@ -175,6 +177,7 @@ def upsert_recipes(db: Session, items: List[Dict[str, Any]]) -> None:
         else:
             for k, v in it.items():
                 setattr(row, k, v)
+    # версія каталогу збільшується автоматично при flush рецептів (catalog.py)
     db.commit()
 
 
@@ -182,6 +185,7 @@ def main() -> None:
     ensure_schema()
     with SessionLocal() as db:
         upsert_recipes(db, recipes_payload())
+        ensure_snapshot(db)
     print("✅ Seed OK: demo-страви записані/оновлені.")
 
 
@@ -0,0 +1,69 @@
+"""Налаштування застосунку (змінні середовища / .env)."""
+import os
+import tempfile
+from typing import Dict, List
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # ---- Зберігання історії планів ----
+    # Скільки днів тримати плани кожного типу в гарячих таблицях (0 — без обмеження).
+    # Приклад env: RETENTION_DAYS='{"day": 30, "week": 180}'
+    retention_days: Dict[str, int] = {"day": 90, "week": 365}
+    retention_batch_size: int = 500       # планів в одній транзакції
+    retention_pause_s: float = 0.2        # пауза між пачками, щоб не тримати блокування
+    retention_interval_s: int = 0         # період фонової задачі у процесі застосунку; 0 — вимкнено
+
+    # ---- Знімок каталогу (mmap, спільний для воркерів) ----
+    catalog_snapshot_path: str = ""       # файл знімка; порожньо — генератор читає страви з БД
+    catalog_snapshot_check_s: float = 1.0 # як часто воркер перевіряє, чи файл не підмінено
+
+    # ---- Зміни каталогу ----
+    catalog_poll_s: float = 2.0           # як часто воркер перевіряє версію каталогу; 0 — без опитування
+    catalog_pool_cache_size: int = 256    # пули страв генератора (теґи + алергени) у пам'яті процесу
+
+    # ---- Поточні плани профілів ----
+    plan_cache_refresh_hour: int = -1     # година щоденного оновлення застарілих планів; -1 — вимкнено
+    plan_cache_refresh_batch: int = 200   # профілів в одній транзакції оновлення
+
+    # ---- Шаблони планів (готові плани для типових запитів, див. plan_templates.py) ----
+    plan_templates: bool = False          # матеріалізувати сітку при старті та віддавати з неї плани
+    plan_template_kcal: List[int] = [1400, 1600, 1800, 2000, 2200, 2400, 2600, 2800, 3000, 3200]
+    plan_template_kcal_tolerance: int = 50  # запит обслуговується відром, якщо ціль ккал ближче
+    plan_template_budgets: List[int] = [150, 200, 300, 400, 600]  # запит бере найбільше відро <= бюджету
+    plan_template_budget_tolerance: int = 25  # відро бюджету — не нижче за бюджет мінус допуск
+    plan_template_diets: List[str] = ["", "standard"]             # набори дієт-теґів через кому
+    plan_template_allergens: List[str] = ["", "gluten", "milk", "gluten,milk", "nuts", "eggs", "fish"]
+    plan_template_snacks: List[int] = [0, 1, 2]
+    plan_template_days: int = 14          # днів у шаблоні; денний план — перший день
+    plan_template_check_s: float = 30.0   # як часто перевіряти, чи не змінився каталог
+    plan_template_cache_size: int = 4096  # шаблони в пам'яті процесу
+
+    # ---- Ідемпотентність (заголовок Idempotency-Key) ----
+    idempotency_ttl_s: int = 86400        # скільки зберігати відповідь для повторів
+    idempotency_lock_s: float = 60.0      # після цього незавершений запит вважається покинутим
+    idempotency_wait_s: float = 10.0      # скільки повтор чекає на паралельний оригінал, далі 409
+
+    # ---- Стиснення відповідей ----
+    compression_min_bytes: int = 1024     # менші відповіді не стискаються; 0 — стиснення вимкнено
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4   # brotli — якщо встановлено пакет brotli
+
+    # ---- Холодний старт ----
+    prewarm: bool = False                 # прогріти воркер після старту (див. warmup.py, /health/ready)
+    prewarm_connections: int = 5          # з'єднань пулу БД, що відкриваються заздалегідь
+    cold_start_budget_ms: int = 1500      # бюджет імпорту застосунку для startup_profile.py
+
+    # ---- Веб-інтерфейс ----
+    ui_plan_store_size: int = 1000        # скільки згенерованих планів тримати в пам'яті процесу
+    ui_plan_store_ttl_s: int = 3600       # час життя посилання на завантаження CSV
+    ui_persist_plans: bool = False        # також зберігати UI-плани як Plan (посилання працює в усіх воркерах)
+    secret_key: str = ""                  # ключ підпису токенів збережених планів
+    ui_fragment_cache_size: int = 2000    # відрендерені таблиці днів у пам'яті процесу
+    template_cache_dir: str = os.path.join(tempfile.gettempdir(), "vitacode-jinja")  # байткод шаблонів
+
+
+settings = Settings()
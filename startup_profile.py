@@ -0,0 +1,68 @@
+"""
+Профіль холодного старту: час імпорту застосунку (main) у свіжому інтерпретаторі.
+
+Друкує модулі з найбільшим сумарним часом імпорту (python -X importtime) і медіану
+кількох холодних стартів. Код виходу 1, якщо медіана перевищує COLD_START_BUDGET_MS —
+скрипт можна запускати в CI як перевірку бюджету.
+
+    python startup_profile.py
+    python startup_profile.py --runs 5 --top 30 --budget-ms 1200
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+from settings import settings
+
+# Імпорт застосунку в дочірньому процесі; друкує час у мс
+_PROBE = (
+    "import time; t = time.perf_counter(); import main; "
+    "print(round((time.perf_counter() - t) * 1000, 1))"
+)
+
+
+def _run(importtime: bool) -> Tuple[float, str]:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _PROBE]
+    proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return float(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Рядки -X importtime -> (модуль, власний час мкс, сумарний час мкс)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Профіль холодного старту застосунку")
+    parser.add_argument("--runs", type=int, default=3, help="Кількість холодних стартів для медіани")
+    parser.add_argument("--top", type=int, default=20, help="Скільки найповільніших модулів показати")
+    parser.add_argument("--budget-ms", type=int, default=settings.cold_start_budget_ms, help="Бюджет імпорту, мс")
+    args = parser.parse_args()
+
+    _, stderr = _run(importtime=True)
+    rows = parse_importtime(stderr)
+    print(f"{'сумарно, мс':>12} {'власний, мс':>12}  модуль")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:12.1f} {self_us / 1000:12.1f}  {name}")
+
+    # Без -X importtime: сам профілювальник додає накладні витрати
+    timings = [_run(importtime=False)[0] for _ in range(max(1, args.runs))]
+    median = statistics.median(timings)
+    print(f"Імпорт застосунку: медіана {median:.1f} мс ({', '.join(f'{t:.0f}' for t in timings)}), "
+          f"бюджет {args.budget_ms} мс")
+    if median > args.budget_ms:
+        print("❌ Холодний старт перевищує бюджет")
+        sys.exit(1)
+    print("✅ У межах бюджету")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Спільні фікстури тестів: застосунок на тимчасовій SQLite (MySQL не потрібен).
+
+URL бази задається до імпорту db, тож увесь код — маршрути, фонові задачі, міграції —
+працює з тим самим файлом. Схема створюється міграціями, каталог — демо-стравами seed_data.
+"""
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = tempfile.mkdtemp(prefix="vitacode-tests-")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'test.db')}"
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # шаблони та .env шукаються відносно кореня проєкту
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from db import SessionLocal, engine
+
+
+# JSON_CONTAINS з MySQL для фільтрів за теґами
+@event.listens_for(engine, "connect")
+def _sqlite_functions(dbapi_conn, _record):
+    dbapi_conn.create_function(
+        "JSON_CONTAINS", 2,
+        lambda doc, value: int(all(v in json.loads(doc or "[]") for v in json.loads(value))),
+    )
+
+
+@pytest.fixture(scope="session")
+def app_db():
+    """Схема (усі міграції) та демо-каталог; один раз на сесію."""
+    from migrations import upgrade
+    from seed_data import recipes_payload, upsert_recipes
+
+    upgrade()
+    with SessionLocal() as db:
+        upsert_recipes(db, recipes_payload())
+    return engine
+
+
+@pytest.fixture(scope="session")
+def client(app_db):
+    import main
+
+    return TestClient(main.app)
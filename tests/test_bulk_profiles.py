@@ -0,0 +1,75 @@
+"""POST /users/bulk: повтор вставки після конфлікту з паралельним запитом і 409."""
+import itertools
+
+import pytest
+from sqlalchemy import event, insert
+
+from db import engine
+from models import Profile
+from routes.users import BULK_INSERT_ATTEMPTS, _profile_row, profile_input_hash
+from schemas import ProfileIn
+
+_ages = itertools.count(20)
+
+
+def _payloads(n):
+    """Анкети, яких ще нема в БД (вік унікальний у межах сесії)."""
+    return [
+        {"стать": "female", "вік": next(_ages), "зріст см": 165, "вага кг": 60,
+         "активність коеф": 1.4, "бюджет/день грн": 200}
+        for _ in range(n)
+    ]
+
+
+@pytest.fixture
+def racing_insert():
+    """
+    Перед INSERT профілів з /users/bulk «паралельний запит» вставляє одну з анкет
+    з тієї ж пачки через інше з'єднання. Повертає функцію налаштування: (анкети, скільки разів).
+    """
+    state = {"queue": [], "busy": False}
+
+    def before(conn, cursor, statement, params, context, executemany):
+        if state["busy"] or not state["queue"] or not statement.startswith("INSERT INTO profiles"):
+            return
+        payload = ProfileIn(**state["queue"].pop(0))
+        state["busy"] = True
+        try:
+            with engine.begin() as other:
+                other.execute(insert(Profile), _profile_row(payload, profile_input_hash(payload.model_dump())))
+        finally:
+            state["busy"] = False
+
+    def arm(payloads, times):
+        state["queue"] = list(payloads[:times])
+
+    event.listen(engine, "before_cursor_execute", before)
+    yield arm
+    event.remove(engine, "before_cursor_execute", before)
+
+
+def test_conflict_is_retried(client, racing_insert):
+    payloads = _payloads(5)
+    racing_insert(payloads, times=1)
+
+    r = client.post("/users/bulk", json=payloads)
+
+    assert r.status_code == 200
+    ids = [p["ід"] for p in r.json()]
+    assert len(set(ids)) == 5
+    # Профіль, вставлений «паралельно», повертається, а не дублюється
+    again = client.post("/users/bulk", json=payloads).json()
+    assert [p["ід"] for p in again] == ids
+
+
+def test_conflict_on_every_attempt_returns_409(client, racing_insert):
+    payloads = _payloads(BULK_INSERT_ATTEMPTS + 2)
+    racing_insert(payloads, times=BULK_INSERT_ATTEMPTS)
+
+    r = client.post("/users/bulk", json=payloads)
+
+    assert r.status_code == 409
+    # Повтор запиту без конфліктів дописує решту пачки
+    created = client.post("/users/bulk", json=payloads)
+    assert created.status_code == 200
+    assert len({p["ід"] for p in created.json()}) == len(payloads)
@@ -0,0 +1,11 @@
+"""CompressionMiddleware: вже стиснутий експорт не стискається вдруге."""
+import gzip
+
+
+def test_gzip_export_is_not_compressed_again(client):
+    r = client.get("/plans/export", params={"gzip": "true"}, headers={"Accept-Encoding": "gzip"})
+
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/gzip"
+    assert "content-encoding" not in r.headers
+    assert gzip.decompress(r.content).decode("utf-8-sig").startswith("План,")
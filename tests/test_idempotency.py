@@ -0,0 +1,82 @@
+"""IdempotencyMiddleware: повтор, інше тіло з тим самим ключем, незавершений оригінал, 5xx."""
+import hashlib
+import itertools
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from idempotency import CLAIMED, IdempotencyMiddleware, claim_key
+from settings import settings
+
+_keys = itertools.count(1)
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def idem_client(app_db, calls):
+    """Застосунок з одним ендпоінтом /plans: лічить виклики, статус відповіді задає тіло."""
+    async def create(request):
+        payload = await request.json()
+        calls.append(payload)
+        return JSONResponse({"виклик": len(calls)}, status_code=payload.get("status", 200))
+
+    app = Starlette(routes=[Route("/plans", create, methods=["POST"])])
+    return TestClient(IdempotencyMiddleware(app))
+
+
+def _key():
+    return f"test-key-{next(_keys)}"
+
+
+def test_replay_returns_stored_response(idem_client, calls):
+    key = _key()
+    first = idem_client.post("/plans", json={"x": 1}, headers={"Idempotency-Key": key})
+    again = idem_client.post("/plans", json={"x": 1}, headers={"Idempotency-Key": key})
+
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json() == {"виклик": 1}
+    assert again.headers["idempotency-replayed"] == "true"
+    assert len(calls) == 1
+
+
+def test_same_key_other_body_is_422(idem_client, calls):
+    key = _key()
+    idem_client.post("/plans", json={"x": 1}, headers={"Idempotency-Key": key})
+    r = idem_client.post("/plans", json={"x": 2}, headers={"Idempotency-Key": key})
+
+    assert r.status_code == 422
+    assert len(calls) == 1
+
+
+def test_pending_key_is_409_after_wait(idem_client, calls, monkeypatch):
+    monkeypatch.setattr(settings, "idempotency_wait_s", 0.3)
+    key = _key()
+    body = b'{"x":1}'
+    # Оригінал «ще виконується» в іншому воркері
+    key_hash = hashlib.sha1(b"POST /plans\n" + key.encode()).hexdigest()
+    assert claim_key(key_hash, hashlib.sha1(b"\n" + body).hexdigest())[0] == CLAIMED
+
+    r = idem_client.post(
+        "/plans", content=body, headers={"Idempotency-Key": key, "Content-Type": "application/json"},
+    )
+
+    assert r.status_code == 409
+    assert r.headers["retry-after"] == "1"
+    assert calls == []
+
+
+def test_server_error_frees_key(idem_client, calls):
+    key = _key()
+    failed = idem_client.post("/plans", json={"status": 503}, headers={"Idempotency-Key": key})
+    retried = idem_client.post("/plans", json={"status": 503}, headers={"Idempotency-Key": key})
+
+    assert failed.status_code == retried.status_code == 503
+    assert "idempotency-replayed" not in retried.headers
+    assert len(calls) == 2
@@ -0,0 +1,73 @@
+"""Склад страв з опису та перерахунок цін, перерваний посередині."""
+import pytest
+from sqlalchemy import insert, select
+
+from catalog import get_catalog_version
+from db import SessionLocal
+from ingredients import parse_description, reprice_recipes
+from models import Ingredient, Recipe, RecipeIngredient
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Гречка 150г, олія 10 мл", [("Гречка", 150.0), ("Олія", 10.0)]),
+    ("Картопля 0.5 кг, молоко 1 л", [("Картопля", 500.0), ("Молоко", 1000.0)]),
+    ("Рис 0,2 кг, сир 2,5 г", [("Рис", 200.0), ("Сир", 2.5)]),
+    ("Молоко 2,5% (200 мл), яйце 2 шт", [("Молоко 2,5%", 200.0), ("Яйце", 0.0)]),
+    ("Морква 100 г, морква 50г", [("Морква", 150.0)]),
+])
+def test_parse_description_units(text, expected):
+    assert parse_description(text) == expected
+
+
+def test_parse_description_unknown_lines():
+    # Частини без кількості — інгредієнт з 0 г; порожні частини відкидаються
+    assert parse_description("сіль за смаком, , (на вибір)") == [("Сіль за смаком", 0.0)]
+    assert parse_description("") == []
+    assert parse_description(None) == []
+
+
+@pytest.fixture
+def priced_recipes(app_db):
+    """Три рецепти по 200 г одного інгредієнта за 100 грн/кг (ціна страви — 20 грн)."""
+    with SessionLocal() as db:
+        iid = db.execute(insert(Ingredient).values(name="Тестова крупа", price_per_kg=100.0)).inserted_primary_key[0]
+        ids = [
+            db.execute(insert(Recipe).values(
+                name=f"Тестова каша {n}", meal_type="lunch", kcal=300, price=1.0, description="",
+                diet_tags=[], allergens=[],
+            )).inserted_primary_key[0]
+            for n in range(3)
+        ]
+        db.execute(insert(RecipeIngredient), [{"recipe_id": rid, "ingredient_id": iid, "grams": 200} for rid in ids])
+        db.commit()
+    return iid, ids
+
+
+def test_interrupted_reprice_is_finished_by_retry(priced_recipes, monkeypatch):
+    iid, ids = priced_recipes
+    with SessionLocal() as db:
+        version = get_catalog_version(db)
+        commits = []
+        real_commit = db.commit
+
+        def crash_on_second_batch():
+            commits.append(1)
+            if len(commits) == 2:
+                raise RuntimeError("збій воркера")
+            real_commit()
+
+        monkeypatch.setattr(db, "commit", crash_on_second_batch)
+        with pytest.raises(RuntimeError):
+            reprice_recipes(db, [iid], batch_size=1)
+
+    with SessionLocal() as db:
+        prices = dict(db.execute(select(Recipe.id, Recipe.price).where(Recipe.id.in_(ids))).all())
+        assert sorted(prices.values()) == [1.0, 1.0, 20.0]
+        # Версія не збільшилась: кеші не скинуті посеред перерахунку
+        assert get_catalog_version(db) == version
+
+        assert reprice_recipes(db, [iid], batch_size=1) == 2
+
+        prices = dict(db.execute(select(Recipe.id, Recipe.price).where(Recipe.id.in_(ids))).all())
+        assert set(prices.values()) == {20.0}
+        assert get_catalog_version(db) == version + 1
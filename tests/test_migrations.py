@@ -0,0 +1,96 @@
+"""migrations.upgrade(): повторний запуск і оновлення схеми, створеної до версійних міграцій."""
+import pytest
+from sqlalchemy import (
+    JSON, Column, Float, ForeignKey, Integer, MetaData, String, Table, create_engine, event,
+    inspect, insert, select,
+)
+
+from migrations import LATEST, MIGRATIONS, upgrade
+
+# Таблиці в тому вигляді, в якому їх створював create_all до появи міграцій
+_baseline = MetaData()
+Table(
+    "profiles", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("sex", String(10), nullable=False),
+    Column("age", Integer, nullable=False),
+    Column("height_cm", Float, nullable=False),
+    Column("weight_kg", Float, nullable=False),
+    Column("activity_factor", Float, nullable=False),
+    Column("budget_per_day", Float),
+    Column("goal", String(50)),
+    Column("allergies", JSON),
+    Column("bmr", Float),
+    Column("tdee", Float),
+    Column("target_kcal", Float),
+)
+Table(
+    "recipes", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(150), nullable=False),
+    Column("meal_type", String(50), index=True),
+    Column("kcal", Float, nullable=False),
+    Column("protein_g", Float),
+    Column("fat_g", Float),
+    Column("carbs_g", Float),
+    Column("price", Float),
+    Column("weight_g", Float),
+    Column("description", String(500)),
+    Column("diet_tags", JSON),
+    Column("allergens", JSON),
+)
+baseline_plans = Table(
+    "plans", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("kind", String(20)),
+    Column("user_id", Integer),
+    Column("total_kcal", Float),
+    Column("total_price", Float),
+)
+Table(
+    "plan_meals", _baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("plan_id", Integer, ForeignKey("plans.id"), nullable=False),
+    Column("day_index", Integer),
+    Column("name", String(150)),
+    Column("meal_type", String(50)),
+    Column("kcal", Float),
+    Column("protein_g", Float),
+    Column("fat_g", Float),
+    Column("carbs_g", Float),
+    Column("price", Float),
+    Column("weight_g", Float),
+    Column("description", String(500)),
+)
+
+
+@pytest.fixture
+def fresh_engine(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield eng
+    eng.dispose()
+
+
+def test_second_upgrade_is_one_query(fresh_engine):
+    assert upgrade(fresh_engine) == [number for number, _, _ in MIGRATIONS]
+
+    statements = []
+    event.listen(fresh_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    assert upgrade(fresh_engine) == []
+    assert len(statements) == 1
+
+
+def test_upgrade_from_baseline_schema(fresh_engine):
+    _baseline.create_all(fresh_engine)
+    with fresh_engine.begin() as conn:
+        conn.execute(insert(baseline_plans).values(kind="day", total_kcal=2000, total_price=150))
+
+    assert upgrade(fresh_engine) == list(range(1, LATEST + 1))
+
+    insp = inspect(fresh_engine)
+    assert {"ingredients", "recipe_ingredients", "idempotency_keys", "plan_templates"} <= set(insp.get_table_names())
+    assert "created_at" in {c["name"] for c in insp.get_columns("plans")}
+    plans = Table("plans", MetaData(), autoload_with=fresh_engine)
+    with fresh_engine.connect() as conn:
+        assert conn.scalar(select(plans.c.created_at)) is not None
@@ -0,0 +1,23 @@
+"""GET /recipes: готовий JSON відповідає документованій моделі RecipeOutUA."""
+from schemas import RecipeOutUA
+
+_ALIASES = {name: field.serialization_alias for name, field in RecipeOutUA.model_fields.items()}
+
+
+def test_recipes_match_documented_model(client):
+    r = client.get("/recipes")
+
+    assert r.status_code == 200
+    items = r.json()
+    assert items
+    for item in items:
+        model = RecipeOutUA(**{name: item[alias] for name, alias in _ALIASES.items()})
+        assert model.model_dump(by_alias=True) == item
+
+
+def test_recipes_schema_is_documented(client):
+    schema = client.get("/openapi.json").json()
+    response = schema["paths"]["/recipes"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+
+    assert response["type"] == "array"
+    assert response["items"]["$ref"].endswith("/RecipeOutUA")
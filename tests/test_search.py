@@ -0,0 +1,17 @@
+"""search.normalize: регістр, апостроф, варіанти літер і латинські двійники."""
+from search import normalize
+
+
+def test_case_and_latin_lookalikes():
+    # «e» та «o» — латинські
+    assert normalize("Гречка") == normalize("гречка") == normalize("грeчка") == ["гречка"]
+    assert normalize("Мoлoкo") == ["молоко"]
+
+
+def test_apostrophe_and_letter_variants():
+    assert normalize("М'ясо з п’юре") == ["мясо", "з", "пюре"]
+    assert normalize("Ґрунтовий йогурт, їжа") == ["грунтовии", "иогурт", "іжа"]
+
+
+def test_latin_words_are_kept():
+    assert normalize("Pesto & tofu") == ["pesto", "tofu"]
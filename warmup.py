@@ -0,0 +1,82 @@
+"""
+Прогрів воркера після старту: сторінки знімка каталогу, з'єднання пулу БД, шаблони.
+
+Поки прогрів триває, /health/ready відповідає 503, тож балансувальник не шле
+запити на холодний воркер. Без PREWARM воркер готовий одразу після старту.
+"""
+import threading
+import time
+from contextlib import ExitStack
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from db import engine
+from settings import settings
+
+_ready = threading.Event()
+_timings: Dict[str, float] = {}  # етап -> мс
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def warmup_timings() -> Dict[str, float]:
+    return dict(_timings)
+
+
+def _step(name: str, fn: Callable[[], None]) -> None:
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as exc:  # невдалий етап лише лишає відповідну частину холодною
+        print(f"warmup: {name}: {exc}")
+    _timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _touch_snapshot() -> None:
+    if not settings.catalog_snapshot_path:
+        return
+    from catalog_snapshot import current_snapshot
+
+    snap = current_snapshot()
+    if snap is not None:
+        # Читаємо всі секції — сторінки файлу потрапляють у пам'ять до першого запиту
+        for arr in snap.columns.values():
+            arr.sum()
+
+
+def _connect_pool() -> None:
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    count = max(0, min(settings.prewarm_connections, size))
+    # Відкриваємо з'єднання одночасно, інакше пул віддаватиме те саме
+    with ExitStack() as stack:
+        for _ in range(count):
+            conn = stack.enter_context(engine.connect())
+            conn.execute(text("SELECT 1"))
+
+
+def _compile_templates() -> None:
+    from routes.web_ui import get_templates
+
+    env = get_templates().env
+    for name in env.list_templates():
+        env.get_template(name)
+
+
+def prewarm() -> None:
+    _step("catalog_snapshot", _touch_snapshot)
+    _step("db_pool", _connect_pool)
+    _step("templates", _compile_templates)
+    _ready.set()
+
+
+def start_prewarm() -> Optional[threading.Thread]:
+    """Прогрів у фоні (якщо PREWARM увімкнено); інакше воркер одразу позначається готовим."""
+    if not settings.prewarm:
+        _ready.set()
+        return None
+    thread = threading.Thread(target=prewarm, name="warmup", daemon=True)
+    thread.start()
+    return thread